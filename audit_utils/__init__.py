@@ -0,0 +1,40 @@
+"""
+Shared helpers for the Skills for Audit examples
+"""
+
+from audit_utils.examples import load_example_module
+from audit_utils.file_downloads import (
+    DownloadResult,
+    adownload_files,
+    download_files,
+    find_file_ids,
+    print_download_report,
+)
+from audit_utils.prompt_templates import (
+    PromptTemplate,
+    PromptTooLarge,
+    check_token_budget,
+    estimate_tokens,
+    positive_token_budget,
+    split_to_budget,
+    token_budget_from_env,
+)
+from audit_utils.response_cache import ResponseCache, request_key
+
+__all__ = [
+    "load_example_module",
+    "DownloadResult",
+    "adownload_files",
+    "download_files",
+    "find_file_ids",
+    "print_download_report",
+    "PromptTemplate",
+    "PromptTooLarge",
+    "check_token_budget",
+    "estimate_tokens",
+    "positive_token_budget",
+    "split_to_budget",
+    "token_budget_from_env",
+    "ResponseCache",
+    "request_key",
+]
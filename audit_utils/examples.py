@@ -0,0 +1,34 @@
+"""
+Import the numbered example scripts as modules
+Purpose: Reuse functions from files like 06_checklist_to_excel.py, whose names
+are not valid Python identifiers and so cannot be imported directly
+"""
+
+import importlib.util
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_example_module(relative_path: str):
+    """
+    Load an example script (path relative to the repository root) as a module.
+
+    The script's own directory is put on sys.path first so its sibling imports
+    resolve. Modules are cached in sys.modules, so repeated loads are free.
+    """
+    path = os.path.join(REPO_ROOT, relative_path)
+    module_name = "example_" + os.path.splitext(os.path.basename(path))[0].lstrip("0123456789_")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    script_dir = os.path.dirname(path)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,191 @@
+"""
+Streaming, parallel artifact download from the Files API
+Purpose: Save every file a Skills response produced, without holding any of them in memory
+Scenario: Multi-sheet workpapers and decks, sometimes several per response
+
+Every file_id anywhere in the response is found (they sit inside the code
+execution result blocks, not just at the top level), and each file is streamed
+to disk in chunks on its own worker thread. Files are written to a temp file
+next to the target and renamed into place, so a failed download never leaves a
+half-written workpaper behind.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+
+CHUNK_SIZE = 1 << 20  # 1 MB
+DEFAULT_MAX_WORKERS = 4
+
+
+class DownloadResult(NamedTuple):
+    """One downloaded artifact"""
+    file_id: str
+    path: str
+    size: int
+    seconds: float
+    from_cache: bool
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.size / self.seconds if self.seconds else 0.0
+
+
+def find_file_ids(response) -> List[str]:
+    """Every file_id in a response, in order of appearance, without duplicates"""
+    file_ids = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            file_id = node.get("file_id")
+            if isinstance(file_id, str) and file_id and file_id not in file_ids:
+                file_ids.append(file_id)
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(response.model_dump())
+    return file_ids
+
+
+def _temp_path(output_path: str) -> str:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_path) or ".", prefix=".download-")
+    os.close(fd)
+    return tmp_path
+
+
+def _unique_paths(output_dir: str, filenames: List[str]) -> List[str]:
+    """Output paths for a batch of files, de-duplicating names within the batch"""
+    paths = []
+    used = set()
+    for filename in filenames:
+        stem, ext = os.path.splitext(filename)
+        candidate, n = filename, 1
+        while candidate in used:
+            n += 1
+            candidate = f"{stem}_{n}{ext}"
+        used.add(candidate)
+        paths.append(os.path.join(output_dir, candidate))
+    return paths
+
+
+def _remote_filename(client, file_id: str) -> str:
+    """Name the Files API reports for a file, falling back to its id"""
+    try:
+        return os.path.basename(client.beta.files.retrieve_metadata(file_id).filename) or file_id
+    except Exception:
+        return file_id
+
+
+def download_file(client, file_id: str, output_path: str, response=None, cache=None) -> DownloadResult:
+    """Stream one file to output_path (atomically), or copy it from the response cache"""
+    start = time.perf_counter()
+    cached_path = cache.cached_artifact(response, file_id) if cache is not None and response is not None else None
+    tmp_path = _temp_path(output_path)
+    try:
+        if cached_path:
+            shutil.copyfile(cached_path, tmp_path)
+        else:
+            with client.beta.files.with_streaming_response.download(file_id) as stream:
+                with open(tmp_path, 'wb') as f:
+                    for chunk in stream.iter_bytes(CHUNK_SIZE):
+                        f.write(chunk)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if cache is not None and response is not None and not cached_path:
+        cache.store_artifact(response, file_id, output_path)
+    return DownloadResult(file_id, output_path, os.path.getsize(output_path),
+                          time.perf_counter() - start, bool(cached_path))
+
+
+def download_files(client, response, output_dir: str = ".", primary_filename: Optional[str] = None,
+                   cache=None, max_workers: int = DEFAULT_MAX_WORKERS) -> List[DownloadResult]:
+    """Download every file in a response, several at a time; results are in response order"""
+    file_ids = find_file_ids(response)
+    if not file_ids:
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # The first file gets primary_filename (if given); the rest keep their Files API names
+        lookups = file_ids[1:] if primary_filename else file_ids
+        filenames = list(pool.map(lambda file_id: _remote_filename(client, file_id), lookups))
+        if primary_filename:
+            filenames.insert(0, primary_filename)
+        paths = _unique_paths(output_dir, filenames)
+
+        futures = [
+            pool.submit(download_file, client, file_id, path, response, cache)
+            for file_id, path in zip(file_ids, paths)
+        ]
+        return [future.result() for future in futures]
+
+
+async def adownload_file(client, file_id: str, output_path: str, response=None, cache=None) -> DownloadResult:
+    """Async version of download_file() for AsyncAnthropic clients"""
+    start = time.perf_counter()
+    cached_path = cache.cached_artifact(response, file_id) if cache is not None and response is not None else None
+    tmp_path = _temp_path(output_path)
+    try:
+        if cached_path:
+            shutil.copyfile(cached_path, tmp_path)
+        else:
+            async with client.beta.files.with_streaming_response.download(file_id) as stream:
+                with open(tmp_path, 'wb') as f:
+                    async for chunk in stream.iter_bytes(CHUNK_SIZE):
+                        f.write(chunk)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if cache is not None and response is not None and not cached_path:
+        await asyncio.to_thread(cache.store_artifact, response, file_id, output_path)
+    return DownloadResult(file_id, output_path, os.path.getsize(output_path),
+                          time.perf_counter() - start, bool(cached_path))
+
+
+async def adownload_files(client, response, output_dir: str = ".", primary_filename: Optional[str] = None,
+                          cache=None) -> List[DownloadResult]:
+    """Async version of download_files(); the files download concurrently"""
+    file_ids = find_file_ids(response)
+    if not file_ids:
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+
+    async def remote_filename(file_id):
+        try:
+            return os.path.basename((await client.beta.files.retrieve_metadata(file_id)).filename) or file_id
+        except Exception:
+            return file_id
+
+    lookups = file_ids[1:] if primary_filename else file_ids
+    filenames = list(await asyncio.gather(*(remote_filename(file_id) for file_id in lookups)))
+    if primary_filename:
+        filenames.insert(0, primary_filename)
+    paths = _unique_paths(output_dir, filenames)
+
+    return list(await asyncio.gather(*(
+        adownload_file(client, file_id, path, response, cache)
+        for file_id, path in zip(file_ids, paths)
+    )))
+
+
+def print_download_report(downloads: List[DownloadResult]):
+    """Print one line per downloaded file with its size and throughput"""
+    for download in downloads:
+        source = "cache" if download.from_cache else f"{download.bytes_per_second / 1024:.1f} KB/s"
+        print(f"  ↓ {download.path}: {download.size / 1024:.1f} KB in {download.seconds:.2f}s ({source})")
+    total_bytes = sum(download.size for download in downloads)
+    print(f"  {len(downloads)} file(s), {total_bytes / 1024:.1f} KB total\n")
@@ -0,0 +1,137 @@
+"""
+Precompiled prompt templates with a token preflight
+Purpose: Build large prompts in linear time and know their size before the call
+Scenario: Workpaper and XBRL prompts with a row per procedure or fact, some too big to send
+
+A PromptTemplate is parsed once, at import time, from str.format syntax
+({name}, {name:spec}, {name!r}) and compiled into one f-string function, so
+rendering is a single formatting step. render_rows() renders many rows and
+joins them in one pass, so no prompt is built by repeated += concatenation.
+
+check_token_budget() estimates a prompt's tokens before it is sent and raises
+PromptTooLarge when it is over budget, instead of paying for a request that
+will truncate. split_to_budget() packs rendered rows into as few chunks as fit
+the budget, for callers that can send a prompt in parts.
+
+Environment variables:
+    AUDIT_PROMPT_TOKEN_BUDGET  input-token budget per prompt (default: 100000)
+"""
+
+import os
+import string
+from typing import Iterable, List, Optional
+
+# Rough rule of thumb for English text and markup with Claude tokenizers
+CHARS_PER_TOKEN = 4
+# Well inside the 200k-token context window, leaving room for skill instructions and tool output
+DEFAULT_TOKEN_BUDGET = 100_000
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a prompt without calling the API"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class PromptTooLarge(ValueError):
+    """A prompt, or one row of it, is over the token budget"""
+
+    def __init__(self, tokens: int, budget: int, what: str = "Prompt"):
+        super().__init__(f"{what} is ~{tokens:,} tokens, over the {budget:,}-token budget")
+        self.tokens = tokens
+        self.budget = budget
+
+
+class PromptTemplate:
+    """A str.format-style template compiled once into a single f-string function"""
+    __slots__ = ("source", "fields", "_render")
+
+    def __init__(self, source: str):
+        self.source = source
+        constants = {}
+        fields = []
+        code = []
+        for literal, field_name, spec, conversion in string.Formatter().parse(source):
+            if literal:
+                # Literals are bound as constants, so the generated source never has to escape them
+                name = f"_{len(constants)}"
+                constants[name] = literal
+                code.append("{" + name + "}")
+            if field_name is None:
+                continue
+            if not field_name.isidentifier():
+                raise ValueError(f"Template field {{{field_name}}} must be a plain name")
+            if any(char in spec for char in "{\n\\'\""):
+                raise ValueError(f"Template field {{{field_name}}} has an unsupported format spec")
+            code.append("{v[%r]%s%s}" % (field_name, "!" + conversion if conversion else "",
+                                          ":" + spec if spec else ""))
+            fields.append(field_name)
+        namespace = dict(constants)
+        exec(f"def render(v):\n    return f{''.join(code)!r}", namespace)
+        self._render = namespace["render"]
+        self.fields = tuple(fields)
+
+    def render(self, values: Optional[dict] = None, **kwargs) -> str:
+        """Fill the fields from a mapping and/or keyword arguments"""
+        if values is None:
+            values = kwargs
+        elif kwargs:
+            values = {**values, **kwargs}
+        try:
+            return self._render(values)
+        except KeyError as e:
+            raise KeyError(f"Template field {{{e.args[0]}}} has no value") from None
+
+    def render_rows(self, rows: Iterable[dict]) -> str:
+        """Render the template once per row and join the results"""
+        try:
+            return "".join(map(self._render, rows))
+        except KeyError as e:
+            raise KeyError(f"Template field {{{e.args[0]}}} has no value") from None
+
+
+def positive_token_budget(value) -> int:
+    """A token budget as an int; raises ValueError unless it is positive (also an argparse type)"""
+    budget = int(value)
+    if budget <= 0:
+        raise ValueError(f"Token budget must be a positive number of tokens, got {budget}")
+    return budget
+
+
+def token_budget_from_env(default: int = DEFAULT_TOKEN_BUDGET) -> int:
+    """The AUDIT_PROMPT_TOKEN_BUDGET setting, or the default"""
+    return positive_token_budget(os.environ.get("AUDIT_PROMPT_TOKEN_BUDGET", default))
+
+
+def _resolve_budget(budget: Optional[int]) -> int:
+    # Only None means "not given"; 0 or a negative budget is an error, not the default
+    return token_budget_from_env() if budget is None else positive_token_budget(budget)
+
+
+def check_token_budget(prompt: str, budget: Optional[int] = None, what: str = "Prompt") -> int:
+    """Estimated tokens of a prompt; raises PromptTooLarge if it is over budget"""
+    budget = _resolve_budget(budget)
+    tokens = estimate_tokens(prompt)
+    if tokens > budget:
+        raise PromptTooLarge(tokens, budget, what)
+    return tokens
+
+
+def split_to_budget(rows: List[str], budget: Optional[int] = None, fixed_text: str = "") -> List[range]:
+    """
+    Pack rendered rows, in order, into as few index ranges as fit the budget
+    fixed_text is the part of the prompt every chunk repeats (header, instructions)
+    Raises PromptTooLarge if the fixed text plus a single row is already over budget
+    """
+    budget = _resolve_budget(budget)
+    available = (budget - estimate_tokens(fixed_text)) * CHARS_PER_TOKEN
+    chunks = []
+    start = size = 0
+    for i, row in enumerate(rows):
+        if len(row) > available:
+            raise PromptTooLarge(estimate_tokens(fixed_text + row), budget, what=f"Row {i}")
+        if size + len(row) > available:
+            chunks.append(range(start, i))
+            start, size = i, 0
+        size += len(row)
+    chunks.append(range(start, len(rows)))
+    return chunks
@@ -0,0 +1,237 @@
+"""
+Content-addressed on-disk cache for messages.create calls
+Purpose: Re-running a demo or regenerating an unchanged workpaper should not call the API again
+Scenario: The same prompt, model, betas and skills always give a usable answer, so reuse it
+
+Each request is keyed by a SHA-256 of its full keyword arguments. The response and
+any files downloaded for it are stored together under that key:
+
+    <cache_dir>/<key[:2]>/<key>/response.json
+    <cache_dir>/<key[:2]>/<key>/meta.json
+    <cache_dir>/<key[:2]>/<key>/files/<file_id>
+
+Entries older than the TTL are ignored, and once the cache grows past max_bytes
+the least recently used entries are evicted. The cache is scanned for its size on
+the first write only; after that each write adds its bytes to a running total and
+the (O(entries)) eviction scan runs only when that total crosses max_bytes. Eviction
+then frees space down to 90% of max_bytes, so the next scan is many writes away.
+
+Environment variables:
+    AUDIT_CACHE_DIR        cache location (default: ~/.cache/skills_for_audit)
+    AUDIT_CACHE_MAX_MB     size limit in MB (default: 500)
+    AUDIT_CACHE_TTL_HOURS  entry lifetime in hours (default: 168, one week)
+    AUDIT_CACHE_BYPASS     set to 1 to skip lookups (scripts also take --no-cache)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from anthropic.types.beta import BetaMessage
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "skills_for_audit")
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+# Eviction frees space down to this fraction of max_bytes, so a full cache is not rescanned on every write
+EVICT_TO_FRACTION = 0.9
+
+
+def request_key(request: dict) -> str:
+    """SHA-256 of the canonical JSON form of a request's keyword arguments"""
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path: str, data: bytes):
+    """Write to a temp file in the same directory, then rename over the target"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ResponseCache:
+    """On-disk LRU cache of messages.create responses and their file artifacts"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS, bypass: bool = False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.bypass = bypass
+        # Which cache entry each response came from, so its files are stored alongside it
+        self._keys_by_response_id = {}
+        # Bytes on disk as of the last scan plus everything written since; None until the first scan
+        self._total_bytes = None
+        # acreate() writes from worker threads
+        self._size_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, bypass: bool = False) -> "ResponseCache":
+        """Build a cache from the AUDIT_CACHE_* environment variables; bypass=True (--no-cache) skips lookups"""
+        return cls(
+            cache_dir=os.environ.get("AUDIT_CACHE_DIR", DEFAULT_CACHE_DIR),
+            max_bytes=int(float(os.environ.get("AUDIT_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024),
+            ttl_seconds=float(os.environ.get("AUDIT_CACHE_TTL_HOURS", DEFAULT_TTL_SECONDS / 3600)) * 3600,
+            bypass=bypass or os.environ.get("AUDIT_CACHE_BYPASS", "") not in ("", "0"),
+        )
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key: str) -> Optional[BetaMessage]:
+        """Cached response for a key, or None if missing or expired"""
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, "meta.json")
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if time.time() - meta["created_at"] > self.ttl_seconds:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                return None
+            with open(os.path.join(entry_dir, "response.json"), 'r', encoding='utf-8') as f:
+                response = BetaMessage.model_validate_json(f.read())
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # The meta file's mtime is the entry's last access time for LRU eviction
+        os.utime(meta_path)
+        self._keys_by_response_id[response.id] = key
+        return response
+
+    def put(self, key: str, response: BetaMessage, request: dict):
+        """Store a response under its request key"""
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        response_data = response.model_dump_json().encode("utf-8")
+        _write_atomic(os.path.join(entry_dir, "response.json"), response_data)
+        meta = {
+            "created_at": time.time(),
+            "model": request.get("model"),
+            "betas": request.get("betas"),
+            "response_id": response.id,
+        }
+        meta_data = json.dumps(meta, indent=2).encode("utf-8")
+        _write_atomic(os.path.join(entry_dir, "meta.json"), meta_data)
+        self._keys_by_response_id[response.id] = key
+        self._written(len(response_data) + len(meta_data))
+
+    def create(self, client, **request) -> BetaMessage:
+        """client.beta.messages.create(**request), answered from the cache when possible"""
+        key = request_key(request)
+        if not self.bypass:
+            response = self.get(key)
+            if response is not None:
+                print(f"✓ Using cached response ({key[:12]})\n")
+                return response
+        response = client.beta.messages.create(**request)
+        self.put(key, response, request)
+        return response
+
+    async def acreate(self, client, **request) -> BetaMessage:
+        """Async version of create() for AsyncAnthropic clients; cache file I/O runs in a worker thread"""
+        key = request_key(request)
+        if not self.bypass:
+            response = await asyncio.to_thread(self.get, key)
+            if response is not None:
+                return response
+        response = await client.beta.messages.create(**request)
+        await asyncio.to_thread(self.put, key, response, request)
+        return response
+
+    def artifact_path(self, response: BetaMessage, file_id: str) -> Optional[str]:
+        """Where a response's downloaded file is (or would be) cached, or None if uncached"""
+        key = self._keys_by_response_id.get(response.id)
+        if key is None:
+            return None
+        return os.path.join(self._entry_dir(key), "files", file_id)
+
+    def cached_artifact(self, response: BetaMessage, file_id: str) -> Optional[str]:
+        """Path of a cached file produced by a cached response, or None"""
+        path = self.artifact_path(response, file_id)
+        if self.bypass or path is None or not os.path.exists(path):
+            return None
+        return path
+
+    def store_artifact(self, response: BetaMessage, file_id: str, source_path: str):
+        """Copy a file downloaded for a response into the cache alongside the response"""
+        path = self.artifact_path(response, file_id)
+        if path is None:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._written(os.path.getsize(path))
+
+    def _written(self, size: int):
+        """Count bytes just written; scan and evict only on the first write or past max_bytes"""
+        with self._size_lock:
+            if self._total_bytes is None:
+                self.evict()
+                return
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """
+        Remove expired entries, then least recently used ones until under EVICT_TO_FRACTION of max_bytes
+        Walks every entry, so it runs only when the running total says it is needed.
+        """
+        entries = []
+        total_bytes = 0
+        now = time.time()
+        if not os.path.isdir(self.cache_dir):
+            self._total_bytes = 0
+            return
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                meta_path = os.path.join(entry.path, "meta.json")
+                try:
+                    last_access = os.path.getmtime(meta_path)
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        created_at = json.load(f)["created_at"]
+                except (OSError, ValueError, KeyError):
+                    continue
+                if now - created_at > self.ttl_seconds:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    continue
+                size = sum(
+                    os.path.getsize(os.path.join(dirpath, name))
+                    for dirpath, _, names in os.walk(entry.path) for name in names
+                )
+                entries.append((last_access, size, entry.path))
+                total_bytes += size
+
+        if total_bytes > self.max_bytes:
+            for _, size, path in sorted(entries):
+                if total_bytes <= self.max_bytes * EVICT_TO_FRACTION:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total_bytes -= size
+        self._total_bytes = total_bytes
+
+    def clear(self):
+        """Delete every cached entry"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self._total_bytes = 0
@@ -5,15 +5,24 @@ Scenario: Create an audit engagement overview presentation
 """
 
 import anthropic
+import argparse
+import os
+import sys
+from typing import Optional
 
-def create_audit_presentation():
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils import ResponseCache, download_files, find_file_ids, print_download_report
+
+def create_audit_presentation(cache: Optional[ResponseCache] = None):
     """Generate a presentation for audit engagement kickoff"""
 
     client = anthropic.Anthropic()
+    cache = cache or ResponseCache.from_env()
 
     print("Creating audit engagement presentation...\n")
 
-    response = client.beta.messages.create(
+    response = cache.create(
+        client,
         model="claude-haiku-4-5-20251001",
         max_tokens=2048,
         betas=["code-execution-2025-08-25", "skills-2025-10-02", "files-api-2025-04-14"],
@@ -68,26 +77,21 @@ Make it professional with a clean, corporate design suitable for presenting to a
         ]
     )
 
-    # Extract file_id from response
-    file_id = None
-    for block in response.content:
-        if hasattr(block, 'file_id') and block.file_id:
-            file_id = block.file_id
-            break
+    # Extract every file_id from response
+    file_ids = find_file_ids(response)
 
-    if file_id:
-        print(f"File ID found: {file_id}")
+    if file_ids:
+        print(f"File IDs found: {', '.join(file_ids)}")
         print("Downloading presentation...\n")
 
-        # Download the file
-        file_content = client.beta.files.retrieve_content(file_id)
-
-        output_filename = "audit_engagement_presentation.pptx"
-        with open(output_filename, 'wb') as f:
-            f.write(file_content)
+        # Stream the files to disk; the first is the presentation itself
+        downloads = download_files(client, response, primary_filename="audit_engagement_presentation.pptx",
+                                   cache=cache)
+        print_download_report(downloads)
 
+        output_filename = downloads[0].path
         print(f"✓ Success! Presentation saved to: {output_filename}")
-        print(f"  File size: {len(file_content) / 1024:.1f} KB")
+        print(f"  File size: {downloads[0].size / 1024:.1f} KB")
 
         return output_filename
     else:
@@ -95,4 +99,9 @@ Make it professional with a clean, corporate design suitable for presenting to a
         return None
 
 if __name__ == "__main__":
-    create_audit_presentation()
+    parser = argparse.ArgumentParser(description="Generate the audit engagement kickoff presentation")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Call the API even when a cached response exists")
+    args = parser.parse_args()
+
+    create_audit_presentation(ResponseCache.from_env(bypass=args.no_cache))
@@ -2,18 +2,94 @@
 Phase 1, Example 2: Excel Workpaper Generation
 Purpose: Learn to generate audit workpapers using the XLSX skill
 Scenario: Create a bank reconciliation workpaper template
+
+Given the month's bank statement and cash ledger exports (--bank, --book), the
+transactions are matched locally by bank_reconciliation and the workpaper is
+built from the real open items instead of sample data.
+
+Usage:
+    python 02_basic_xlsx.py
+    python 02_basic_xlsx.py --bank bank_statement.csv --book cash_ledger.csv --bank-balance 1245680.50 --book-balance 1297430.50
 """
 
 import anthropic
+import argparse
+import os
+import sys
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils import ResponseCache, download_files, find_file_ids, print_download_report
+from bank_reconciliation import (Reconciliation, load_transactions, open_items, print_reconciliation_report,
+                                 reconcile, summarize_reconciliation)
 
-def create_bank_reconciliation_workpaper():
+# Open items listed individually in the prompt; the rest are summarized by count and total
+MAX_ITEMS_LISTED = 25
+
+SAMPLE_ITEMS = """Include these sections with sample data:
+1. Bank Balance per Statement: $1,245,680.50
+2. Add: Deposits in Transit
+   - Dec 30: $45,000
+   - Dec 31: $32,500
+3. Less: Outstanding Checks
+   - Check #8843: $12,300
+   - Check #8851: $8,750
+   - Check #8856: $5,200
+4. Adjusted Bank Balance: [formula]
+5. Book Balance per GL: $1,297,430.50
+6. Adjustments to Book Balance: [section for entries]
+7. Adjusted Book Balance: [formula]
+8. Difference: [formula - should be $0]"""
+
+
+def describe_items(items: list, label: str, signed: bool = False) -> str:
+    """Open items as prompt lines, largest first, with the remainder summarized"""
+    amount = (lambda value: value) if signed else abs
+    lines = [f"   - {item['date']} {item['reference'] or item['description']}: ${amount(item['amount']):,.2f}"
+             for item in items[:MAX_ITEMS_LISTED]]
+    if len(items) > MAX_ITEMS_LISTED:
+        rest = items[MAX_ITEMS_LISTED:]
+        lines.append(f"   - {len(rest):,} further {label} totalling ${sum(amount(item['amount']) for item in rest):,.2f}")
+    return "\n".join(lines) if lines else "   - None"
+
+
+def describe_reconciliation(result: Reconciliation, bank_balance: float, book_balance: float) -> str:
+    """The matched reconciliation's open items, as the prompt's reconciliation section"""
+    summary = summarize_reconciliation(result)
+    matched = ", ".join(f"{counts['bank']:,} {name.replace('_', ' ')}"
+                        for name, counts in summary["matched_by_pass"].items() if counts["bank"])
+    suspects = "\n".join(f"   - {item.side} row {item.index + 1}: {item.reason}"
+                          for item in result.suspects[:MAX_ITEMS_LISTED]) or "   - None"
+    return f"""Use these figures, produced by matching {summary['bank_items']:,} bank lines to {summary['book_items']:,} book entries ({matched}):
+1. Bank Balance per Statement: ${bank_balance:,.2f}
+2. Add: Deposits in Transit ({summary['deposits_in_transit']['count']:,} items, ${summary['deposits_in_transit']['total']:,.2f})
+{describe_items(open_items(result, "book", 1), "deposits")}
+3. Less: Outstanding Checks ({summary['outstanding_checks']['count']:,} items, ${-summary['outstanding_checks']['total']:,.2f})
+{describe_items(open_items(result, "book", -1), "checks")}
+4. Adjusted Bank Balance: [formula]
+5. Book Balance per GL: ${book_balance:,.2f}
+6. Adjustments to Book Balance (bank items not in the books, {summary['unmatched_bank']['count']:,} items):
+{describe_items(open_items(result, "bank"), "bank items", signed=True)}
+7. Adjusted Book Balance: [formula]
+8. Difference: [formula - should be $0]
+
+Items for the reviewer (list them on Sheet 4 under "Review for unusual items"):
+{suspects}"""
+
+
+def create_bank_reconciliation_workpaper(result: Optional[Reconciliation] = None, bank_balance: float = 1245680.50,
+                                         book_balance: float = 1297430.50, cache: Optional[ResponseCache] = None):
     """Generate an Excel workpaper for bank reconciliation testing"""
 
     client = anthropic.Anthropic()
+    cache = cache or ResponseCache.from_env()
+
+    items = describe_reconciliation(result, bank_balance, book_balance) if result else SAMPLE_ITEMS
 
     print("Creating bank reconciliation workpaper...\n")
 
-    response = client.beta.messages.create(
+    response = cache.create(
+        client,
         model="claude-haiku-4-5-20251001",
         max_tokens=3096,
         betas=["code-execution-2025-08-25", "skills-2025-10-02", "files-api-2025-04-14"],
@@ -35,7 +111,7 @@ def create_bank_reconciliation_workpaper():
         messages=[
             {
                 "role": "user",
-                "content": """Create a professional audit workpaper in Excel for bank reconciliation testing with the following structure:
+                "content": f"""Create a professional audit workpaper in Excel for bank reconciliation testing with the following structure:
 
 Sheet 1 - "Bank Reconciliation":
 Client: Example Corporation
@@ -44,20 +120,7 @@ Period End: December 31, 2024
 Prepared by: [blank]
 Reviewed by: [blank]
 
-Include these sections with sample data:
-1. Bank Balance per Statement: $1,245,680.50
-2. Add: Deposits in Transit
-   - Dec 30: $45,000
-   - Dec 31: $32,500
-3. Less: Outstanding Checks
-   - Check #8843: $12,300
-   - Check #8851: $8,750
-   - Check #8856: $5,200
-4. Adjusted Bank Balance: [formula]
-5. Book Balance per GL: $1,297,430.50
-6. Adjustments to Book Balance: [section for entries]
-7. Adjusted Book Balance: [formula]
-8. Difference: [formula - should be $0]
+{items}
 
 Sheet 2 - "Outstanding Checks Detail":
 List outstanding checks with columns:
@@ -95,26 +158,21 @@ Use professional formatting with:
         ]
     )
 
-    # Extract file_id from response
-    file_id = None
-    for block in response.content:
-        if hasattr(block, 'file_id') and block.file_id:
-            file_id = block.file_id
-            break
+    # Extract every file_id from response
+    file_ids = find_file_ids(response)
 
-    if file_id:
-        print(f"File ID found: {file_id}")
+    if file_ids:
+        print(f"File IDs found: {', '.join(file_ids)}")
         print("Downloading workpaper...\n")
 
-        # Download the file
-        file_content = client.beta.files.retrieve_content(file_id)
-
-        output_filename = "bank_reconciliation_workpaper.xlsx"
-        with open(output_filename, 'wb') as f:
-            f.write(file_content)
+        # Stream the files to disk; the first is the workpaper itself
+        downloads = download_files(client, response, primary_filename="bank_reconciliation_workpaper.xlsx",
+                                   cache=cache)
+        print_download_report(downloads)
 
+        output_filename = downloads[0].path
         print(f"✓ Success! Workpaper saved to: {output_filename}")
-        print(f"  File size: {len(file_content) / 1024:.1f} KB")
+        print(f"  File size: {downloads[0].size / 1024:.1f} KB")
 
         return output_filename
     else:
@@ -122,4 +180,29 @@ Use professional formatting with:
         return None
 
 if __name__ == "__main__":
-    create_bank_reconciliation_workpaper()
+    parser = argparse.ArgumentParser(description="Generate the bank reconciliation workpaper")
+    parser.add_argument("--bank", help="Bank statement CSV to reconcile (Date, Amount, Reference, Description)")
+    parser.add_argument("--book", help="Cash ledger CSV for the same account and month")
+    parser.add_argument("--bank-balance", type=float, default=1245680.50, help="Balance per bank statement")
+    parser.add_argument("--book-balance", type=float, default=1297430.50, help="Balance per general ledger")
+    parser.add_argument("--date-window", type=int, default=5, help="Days either side for date-window matches")
+    parser.add_argument("--amount-tolerance", type=float, default=0.0, help="Largest amount difference matched")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Call the API even when a cached response exists")
+    args = parser.parse_args()
+
+    result = None
+    if args.bank or args.book:
+        if not (args.bank and args.book):
+            print("✗ --bank and --book are needed together")
+            sys.exit(1)
+        references = {}
+        try:
+            result = reconcile(load_transactions(args.bank, references), load_transactions(args.book, references),
+                               args.date_window, round(args.amount_tolerance * 100))
+        except (OSError, ValueError) as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        print_reconciliation_report(summarize_reconciliation(result), result)
+    create_bank_reconciliation_workpaper(result, args.bank_balance, args.book_balance,
+                                         ResponseCache.from_env(bypass=args.no_cache))
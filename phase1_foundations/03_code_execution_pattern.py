@@ -2,18 +2,101 @@
 Phase 1, Example 3: Code Execution with Skills
 Purpose: Learn to manipulate data with code execution before generating documents
 Scenario: Calculate audit sampling sizes and generate Excel documentation
+
+Sample sizes come from audit_sampling (cached AICPA-style tables, computed
+locally). Given ledger exports (--ledger), the items themselves are selected
+locally too by sample_selection; otherwise code execution generates them.
+
+Usage:
+    python 03_code_execution_pattern.py
+    python 03_code_execution_pattern.py --ledger "Revenue Transactions=revenue.csv" --seed 2024
 """
 
 import anthropic
-
-def create_sampling_workpaper():
+import argparse
+import csv
+import io
+import os
+import sys
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils import ResponseCache, download_files, find_file_ids, print_download_report
+from audit_sampling import SamplePlan, plan_sample, print_plans
+from sample_selection import select_sample
+
+# Populations to sample: (name, items, book value, risk, expected rate, confidence, tolerable rate)
+POPULATIONS = [
+    ("Revenue Transactions", 8450, 12_500_000, "High", 0.02, 0.95, 0.05),
+    ("Accounts Payable", 2340, 3_200_000, "Medium", 0.01, 0.95, 0.05),
+    ("Fixed Asset Additions", 156, 2_800_000, "Low", 0.0, 0.90, 0.05),
+]
+
+
+def describe_plan(number: int, plan: SamplePlan) -> str:
+    """One population and its computed sample sizes, as prompt text"""
+    if plan.attribute_size is None:
+        attribute = "not feasible (expected rate too close to tolerable rate) - test 100%"
+    else:
+        attribute = f"{plan.attribute_size} items ({plan.allowed_deviations} deviation(s) allowed)"
+    lines = [
+        f"Population {number} - {plan.name}:",
+        f"- Total population: {plan.items:,} items",
+        f"- Total dollar value: ${plan.book_value:,.0f}",
+        f"- Risk assessment: {plan.risk}",
+        f"- Expected error rate: {plan.expected_rate:.0%}",
+        f"- Confidence level: {plan.confidence:.0%}",
+        f"- Tolerable error rate: {plan.tolerable_rate:.0%}",
+        f"- Attribute sample size (binomial): {attribute}",
+        f"- Poisson approximation: {plan.poisson_size} items",
+    ]
+    if plan.mus_size:
+        lines.append(f"- MUS sample size: {plan.mus_size} (sampling interval ${plan.sampling_interval:,.0f})")
+    lines.append(f"- Selection method: {plan.selection_method}")
+    return "\n".join(lines)
+
+
+def select_from_ledgers(plans: List[SamplePlan], ledgers: Dict[str, str], seed: int) -> str:
+    """Select each plan's items from its ledger export, as prompt text (CSV per population)"""
+    sections = []
+    for plan in plans:
+        ledger_file = ledgers.get(plan.name)
+        if not ledger_file:
+            continue
+        method = "systematic" if plan.selection_method == "systematic" else "random"
+        size = plan.attribute_size or plan.items
+        header, selections = select_sample(ledger_file, method, size, seed)
+        print(f"✓ {plan.name}: {len(selections)} items selected from {ledger_file} ({method}, seed {seed})")
+
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(["Sample #", "Ledger Row", *header])
+        for number, selection in enumerate(selections, 1):
+            writer.writerow([number, selection.row_number, *selection.row])
+        sections.append(f"{plan.name} - {method} selection, seed {seed}:\n{text.getvalue()}")
+    return "\n".join(sections)
+
+
+def create_sampling_workpaper(ledgers: Optional[Dict[str, str]] = None, seed: int = 2024,
+                              cache: Optional[ResponseCache] = None):
     """Use code execution to calculate statistical samples, then generate Excel workpaper"""
 
     client = anthropic.Anthropic()
+    cache = cache or ResponseCache.from_env()
+
+    plans = [plan_sample(name, items, value, confidence, tolerable, expected, risk)
+             for name, items, value, risk, expected, confidence, tolerable in POPULATIONS]
+    print_plans(plans)
+    populations = "\n\n".join(describe_plan(number, plan) for number, plan in enumerate(plans, 1))
+    selected = select_from_ledgers(plans, ledgers or {}, seed)
+    if selected:
+        populations += ("\n\nThese items were selected from the client's ledgers. Use them for the "
+                        "selection sheets instead of generating selections:\n\n" + selected)
 
-    print("Calculating audit samples and generating workpaper...\n")
+    print("Generating workpaper...\n")
 
-    response = client.beta.messages.create(
+    response = cache.create(
+        client,
         model="claude-haiku-4-5-20251001",
         max_tokens=4096,
         betas=["code-execution-2025-08-25", "skills-2025-10-02", "files-api-2025-04-14"],
@@ -35,40 +118,18 @@ def create_sampling_workpaper():
         messages=[
             {
                 "role": "user",
-                "content": """You are assisting with audit sampling calculations.
-
-First, use code execution to calculate appropriate sample sizes for these audit populations:
-
-Population 1 - Revenue Transactions:
-- Total population: 8,450 transactions
-- Total dollar value: $12,500,000
-- Risk assessment: High
-- Expected error rate: 2%
-- Confidence level: 95%
-- Tolerable error rate: 5%
-
-Population 2 - Accounts Payable:
-- Total population: 2,340 invoices
-- Total dollar value: $3,200,000
-- Risk assessment: Medium
-- Expected error rate: 1%
-- Confidence level: 95%
-- Tolerable error rate: 5%
-
-Population 3 - Fixed Asset Additions:
-- Total population: 156 additions
-- Total dollar value: $2,800,000
-- Risk assessment: Low
-- Expected error rate: 0%
-- Confidence level: 90%
-- Tolerable error rate: 5%
-
-Use the attribute sampling formula for calculating sample sizes. For populations under 250 items with low risk, use 100% testing or systematic selection.
-
-After calculating sample sizes, create an Excel workpaper with:
+                "content": f"""You are assisting with audit sampling calculations.
+
+These sample sizes were calculated with the AICPA attribute sampling tables
+(MUS sizes use the Poisson reliability factor and AICPA expansion factors).
+Use them exactly as given; do not recalculate them.
+
+{populations}
+
+Use code execution to create an Excel workpaper with:
 
 Sheet 1 - "Sampling Summary":
-- Table showing all three populations with calculated sample sizes
+- Table showing all three populations with the sample sizes above
 - Methodology notes
 - Sample selection method (random, systematic, or judgmental)
 - Preparer and reviewer signature blocks
@@ -76,7 +137,7 @@ Sheet 1 - "Sampling Summary":
 Sheet 2 - "Revenue Sample Selection":
 - Column headers: Sample #, Transaction ID, Date, Customer, Amount, Selected for Testing
 - Generate random sample selections based on calculated size
-- Include formulas for sample size calculation
+- One row per selected item, up to the sample size above
 
 Sheet 3 - "AP Sample Selection":
 - Similar structure for AP testing
@@ -87,7 +148,7 @@ Sheet 4 - "Fixed Assets Selection":
 Sheet 5 - "Methodology":
 - Explain attribute sampling
 - Document risk assessments
-- Show formulas used
+- Show the sample sizes, reliability and expansion factors used
 - Reference AICPA Audit Sampling Guide
 
 Format professionally with:
@@ -99,27 +160,25 @@ Format professionally with:
         ]
     )
 
-    # Extract file_id from response
-    file_id = None
+    # Extract every file_id from response
     print("Response content blocks:")
     for i, block in enumerate(response.content):
         print(f"  Block {i}: {block.type}")
-        if hasattr(block, 'file_id') and block.file_id:
-            file_id = block.file_id
-            print(f"    ↳ File ID: {file_id}")
+    file_ids = find_file_ids(response)
+    for file_id in file_ids:
+        print(f"    ↳ File ID: {file_id}")
 
-    if file_id:
+    if file_ids:
         print(f"\nDownloading workpaper...\n")
 
-        # Download the file
-        file_content = client.beta.files.retrieve_content(file_id)
-
-        output_filename = "audit_sampling_workpaper.xlsx"
-        with open(output_filename, 'wb') as f:
-            f.write(file_content)
+        # Stream the files to disk; the first is the workpaper itself
+        downloads = download_files(client, response, primary_filename="audit_sampling_workpaper.xlsx",
+                                   cache=cache)
+        print_download_report(downloads)
 
+        output_filename = downloads[0].path
         print(f"✓ Success! Sampling workpaper saved to: {output_filename}")
-        print(f"  File size: {len(file_content) / 1024:.1f} KB")
+        print(f"  File size: {downloads[0].size / 1024:.1f} KB")
 
         return output_filename
     else:
@@ -132,4 +191,17 @@ Format professionally with:
         return None
 
 if __name__ == "__main__":
-    create_sampling_workpaper()
+    parser = argparse.ArgumentParser(description="Calculate audit samples and generate the sampling workpaper")
+    parser.add_argument("--ledger", action="append", default=[], metavar="POPULATION=FILE",
+                        help="Select a population's items from its ledger export (CSV or Parquet); repeatable")
+    parser.add_argument("--seed", type=int, default=2024, help="Random seed for ledger selections")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Call the API even when a cached response exists")
+    args = parser.parse_args()
+
+    ledgers = dict(entry.split("=", 1) for entry in args.ledger if "=" in entry)
+    unknown = set(ledgers) - {population[0] for population in POPULATIONS}
+    if unknown:
+        print(f"✗ Unknown population(s): {', '.join(sorted(unknown))}")
+        sys.exit(1)
+    create_sampling_workpaper(ledgers, args.seed, ResponseCache.from_env(bypass=args.no_cache))
@@ -0,0 +1,249 @@
+"""
+Statistical audit sampling
+Purpose: Size attribute and monetary-unit samples locally, from cached tables
+Scenario: Hundreds of populations per engagement need reproducible sample sizes
+          without a model working them out each time
+
+Attribute sampling follows the AICPA Audit Sampling Guide approach: the sample
+size is the smallest n whose upper deviation limit, given the deviations the
+expected rate allows for (ceil(n x expected rate)), is within the tolerable
+rate at the chosen confidence. The limit uses the binomial distribution
+(the AICPA tables) or its Poisson approximation.
+
+The smallest n that tolerates k deviations grows with k, so each is found by
+bisection starting from the one before and cached per (confidence, tolerable
+rate, k, method); sizing a population walks k up from 0 over cached entries.
+Whole tables over the usual grid of expected rates are cached the same way.
+
+Monetary-unit sampling (MUS) sizes use n = BV x RF / (TM - EM x EF): the
+Poisson reliability factor for zero misstatements and the AICPA expansion
+factor for the risk of incorrect acceptance.
+
+Usage:
+    python audit_sampling.py                       # 95% confidence attribute table
+    python audit_sampling.py --confidence 0.90 --method poisson
+"""
+
+import argparse
+import math
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Largest sample considered; an expected rate this close to the tolerable rate is not worth sampling
+MAX_SAMPLE_SIZE = 5000
+
+# AICPA expansion factors for expected misstatement, keyed by risk of incorrect acceptance (%)
+EXPANSION_FACTORS = {1: 1.9, 5: 1.6, 10: 1.5, 15: 1.4, 20: 1.3, 25: 1.25, 30: 1.2, 37: 1.15, 50: 1.0}
+
+# The grid the printed tables cover (rates as fractions)
+TABLE_TOLERABLE_RATES = (0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08, 0.09, 0.10, 0.15, 0.20)
+TABLE_EXPECTED_RATES = (0.0, 0.0025, 0.005, 0.0075, 0.01, 0.0125, 0.015, 0.0175, 0.02, 0.025,
+                        0.03, 0.035, 0.04, 0.05, 0.06, 0.07)
+
+# Populations this small and low risk are tested in full or selected systematically
+SMALL_POPULATION = 250
+
+METHODS = ("binomial", "poisson")
+
+
+class AttributeSize(NamedTuple):
+    """An attribute sample size and the deviations it tolerates"""
+    sample_size: int
+    allowed_deviations: int
+
+
+class SamplePlan(NamedTuple):
+    """Sample sizes for one population"""
+    name: str
+    items: int
+    book_value: float
+    risk: str
+    confidence: float
+    tolerable_rate: float
+    expected_rate: float
+    attribute_size: Optional[int]        # binomial; None when the expected rate is too close to the tolerable rate
+    allowed_deviations: Optional[int]
+    poisson_size: Optional[int]
+    mus_size: Optional[int]              # None when not feasible or no expansion factor is listed for the confidence
+    sampling_interval: Optional[float]   # book value per MUS selection
+    selection_method: str                # "random", "systematic" or "100% testing"
+
+
+def _binomial_cdf(k: int, n: int, p: float) -> float:
+    """P(X <= k) for X ~ Binomial(n, p), summed in log space"""
+    log_p, log_q = math.log(p), math.log1p(-p)
+    log_n = math.lgamma(n + 1)
+    return sum(math.exp(log_n - math.lgamma(i + 1) - math.lgamma(n - i + 1) + i * log_p + (n - i) * log_q)
+               for i in range(k + 1))
+
+
+def _poisson_cdf(k: int, mean: float) -> float:
+    """P(X <= k) for X ~ Poisson(mean)"""
+    term = total = math.exp(-mean)
+    for i in range(1, k + 1):
+        term *= mean / i
+        total += term
+    return total
+
+
+def _check_rates(confidence: float, tolerable_rate: float, method: str):
+    if not 0 < confidence < 1:
+        raise ValueError(f"Confidence must be between 0 and 1, got {confidence}")
+    if not 0 < tolerable_rate < 1:
+        raise ValueError(f"Tolerable rate must be between 0 and 1, got {tolerable_rate}")
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}' (expected one of {', '.join(METHODS)})")
+
+
+@lru_cache(maxsize=None)
+def deviation_size(confidence: float, tolerable_rate: float, deviations: int,
+                   method: str = "binomial") -> Optional[int]:
+    """
+    Smallest sample size that tolerates `deviations` deviations (cached), or None above MAX_SAMPLE_SIZE
+    The size grows with the deviations, so the search starts from the size for one fewer.
+    """
+    _check_rates(confidence, tolerable_rate, method)
+    risk = 1 - confidence
+
+    def within(n: int) -> bool:
+        if method == "poisson":
+            return _poisson_cdf(deviations, n * tolerable_rate) <= risk
+        return _binomial_cdf(deviations, n, tolerable_rate) <= risk
+
+    low = deviation_size(confidence, tolerable_rate, deviations - 1, method) if deviations else 1
+    high = MAX_SAMPLE_SIZE
+    if low is None or not within(high):
+        return None
+    while low < high:
+        middle = (low + high) // 2
+        if within(middle):
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def attribute_sample_size(confidence: float, tolerable_rate: float, expected_rate: float,
+                          method: str = "binomial") -> Optional[AttributeSize]:
+    """
+    Attribute sample size for a large population, or None if the expected rate leaves no room
+    A sample of n expects ceil(n x expected rate) deviations; the answer is the
+    smallest n at least as large as the size that tolerates that many.
+    """
+    if not 0 <= expected_rate < 1:
+        raise ValueError(f"Expected rate must be between 0 and 1, got {expected_rate}")
+    deviations = 0
+    while True:
+        n = deviation_size(confidence, tolerable_rate, deviations, method)
+        if n is None:
+            return None
+        if expected_rate == 0:
+            return AttributeSize(n, 0)
+        # Sizes whose expected deviations round up to exactly k lie in ((k - 1) / rate, k / rate]
+        if deviations:
+            n = max(n, math.floor((deviations - 1) / expected_rate) + 1)
+        if math.ceil(n * expected_rate - 1e-9) <= deviations:
+            return AttributeSize(n, deviations)
+        deviations += 1
+
+
+@lru_cache(maxsize=None)
+def attribute_table(confidence: float, method: str = "binomial") -> Dict[Tuple[float, float], Optional[AttributeSize]]:
+    """Sample sizes over TABLE_EXPECTED_RATES x TABLE_TOLERABLE_RATES, keyed (expected, tolerable) (cached)"""
+    return {(expected, tolerable): attribute_sample_size(confidence, tolerable, expected, method)
+            for expected in TABLE_EXPECTED_RATES for tolerable in TABLE_TOLERABLE_RATES}
+
+
+def reliability_factor(confidence: float) -> float:
+    """Poisson upper limit for zero misstatements at a confidence level (3.0 at 95%)"""
+    return -math.log(1 - confidence)
+
+
+def expansion_factor(confidence: float) -> float:
+    """AICPA expansion factor for the risk of incorrect acceptance (1 - confidence)"""
+    risk = round((1 - confidence) * 100)
+    if risk not in EXPANSION_FACTORS:
+        listed = ", ".join(f"{100 - r}%" for r in sorted(EXPANSION_FACTORS))
+        raise ValueError(f"No expansion factor for {confidence:.0%} confidence (listed: {listed})")
+    return EXPANSION_FACTORS[risk]
+
+
+def mus_sample_size(book_value: float, tolerable_misstatement: float, expected_misstatement: float,
+                    confidence: float) -> Optional[int]:
+    """Monetary-unit sample size, or None when expected misstatement uses up the tolerable amount"""
+    headroom = tolerable_misstatement - expected_misstatement * expansion_factor(confidence)
+    if book_value <= 0 or headroom <= 0:
+        return None
+    return math.ceil(book_value * reliability_factor(confidence) / headroom)
+
+
+def plan_sample(name: str, items: int, book_value: float, confidence: float, tolerable_rate: float,
+                expected_rate: float, risk: str = "medium") -> SamplePlan:
+    """Attribute (binomial and Poisson) and MUS sizes for one population, capped at its size"""
+    binomial = attribute_sample_size(confidence, tolerable_rate, expected_rate, "binomial")
+    poisson = attribute_sample_size(confidence, tolerable_rate, expected_rate, "poisson")
+    try:
+        mus = mus_sample_size(book_value, tolerable_rate * book_value, expected_rate * book_value, confidence)
+    except ValueError:
+        # The AICPA table only lists some confidence levels; attribute sizes work for any
+        mus = None
+
+    attribute_size = min(binomial.sample_size, items) if binomial else None
+    if attribute_size is None or attribute_size >= items:
+        method = "100% testing"
+    elif items < SMALL_POPULATION and risk.lower() == "low":
+        method = "systematic"
+    else:
+        method = "random"
+    return SamplePlan(
+        name=name, items=items, book_value=book_value, risk=risk, confidence=confidence,
+        tolerable_rate=tolerable_rate, expected_rate=expected_rate,
+        attribute_size=attribute_size,
+        allowed_deviations=binomial.allowed_deviations if binomial else None,
+        poisson_size=min(poisson.sample_size, items) if poisson else None,
+        mus_size=mus,
+        sampling_interval=book_value / mus if mus else None,
+        selection_method=method,
+    )
+
+
+def print_attribute_table(confidence: float, method: str = "binomial"):
+    """Print a table in the AICPA layout: sample size (allowed deviations), '*' where too large"""
+    table = attribute_table(confidence, method)
+    print("\n" + "="*60)
+    print(f"ATTRIBUTE SAMPLE SIZES - {confidence:.0%} confidence, {method}")
+    print("="*60)
+    print("Expected  " + "".join(f"{rate:>10.0%}" for rate in TABLE_TOLERABLE_RATES))
+    for expected in TABLE_EXPECTED_RATES:
+        cells = []
+        for tolerable in TABLE_TOLERABLE_RATES:
+            size = table[(expected, tolerable)]
+            cells.append(f"{size.sample_size}({size.allowed_deviations})" if size else "*")
+        print(f"{expected:>7.2%}   " + "".join(f"{cell:>10}" for cell in cells))
+    print("="*60 + "\n")
+
+
+def print_plans(plans: List[SamplePlan]):
+    print("\n" + "="*60)
+    print("SAMPLE PLANS")
+    print("="*60)
+    for plan in plans:
+        print(f"{plan.name}: {plan.items:,} items, ${plan.book_value:,.0f} ({plan.risk} risk)")
+        print(f"  {plan.confidence:.0%} confidence, tolerable {plan.tolerable_rate:.1%}, "
+              f"expected {plan.expected_rate:.2%}")
+        attribute = (f"{plan.attribute_size} ({plan.allowed_deviations} deviation(s) allowed)"
+                     if plan.attribute_size is not None else "not feasible")
+        print(f"  Attribute: {attribute}; Poisson: {plan.poisson_size}")
+        if plan.mus_size:
+            print(f"  MUS: {plan.mus_size} (interval ${plan.sampling_interval:,.0f})")
+        print(f"  Selection: {plan.selection_method}")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print attribute sampling tables")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level (default: 0.95)")
+    parser.add_argument("--method", choices=METHODS, default="binomial")
+    args = parser.parse_args()
+
+    print_attribute_table(args.confidence, args.method)
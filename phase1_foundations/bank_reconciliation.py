@@ -0,0 +1,429 @@
+"""
+Bank reconciliation matching
+Purpose: Match a month of bank statement lines to the cash ledger locally, at any volume
+Scenario: Reconcile hundreds of thousands of bank and book transactions a month
+          before the workpaper is drafted
+
+Both sides are loaded into NumPy columns: date (days since 1970-01-01), signed
+amount in integer cents (deposits/receipts positive, checks/withdrawals
+negative on both sides) and a normalized reference. Matching then runs in
+passes, each over what the previous ones left:
+
+1. exact: equal amount and reference, paired one-to-one earliest first. This
+   is a hash join done as one sort of both sides together.
+2. date_window: equal amount within --date-window days. Both sides are sorted
+   by (amount, date) and merged; each bank line takes the earliest unmatched
+   book entry in its window.
+3. amount_tolerance: the same merge, but amounts may differ by up to
+   --amount-tolerance. These matches are listed as suspect.
+4. grouped: many-to-one batched deposits. One bank deposit equals the total
+   of several unmatched book receipts sharing a deposit slip reference, or
+   failing that, the day's total.
+
+Unmatched book receipts are deposits in transit, and unmatched book payments are
+outstanding checks. Unmatched bank lines need book adjustments. Possible
+duplicates and stale checks are also listed as suspect.
+
+Usage:
+    python bank_reconciliation.py bank_statement.csv cash_ledger.csv
+    python bank_reconciliation.py bank.csv book.csv --date-window 7 --amount-tolerance 1.00 --output recon_detail.csv
+"""
+
+import argparse
+import csv
+import gc
+import itertools
+import sys
+import time
+from operator import itemgetter, methodcaller
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from sample_selection import parse_amount
+
+MATCH_PASSES = ("exact", "date_window", "amount_tolerance", "grouped")
+UNMATCHED = -1
+
+# Outstanding checks older than this at period end are listed as stale
+STALE_CHECK_DAYS = 180
+
+
+class Transactions(NamedTuple):
+    """One side of the reconciliation as columns, in file order"""
+    days: np.ndarray          # int64 days since 1970-01-01
+    cents: np.ndarray         # int64 signed amount in cents
+    references: np.ndarray    # int64 reference code; 0 = no reference
+    reference_text: List[str]
+    descriptions: List[str]
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+
+class SuspectItem(NamedTuple):
+    """An item the reviewer should look at"""
+    side: str                 # "bank" or "book"
+    index: int
+    reason: str
+
+
+class Reconciliation(NamedTuple):
+    """Matches as parallel arrays; a grouped deposit is one pair per book receipt"""
+    bank: Transactions
+    book: Transactions
+    pair_bank: np.ndarray     # bank index of each pair
+    pair_book: np.ndarray     # book index of each pair
+    pair_pass: np.ndarray     # index into MATCH_PASSES
+    bank_pass: np.ndarray     # per bank item: its match pass, or UNMATCHED
+    book_pass: np.ndarray
+    suspects: List[SuspectItem]
+
+
+def _reference_codes(reference_text: List[str], references: Dict[str, int]) -> np.ndarray:
+    """Normalized reference codes ("008843" and "8843" are the same check), with built-in maps throughout"""
+    references.setdefault("", 0)
+    normalized = map(methodcaller("lstrip", "0"), map(str.upper, map(str.strip, reference_text)))
+    # Existing references keep their code; new ones take the next numbers from the counter
+    counter = itertools.count(max(references.values()) + 1)
+    return np.fromiter(map(references.setdefault, normalized, counter), dtype=np.int64, count=len(reference_text))
+
+
+def load_transactions(csv_file: str, references: Dict[str, int], date_column: str = "Date",
+                      amount_column: str = "Amount", reference_column: str = "Reference",
+                      description_column: str = "Description") -> Transactions:
+    """
+    Read a bank statement or ledger export (ISO dates; reference and description columns optional)
+    `references` maps normalized references to codes and is shared by both sides,
+    so equal references get equal codes.
+    """
+    with open(csv_file, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        columns = {name: index for index, name in enumerate(header)}
+        for required in (date_column, amount_column):
+            if required not in columns:
+                raise ValueError(f"{csv_file}: no '{required}' column (columns: {', '.join(header)})")
+        # A million small lists would trigger repeated full collections while they are built
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            rows = list(reader)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def column(name: Optional[str]) -> List[str]:
+        index = columns.get(name)
+        if index is None:
+            return [""] * len(rows)
+        try:
+            return list(map(itemgetter(index), rows))
+        except IndexError:  # a short row; its missing cells are blank
+            return [row[index] if index < len(row) else "" for row in rows]
+
+    try:
+        days = np.array(column(date_column), dtype="datetime64[D]").astype(np.int64)
+    except ValueError as e:
+        raise ValueError(f"{csv_file}: dates must be YYYY-MM-DD ({e})") from None
+    amounts = column(amount_column)
+    try:
+        dollars = np.array(amounts, dtype=np.float64)
+    except ValueError:
+        dollars = np.array([parse_amount(amount) for amount in amounts], dtype=np.float64)
+    reference_text = column(reference_column)
+    return Transactions(days, np.rint(dollars * 100).astype(np.int64), _reference_codes(reference_text, references),
+                        reference_text, column(description_column))
+
+
+def _pair_equal(bank: Transactions, book: Transactions, bank_index: np.ndarray,
+                book_index: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pair items with equal (amount, reference) one-to-one, earliest with earliest
+    Both sides are sorted together by (amount, reference, side, date), so each key
+    is one run: its bank items by date, then its book items by date. The r-th
+    bank item of a run pairs with the r-th book item.
+    """
+    side = np.concatenate([np.zeros(len(bank_index), np.int8), np.ones(len(book_index), np.int8)])
+    index = np.concatenate([bank_index, book_index])
+    cents = np.concatenate([bank.cents[bank_index], book.cents[book_index]])
+    references = np.concatenate([bank.references[bank_index], book.references[book_index]])
+    days = np.concatenate([bank.days[bank_index], book.days[book_index]])
+    if not len(index):
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+
+    order = np.lexsort((days, side, references, cents))
+    cents, references, side, index = cents[order], references[order], side[order], index[order]
+    run_start = np.ones(len(order), dtype=bool)
+    run_start[1:] = (cents[1:] != cents[:-1]) | (references[1:] != references[:-1])
+    starts = np.flatnonzero(run_start)
+    run_banks = np.add.reduceat(side == 0, starts)
+    run_books = np.diff(np.append(starts, len(order))) - run_banks
+
+    run = np.cumsum(run_start) - 1
+    rank = np.arange(len(order)) - starts[run]   # position among the run's bank items
+    paired = (side == 0) & (rank < run_books[run])
+    partner = starts[run] + run_banks[run] + rank
+    return index[paired], index[partner[paired]]
+
+
+def _pair_in_window(bank_index: np.ndarray, bank_cents: np.ndarray, bank_days: np.ndarray,
+                    book_index: np.ndarray, book_cents: np.ndarray, book_days: np.ndarray,
+                    window_days: int, tolerance_cents: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sorted merge: each bank item (in date order) takes the earliest free book item
+    within the date window, at the nearest amount within the tolerance
+    Book items are sorted by (amount, date) into one int64 key, so every amount's
+    date window is a contiguous slice found by bisection; a next-free pointer
+    skips book items already taken.
+    """
+    if not len(bank_index) or not len(book_index):
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    first_day = min(bank_days.min(), book_days.min()) - window_days
+    span = int(max(bank_days.max(), book_days.max()) - first_day) + window_days + 1
+    book_keys = book_cents * span + (book_days - first_day)
+    order = np.argsort(book_keys, kind="stable")
+    book_keys, book_index, book_cents = book_keys[order], book_index[order], book_cents[order]
+    amounts = np.unique(book_cents)
+
+    free = list(range(len(book_keys) + 1))  # free[j]: next untaken position >= j (path-compressed)
+
+    def next_free(j: int) -> int:
+        root = j
+        while free[root] != root:
+            root = free[root]
+        while free[j] != root:
+            free[j], j = root, free[j]
+        return root
+
+    bank_keys = bank_cents * span + (bank_days - first_day)
+    if not tolerance_cents:
+        # One amount per bank item, so every window is found in one vectorized bisection
+        starts = np.searchsorted(book_keys, bank_keys - window_days).tolist()
+        ends = np.searchsorted(book_keys, bank_keys + window_days + 1).tolist()
+
+    book_positions = book_index.tolist()
+    bank_positions = bank_index.tolist()
+    paired_bank, paired_book = [], []
+    for position in np.argsort(bank_days, kind="stable").tolist():
+        if tolerance_cents:
+            cents, key = int(bank_cents[position]), int(bank_keys[position])
+            low, high = np.searchsorted(amounts, [cents - tolerance_cents, cents + tolerance_cents + 1])
+            windows = [np.searchsorted(book_keys, [key + (amount - cents) * span - window_days,
+                                                   key + (amount - cents) * span + window_days + 1]).tolist()
+                       for amount in sorted(amounts[low:high].tolist(), key=lambda amount: abs(amount - cents))]
+        else:
+            windows = [(starts[position], ends[position])]
+        for start, end in windows:
+            match = next_free(start)
+            if match < end:
+                free[match] = match + 1
+                paired_bank.append(bank_positions[position])
+                paired_book.append(book_positions[match])
+                break
+    return np.array(paired_bank, dtype=np.int64), np.array(paired_book, dtype=np.int64)
+
+
+def _pair_grouped(bank: Transactions, book: Transactions, bank_index: np.ndarray, book_index: np.ndarray,
+                  window_days: int, by_reference: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bank deposits equal to the total of two or more unmatched book receipts
+    Receipts are batched by (date, deposit slip reference) when by_reference is set,
+    otherwise by date alone.
+    """
+    book_index = book_index[book.cents[book_index] > 0]
+    if by_reference:
+        book_index = book_index[book.references[book_index] != 0]
+    bank_index = bank_index[bank.cents[bank_index] > 0]
+    if not len(book_index) or not len(bank_index):
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    batch_keys = book.days[book_index]
+    if by_reference:
+        batch_keys = batch_keys * (int(book.references[book_index].max()) + 1) + book.references[book_index]
+    _, first, batch_of, batch_sizes = np.unique(batch_keys, return_index=True, return_inverse=True,
+                                                return_counts=True)
+    batch_days = book.days[book_index[first]]
+    batch_cents = np.bincount(batch_of, weights=book.cents[book_index]).round().astype(np.int64)
+    batches = np.flatnonzero(batch_sizes > 1)
+
+    # Book deposits are recorded on or before the day the bank credits them
+    shift = (window_days + 1) // 2
+    paired_bank, paired_batch = _pair_in_window(
+        bank_index, bank.cents[bank_index], bank.days[bank_index] - shift,
+        batches, batch_cents[batches], batch_days[batches], shift, 0)
+    bank_of_batch = np.full(len(batch_sizes), UNMATCHED, dtype=np.int64)
+    bank_of_batch[paired_batch] = paired_bank
+    grouped = bank_of_batch[batch_of] != UNMATCHED
+    return bank_of_batch[batch_of][grouped], book_index[grouped]
+
+
+def _duplicates(side: str, items: Transactions) -> List[SuspectItem]:
+    """Items repeating another's date, amount and (non-empty) reference on the same side"""
+    keyed = np.flatnonzero(items.references != 0)
+    order = keyed[np.lexsort((items.days[keyed], items.references[keyed], items.cents[keyed]))]
+    repeat = ((items.cents[order[1:]] == items.cents[order[:-1]])
+              & (items.references[order[1:]] == items.references[order[:-1]])
+              & (items.days[order[1:]] == items.days[order[:-1]]))
+    return [SuspectItem(side, int(index), "possible duplicate (same date, amount and reference)")
+            for index in order[1:][repeat].tolist()]
+
+
+def reconcile(bank: Transactions, book: Transactions, window_days: int = 5,
+              tolerance_cents: int = 0) -> Reconciliation:
+    """Run the matching passes in order, each over the items the previous ones left"""
+    bank_pass = np.full(len(bank), UNMATCHED, dtype=np.int8)
+    book_pass = np.full(len(book), UNMATCHED, dtype=np.int8)
+    pairs_bank, pairs_book, pairs_pass = [], [], []
+
+    def record(pass_name: str, matched_bank: np.ndarray, matched_book: np.ndarray):
+        code = MATCH_PASSES.index(pass_name)
+        bank_pass[matched_bank] = code
+        book_pass[matched_book] = code
+        pairs_bank.append(matched_bank)
+        pairs_book.append(matched_book)
+        pairs_pass.append(np.full(len(matched_book), code, dtype=np.int8))
+
+    def open_items() -> Tuple[np.ndarray, np.ndarray]:
+        return np.flatnonzero(bank_pass == UNMATCHED), np.flatnonzero(book_pass == UNMATCHED)
+
+    # Items without a reference are left to the date-window pass
+    bank_open, book_open = open_items()
+    record("exact", *_pair_equal(bank, book, bank_open[bank.references[bank_open] != 0],
+                                 book_open[book.references[book_open] != 0]))
+
+    merge_passes = [("date_window", 0)] + ([("amount_tolerance", tolerance_cents)] if tolerance_cents else [])
+    for pass_name, tolerance in merge_passes:
+        bank_open, book_open = open_items()
+        record(pass_name, *_pair_in_window(bank_open, bank.cents[bank_open], bank.days[bank_open],
+                                           book_open, book.cents[book_open], book.days[book_open],
+                                           window_days, tolerance))
+
+    for by_reference in (True, False):
+        bank_open, book_open = open_items()
+        record("grouped", *_pair_grouped(bank, book, bank_open, book_open, window_days, by_reference))
+
+    pair_bank, pair_book, pair_pass = (np.concatenate(parts) for parts in (pairs_bank, pairs_book, pairs_pass))
+
+    suspects = _duplicates("bank", bank) + _duplicates("book", book)
+    tolerance_pairs = np.flatnonzero(pair_pass == MATCH_PASSES.index("amount_tolerance"))
+    for bank_index, book_index in zip(pair_bank[tolerance_pairs].tolist(), pair_book[tolerance_pairs].tolist()):
+        difference = (bank.cents[bank_index] - book.cents[book_index]) / 100
+        suspects.append(SuspectItem("bank", bank_index, f"matched to book row {book_index + 1} "
+                                                        f"with an amount difference of ${difference:,.2f}"))
+    if len(book):
+        period_end = max(bank.days.max() if len(bank) else book.days.max(), book.days.max())
+        stale = np.flatnonzero((book_pass == UNMATCHED) & (book.cents < 0)
+                               & (book.days < period_end - STALE_CHECK_DAYS))
+        suspects.extend(SuspectItem("book", int(index), f"outstanding more than {STALE_CHECK_DAYS} days")
+                        for index in stale.tolist())
+    return Reconciliation(bank, book, pair_bank, pair_book, pair_pass, bank_pass, book_pass, suspects)
+
+
+def summarize_reconciliation(result: Reconciliation) -> dict:
+    """Match counts per pass and the open items that go on the reconciliation"""
+    bank_open = result.bank_pass == UNMATCHED
+    book_open = result.book_pass == UNMATCHED
+    in_transit = book_open & (result.book.cents > 0)
+    outstanding = book_open & (result.book.cents < 0)
+
+    def total(items: Transactions, mask: np.ndarray) -> float:
+        return round(int(items.cents[mask].sum()) / 100, 2)
+
+    return {
+        "bank_items": len(result.bank),
+        "book_items": len(result.book),
+        "matched_by_pass": {name: {"bank": int(np.count_nonzero(result.bank_pass == code)),
+                                   "book": int(np.count_nonzero(result.book_pass == code))}
+                            for code, name in enumerate(MATCH_PASSES)},
+        "deposits_in_transit": {"count": int(np.count_nonzero(in_transit)), "total": total(result.book, in_transit)},
+        "outstanding_checks": {"count": int(np.count_nonzero(outstanding)), "total": total(result.book, outstanding)},
+        "unmatched_bank": {"count": int(np.count_nonzero(bank_open)), "total": total(result.bank, bank_open)},
+        "suspect_items": len(result.suspects),
+    }
+
+
+def open_items(result: Reconciliation, side: str, sign: int = 0) -> List[dict]:
+    """Unmatched items of one side (optionally only receipts, sign 1, or payments, sign -1), largest first"""
+    items = result.bank if side == "bank" else result.book
+    mask = (result.bank_pass if side == "bank" else result.book_pass) == UNMATCHED
+    if sign:
+        mask &= np.sign(items.cents) == sign
+    indexes = np.flatnonzero(mask)
+    indexes = indexes[np.argsort(-np.abs(items.cents[indexes]), kind="stable")]
+    return [{"row": index + 1, "date": str(np.datetime64(int(items.days[index]), "D")),
+             "amount": items.cents[index] / 100, "reference": items.reference_text[index],
+             "description": items.descriptions[index]}
+            for index in indexes.tolist()]
+
+
+def write_reconciliation_detail(result: Reconciliation, output_file: str):
+    """Every bank and book item with its status and, if matched, its counterpart's row"""
+    statuses = np.array(MATCH_PASSES + ("unmatched",))  # UNMATCHED (-1) picks the last
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["side", "row", "date", "amount", "reference", "description", "status", "matched_row",
+                         "suspect"])
+        for side, items, passes, own, other in (
+                ("bank", result.bank, result.bank_pass, result.pair_bank, result.pair_book),
+                ("book", result.book, result.book_pass, result.pair_book, result.pair_bank)):
+            # A grouped bank deposit lists its first book receipt
+            matched_row = np.zeros(len(items), dtype=np.int64)
+            matched_row[own[::-1]] = other[::-1] + 1
+            reasons = [""] * len(items)
+            for item in result.suspects:
+                if item.side == side:
+                    reasons[item.index] = f"{reasons[item.index]}; {item.reason}" if reasons[item.index] else item.reason
+            writer.writerows(zip(
+                itertools.repeat(side), range(1, len(items) + 1), items.days.astype("datetime64[D]").astype(str).tolist(),
+                [f"{cents / 100:.2f}" for cents in items.cents.tolist()], items.reference_text, items.descriptions,
+                statuses[passes].tolist(), [row or "" for row in matched_row.tolist()], reasons))
+
+
+def print_reconciliation_report(summary: dict, result: Reconciliation, max_items_listed: int = 10):
+    print("\n" + "="*60)
+    print("BANK RECONCILIATION MATCHING")
+    print("="*60)
+    print(f"Bank lines: {summary['bank_items']:,}   Book entries: {summary['book_items']:,}")
+    for name, counts in summary["matched_by_pass"].items():
+        print(f"  {name}: {counts['bank']:,} bank / {counts['book']:,} book")
+    for label, key in (("Deposits in transit", "deposits_in_transit"), ("Outstanding checks", "outstanding_checks"),
+                       ("Unmatched bank lines", "unmatched_bank")):
+        print(f"{label}: {summary[key]['count']:,} (${summary[key]['total']:,.2f})")
+
+    if result.suspects:
+        print(f"\n⚠ Suspect items: {len(result.suspects):,}")
+        for item in result.suspects[:max_items_listed]:
+            print(f"  {item.side} row {item.index + 1}: {item.reason}")
+        if len(result.suspects) > max_items_listed:
+            print(f"  ... and {len(result.suspects) - max_items_listed:,} more")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Match bank statement lines to cash ledger entries")
+    parser.add_argument("bank", help="Bank statement CSV (Date, Amount, optional Reference and Description)")
+    parser.add_argument("book", help="Cash ledger CSV (same columns)")
+    parser.add_argument("--date-window", type=int, default=5, help="Days either side for date-window matches")
+    parser.add_argument("--amount-tolerance", type=float, default=0.0,
+                        help="Largest amount difference for tolerance matches (default: 0, pass skipped)")
+    parser.add_argument("--output", help="Write every item with its match status as CSV")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    references: Dict[str, int] = {}
+    try:
+        bank = load_transactions(args.bank, references)
+        book = load_transactions(args.book, references)
+    except (OSError, ValueError) as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    loaded = time.perf_counter()
+    result = reconcile(bank, book, args.date_window, round(args.amount_tolerance * 100))
+    matched = time.perf_counter()
+
+    summary = summarize_reconciliation(result)
+    print_reconciliation_report(summary, result)
+    print(f"✓ Loaded in {loaded - start:.1f}s, matched in {matched - loaded:.1f}s")
+    if args.output:
+        write_reconciliation_detail(result, args.output)
+        print(f"✓ Detail saved to: {args.output}")
@@ -0,0 +1,222 @@
+"""
+Streaming sample selection
+Purpose: Select random, systematic and monetary-unit samples from ledger exports of any size
+Scenario: Pick the 181 revenue transactions to test from a multi-million-row ledger export
+
+The ledger (CSV, or Parquet with pyarrow installed) is read once, row by row,
+and only the selected rows are kept, so memory depends on the sample size and
+not on the ledger. Every selection is driven by a random.Random seeded by the
+caller, so the same seed and ledger always give the same sample.
+
+- random: reservoir sampling. Each row draws a random key, and the rows with
+  the smallest keys are kept in a bounded heap; that key is the row's
+  selection key.
+- systematic: every (population / size)th row from a seeded random start; the
+  selection key is the row position the stride landed on.
+- mus: monetary-unit sampling. A cursor moves through the cumulative dollar
+  total in steps of (book value / size) from a seeded random start; a row is
+  selected when the cursor lands in its dollars, and the selection key is the
+  dollar unit hit. Items larger than the interval are selected once.
+
+Systematic and MUS selection need the population size or book value up front;
+if neither is given, the ledger is read once more to total it.
+
+Usage:
+    python sample_selection.py revenue.csv --method random --size 181 --seed 2024 --output revenue_sample.csv
+    python sample_selection.py revenue.csv --method mus --size 167 --amount-column Amount --book-value 12500000
+    python sample_selection.py ap.parquet --method systematic --size 93 --population 2340
+"""
+
+import argparse
+import csv
+import heapq
+import math
+import os
+import random
+import sys
+import time
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+METHODS = ("random", "systematic", "mus")
+
+# Rows per Parquet batch; large enough to amortise the conversion, small enough to keep memory flat
+PARQUET_BATCH_ROWS = 65_536
+
+
+class Selection(NamedTuple):
+    """One selected ledger row"""
+    key: float        # random key, stride position or dollar unit, depending on the method
+    row_number: int   # 1-based data row in the ledger (header excluded)
+    row: list
+
+
+class Ledger(NamedTuple):
+    """A ledger's header and a one-shot iterator over its rows"""
+    header: List[str]
+    rows: Iterator[list]
+
+
+def open_ledger(ledger_file: str) -> Ledger:
+    """Stream a CSV or Parquet ledger (Parquet needs pyarrow)"""
+    if ledger_file.lower().endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Reading Parquet ledgers needs pyarrow: pip install pyarrow") from e
+        parquet = pq.ParquetFile(ledger_file)
+
+        def parquet_rows() -> Iterator[list]:
+            for batch in parquet.iter_batches(batch_size=PARQUET_BATCH_ROWS):
+                yield from (list(row) for row in zip(*(column.to_pylist() for column in batch.columns)))
+
+        return Ledger(list(parquet.schema_arrow.names), parquet_rows())
+
+    f = open(ledger_file, 'r', encoding='utf-8-sig', newline='')
+    reader = csv.reader(f)
+    header = next(reader, [])
+
+    def csv_rows() -> Iterator[list]:
+        # Blank lines (and rows of empty cells, as spreadsheet exports write) are not ledger rows
+        with f:
+            yield from (row for row in reader if any(row))
+
+    return Ledger(header, csv_rows())
+
+
+def parse_amount(value) -> float:
+    """A ledger amount as a number: "$1,234.50", "(250.00)" and "-250" are all read"""
+    try:
+        return float(value)  # plain numbers, the common case
+    except (TypeError, ValueError):
+        pass
+    text = str(value).strip().replace(",", "").replace("$", "")
+    if text.startswith("(") and text.endswith(")"):
+        return -float(text[1:-1])
+    return float(text) if text else 0.0
+
+
+def _column_index(header: Sequence[str], column: str) -> int:
+    try:
+        return list(header).index(column)
+    except ValueError:
+        raise ValueError(f"Column '{column}' not in ledger (columns: {', '.join(header)})") from None
+
+
+def _amounts(rows: Iterator[list], amount_index: int) -> Iterator[Tuple[int, list, float]]:
+    for row_number, row in enumerate(rows, 1):
+        try:
+            yield row_number, row, abs(parse_amount(row[amount_index]))
+        except (ValueError, IndexError):
+            raise ValueError(f"Row {row_number}: unreadable amount {row[amount_index:amount_index + 1]}") from None
+
+
+def random_selection(rows: Iterator[list], size: int, seed: int) -> List[Selection]:
+    """Seeded reservoir sample of `size` rows: the rows with the smallest random keys"""
+    rng = random.Random(seed)
+    heap = []  # (-key, row_number, row): the largest kept key is on top
+    for row_number, row in enumerate(rows, 1):
+        key = rng.random()
+        if len(heap) < size:
+            heapq.heappush(heap, (-key, row_number, row))
+        elif key < -heap[0][0]:
+            heapq.heapreplace(heap, (-key, row_number, row))
+    return sorted((Selection(-key, row_number, row) for key, row_number, row in heap),
+                  key=lambda selection: selection.row_number)
+
+
+def systematic_selection(rows: Iterator[list], size: int, population: int, seed: int) -> List[Selection]:
+    """Every (population / size)th row from a seeded random start"""
+    if size >= population:
+        return [Selection(row_number, row_number, row) for row_number, row in enumerate(rows, 1)]
+    interval = population / size
+    position = random.Random(seed).uniform(0, interval)  # 0-based position of the next selection
+    selections = []
+    for row_number, row in enumerate(rows, 1):
+        if row_number - 1 < position:
+            continue
+        selections.append(Selection(position, row_number, row))
+        position += interval
+        if len(selections) == size:
+            break
+    return selections
+
+
+def mus_selection(rows: Iterator[list], size: int, book_value: float, amount_index: int,
+                  seed: int) -> List[Selection]:
+    """Rows holding every (book value / size)th dollar from a seeded random start (absolute amounts)"""
+    if book_value <= 0:
+        raise ValueError(f"Book value must be positive, got {book_value}")
+    interval = book_value / size
+    cursor = random.Random(seed).uniform(0, interval)
+    cumulative = 0.0
+    selections = []
+    for row_number, row, amount in _amounts(rows, amount_index):
+        cumulative += amount
+        if cursor < cumulative:
+            selections.append(Selection(cursor, row_number, row))
+            # Skip every further dollar unit this row holds (items above the interval)
+            cursor += interval * (math.floor((cumulative - cursor) / interval) + 1)
+    return selections
+
+
+def select_sample(ledger_file: str, method: str, size: int, seed: int, amount_column: Optional[str] = None,
+                  population: Optional[int] = None, book_value: Optional[float] = None) -> Tuple[List[str], List[Selection]]:
+    """Select from a ledger file; returns its header and the selections in ledger order"""
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}' (expected one of {', '.join(METHODS)})")
+    if size <= 0:
+        raise ValueError(f"Sample size must be positive, got {size}")
+
+    ledger = open_ledger(ledger_file)
+    if method == "random":
+        return ledger.header, random_selection(ledger.rows, size, seed)
+    if method == "systematic":
+        if population is None:
+            population = sum(1 for _ in ledger.rows)
+            ledger = open_ledger(ledger_file)
+        return ledger.header, systematic_selection(ledger.rows, size, population, seed)
+
+    if not amount_column:
+        raise ValueError("MUS selection needs the amount column")
+    amount_index = _column_index(ledger.header, amount_column)
+    if book_value is None:
+        book_value = sum(amount for _, _, amount in _amounts(ledger.rows, amount_index))
+        ledger = open_ledger(ledger_file)
+    return ledger.header, mus_selection(ledger.rows, size, book_value, amount_index, seed)
+
+
+def write_selections(output_file: str, header: Sequence[str], selections: List[Selection]):
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["selection_key", "row_number", *header])
+        for selection in selections:
+            writer.writerow([f"{selection.key:.6f}", selection.row_number, *selection.row])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Select an audit sample from a CSV or Parquet ledger")
+    parser.add_argument("ledger", help="Ledger export (.csv, or .parquet with pyarrow installed)")
+    parser.add_argument("--method", choices=METHODS, default="random")
+    parser.add_argument("--size", type=int, required=True, help="Sample size (see audit_sampling.py)")
+    parser.add_argument("--seed", type=int, required=True, help="Random seed; record it in the workpaper")
+    parser.add_argument("--amount-column", help="Amount column (required for --method mus)")
+    parser.add_argument("--population", type=int, help="Rows in the ledger, if known (systematic)")
+    parser.add_argument("--book-value", type=float, help="Ledger total, if known (mus)")
+    parser.add_argument("--output", help="CSV of selected rows (default: <ledger>_<method>_sample.csv)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        header, selections = select_sample(args.ledger, args.method, args.size, args.seed, args.amount_column,
+                                           args.population, args.book_value)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    output_file = args.output or f"{os.path.splitext(args.ledger)[0]}_{args.method}_sample.csv"
+    write_selections(output_file, header, selections)
+    print(f"✓ {len(selections)} rows selected ({args.method}, seed {args.seed}) in {elapsed:.1f}s")
+    if len(selections) < args.size and args.method != "mus":
+        print(f"⚠ The ledger has fewer rows than the sample size ({args.size})")
+    print(f"✓ Selection saved to: {output_file}")
@@ -8,6 +8,8 @@ import json
 from datetime import datetime
 from typing import List, Optional, Dict
 
+from compact_checklist import load_compact_checklist
+
 # Define the audit checklist data structure
 AUDIT_CHECKLIST_SCHEMA = {
     "$schema": "http://json-schema.org/draft-07/schema#",
@@ -272,8 +274,8 @@ if __name__ == "__main__":
     schema_file = save_schema()
     checklist_file = save_sample_checklist()
 
-    # Print summary
-    print_checklist_summary(SAMPLE_CHECKLIST)
+    # Print summary, read back through the compact model the other tools load with
+    print_checklist_summary(load_compact_checklist(checklist_file))
 
     print("\nNext steps:")
     print("1. Use this checklist structure for all audit programs")
@@ -4,12 +4,26 @@ Purpose: Validate audit checklist data against schema
 Scenario: Ensure data quality before processing
 """
 
+import argparse
 import json
+import os
 import sys
+import time
+
+from checklist_batch_validation import (find_checklist_files, print_validation_report,
+                                        run_batch_validation, save_validation_report,
+                                        summarize_validation)
+from checklist_incremental import IncrementalValidator
+from checklist_refs import build_ref_index, ref_sections
+from checklist_snapshot import is_snapshot, load_checklist
+from checklist_streaming import ChecklistSyntaxError, iter_checklist_errors
+from checklist_validation import validate_checklist
 
 def validate_checklist_simple(checklist_data: dict) -> tuple[bool, list]:
     """
     Simple validation without external dependencies
+    Only covers part of the schema; validate_checklist() (checklist_validation.py)
+    enforces all of AUDIT_CHECKLIST_SCHEMA with a compiled validator.
     Returns: (is_valid, errors)
     """
     errors = []
@@ -64,7 +78,7 @@ def validate_checklist_simple(checklist_data: dict) -> tuple[bool, list]:
 
                 # Validate XBRL references format
                 if "xbrl_refs" in procedure:
-                    if not isinstance(procedure["xbrl_refs"], list):
+                    if not isinstance(procedure["xbrl_refs"], (list, tuple)):
                         errors.append(f"{proc_path}: xbrl_refs must be an array")
 
                 # Validate sign-off if present
@@ -83,17 +97,19 @@ def load_and_validate_checklist(filename: str):
     print(f"Loading checklist from: {filename}\n")
 
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            checklist = json.load(f)
+        checklist = load_checklist(filename)
     except FileNotFoundError:
         print(f"✗ Error: File not found: {filename}")
         return False
     except json.JSONDecodeError as e:
         print(f"✗ Error: Invalid JSON: {e}")
         return False
+    except ValueError as e:
+        print(f"✗ Error: Invalid snapshot: {e}")
+        return False
 
     print("Validating checklist structure...\n")
-    is_valid, errors = validate_checklist_simple(checklist)
+    is_valid, errors = validate_checklist(checklist)
 
     if is_valid:
         print("✓ Validation PASSED")
@@ -123,28 +139,113 @@ def load_and_validate_checklist(filename: str):
             print(f"  • {error}")
         return False
 
+def incrementally_validate_checklist(filename: str):
+    """
+    Validate a checklist JSON file, re-validating only sections changed since the last run
+    Results are kept in a hidden .<stem>.valcache sidecar file; an unchanged file
+    (same size and mtime) is not read at all.
+    """
+    print(f"Validating checklist incrementally: {filename}\n")
+
+    validator = IncrementalValidator.for_file(filename)
+    try:
+        is_valid, errors = validator.validate_file(filename)
+    except FileNotFoundError:
+        print(f"✗ Error: File not found: {filename}")
+        return False
+    except ChecklistSyntaxError as e:
+        print(f"✗ Error: Invalid JSON: {e}")
+        return False
+
+    if validator.file_unchanged:
+        print("  File unchanged since the last run; reusing its results\n")
+    else:
+        print(f"  Re-validated {validator.sections_validated} changed section(s), "
+              f"reused results for {validator.sections_reused}\n")
+
+    stats = validator.stats
+    if not is_valid:
+        print("✗ Validation FAILED")
+        print(f"\nFound {len(errors)} error(s):\n")
+        for error in errors:
+            print(f"  • {error}")
+        return False
+
+    print("✓ Validation PASSED")
+    print(f"  Client: {stats['client']}")
+    print(f"  Period: {stats['period_end']}")
+    print(f"  Total procedures: {stats['procedures']}")
+    print(f"  XBRL references: {stats['xbrl_refs']}")
+    return True
+
+def stream_and_validate_checklist(filename: str, max_errors: int = None):
+    """
+    Validate a checklist without loading it into memory
+    For multi-GB files: errors are printed as they are found, and validation
+    can stop after the first max_errors errors.
+    """
+    print(f"Streaming checklist from: {filename}\n")
+
+    stats = {}
+    error_count = 0
+    try:
+        for error in iter_checklist_errors(filename, max_errors=max_errors, stats=stats):
+            if error_count == 0:
+                print("✗ Validation FAILED\n")
+            print(f"  • {error}")
+            error_count += 1
+    except FileNotFoundError:
+        print(f"✗ Error: File not found: {filename}")
+        return False
+
+    if error_count:
+        stopped = " (stopped early)" if max_errors is not None and error_count >= max_errors else ""
+        print(f"\nFound {error_count} error(s){stopped} in the first {stats['procedures']} procedure(s)")
+        return False
+
+    print("✓ Validation PASSED")
+    print(f"  Client: {stats['client']}")
+    print(f"  Period: {stats['period_end']}")
+    print(f"  Total procedures: {stats['procedures']}")
+    print(f"  XBRL references: {stats['xbrl_refs']}")
+    return True
+
+def batch_validate_checklists(target: str, report_file: str = "validation_report.json",
+                              workers: int = None):
+    """
+    Validate every checklist in a directory or glob across a process pool
+    Prints the aggregated report and saves it as JSON
+    """
+    checklist_files = find_checklist_files(target, skip=(report_file,))
+    if not checklist_files:
+        print(f"✗ No checklist JSON files found for: {target}")
+        return False
+
+    workers = min(workers or os.cpu_count() or 1, len(checklist_files))
+    print(f"Validating {len(checklist_files)} checklist(s) on {workers} worker process(es)...")
+
+    start = time.perf_counter()
+    results = run_batch_validation(checklist_files, workers=workers)
+    summary = summarize_validation(results, time.perf_counter() - start, workers)
+
+    print_validation_report(summary)
+    save_validation_report(summary, report_file)
+    print(f"✓ Per-file results saved to: {report_file}")
+    return summary["status_counts"].get("valid", 0) == len(results)
+
 def validate_xbrl_references(checklist: dict) -> dict:
     """
     Analyze XBRL references in the checklist
     Returns summary of XBRL element usage
     """
-    xbrl_usage = {}
-
-    for section in checklist["audit_engagement"]["sections"]:
-        for proc in section["procedures"]:
-            if "xbrl_refs" in proc:
-                for xbrl_ref in proc["xbrl_refs"]:
-                    if xbrl_ref not in xbrl_usage:
-                        xbrl_usage[xbrl_ref] = {
-                            "count": 0,
-                            "procedures": [],
-                            "sections": set()
-                        }
-                    xbrl_usage[xbrl_ref]["count"] += 1
-                    xbrl_usage[xbrl_ref]["procedures"].append(proc["procedure_id"])
-                    xbrl_usage[xbrl_ref]["sections"].add(section["section_id"])
-
-    return xbrl_usage
+    return {
+        xbrl_ref: {
+            "count": len(refs),
+            "procedures": [ref.procedure_id for ref in refs],
+            "sections": set(ref_sections(refs))
+        }
+        for xbrl_ref, refs in build_ref_index(checklist["audit_engagement"]).items()
+    }
 
 def print_xbrl_coverage_report(checklist: dict):
     """Print report of XBRL element coverage by audit procedures"""
@@ -169,28 +270,56 @@ def print_xbrl_coverage_report(checklist: dict):
     print("\n" + "="*60 + "\n")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate an audit checklist JSON file or snapshot (.acks)")
+    parser.add_argument("filename", nargs="?", default="sample_audit_checklist.json")
+    parser.add_argument("--stream", action="store_true",
+                        help="Validate incrementally without loading the file (for very large checklists)")
+    parser.add_argument("--max-errors", type=int, default=None,
+                        help="Stop after this many errors (streaming mode)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-validate sections changed since the last run")
+    parser.add_argument("--batch", metavar="DIR_OR_GLOB",
+                        help="Validate every checklist in a directory or glob across all cores")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for --batch (default: one per core)")
+    parser.add_argument("--report", default="validation_report.json",
+                        help="Where --batch writes its JSON report")
+    args = parser.parse_args()
+
+    if args.batch:
+        sys.exit(0 if batch_validate_checklists(args.batch, args.report, args.workers) else 1)
+
     # First, create sample data if it doesn't exist
-    try:
-        with open("sample_audit_checklist.json", 'r') as f:
-            pass
-    except FileNotFoundError:
-        print("Sample checklist not found. Creating it first...\n")
-        import sys
-        sys.path.append('..')
-        from phase2_structured_data import audit_checklist_model
-        audit_checklist_model.save_sample_checklist()
-        print()
+    if args.filename == "sample_audit_checklist.json":
+        try:
+            with open("sample_audit_checklist.json", 'r') as f:
+                pass
+        except FileNotFoundError:
+            print("Sample checklist not found. Creating it first...\n")
+            import sys
+            sys.path.append('..')
+            from phase2_structured_data import audit_checklist_model
+            audit_checklist_model.save_sample_checklist()
+            print()
 
     # Validate the checklist
-    filename = "sample_audit_checklist.json"
-    success = load_and_validate_checklist(filename)
+    filename = args.filename
+    if (args.stream or args.incremental) and os.path.isfile(filename) and is_snapshot(filename):
+        # A snapshot has no JSON text to stream or hash; loading it decodes the records in bulk
+        print("⚠ --stream and --incremental read checklist JSON; validating the snapshot by loading it\n")
+        args.stream = args.incremental = False
+    if args.stream:
+        success = stream_and_validate_checklist(filename, max_errors=args.max_errors)
+    elif args.incremental:
+        success = incrementally_validate_checklist(filename)
+    else:
+        success = load_and_validate_checklist(filename)
 
-    if success:
+    if success and not (args.stream or args.incremental):
         # Load and print XBRL coverage
-        with open(filename, 'r', encoding='utf-8') as f:
-            checklist = json.load(f)
-        print_xbrl_coverage_report(checklist)
+        print_xbrl_coverage_report(load_checklist(filename, compact=True))
 
+    if success:
         print("\nValidation complete! Checklist is ready for:")
         print("  • Excel workpaper generation")
         print("  • XBRL cross-referencing")
@@ -5,35 +5,50 @@ Scenario: Automated workpaper generation from audit program
 """
 
 import anthropic
-import json
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils import (
+    PromptTemplate,
+    PromptTooLarge,
+    ResponseCache,
+    check_token_budget,
+    download_files,
+    find_file_ids,
+    positive_token_budget,
+    print_download_report,
+)
+from checklist_refs import build_ref_index, ref_sections, refs_completed
+from checklist_snapshot import load_checklist
+
+FORMATTING_REQUIREMENTS = """
 
-def generate_excel_from_checklist(checklist_file: str = "sample_audit_checklist.json"):
-    """Generate Excel workpaper from audit checklist JSON"""
-
-    # Load the checklist
-    try:
-        with open(checklist_file, 'r', encoding='utf-8') as f:
-            checklist = json.load(f)
-    except FileNotFoundError:
-        print(f"✗ Error: Checklist file not found: {checklist_file}")
-        print("Run 04_audit_checklist_model.py first to create sample data")
-        return None
-
-    engagement = checklist["audit_engagement"]
-
-    print(f"Generating Excel workpaper for: {engagement['client']}\n")
-
-    # Build detailed prompt with checklist data
-    prompt = f"""Create a comprehensive audit workpaper in Excel based on this audit checklist data:
+Formatting requirements:
+- Professional header on each sheet with client name and period
+- Use filters on all data tables
+- Conditional formatting for status (green=completed, yellow=in progress, gray=not started)
+- Color coding for risk levels (red=high, yellow=medium, green=low)
+- Freeze top row headers
+- Auto-fit column widths
+- Add borders to all tables
+- Include preparer/reviewer signature blocks at bottom of each sheet
+- Include current date and workpaper reference numbers
 
-CLIENT: {engagement['client']}
-PERIOD END: {engagement['period_end']}
-ENGAGEMENT PARTNER: {engagement['engagement_partner']}
-MATERIALITY: ${engagement['materiality']:,}
+Make it look professional and audit-ready."""
 
-Create the following sheets:
+# Templates are compiled once; prompts are assembled by joining rendered pieces
+ENGAGEMENT_HEADER = PromptTemplate("""CLIENT: {client}
+PERIOD END: {period_end}
+ENGAGEMENT PARTNER: {engagement_partner}
+MATERIALITY: ${materiality:,}
+""")
 
-Sheet 1 - "Audit Summary":
+SUMMARY_SHEET = PromptTemplate("""
+Sheet {sheet_number} - "Audit Summary":
 - Engagement overview (client, period, partner, materiality)
 - Overall completion statistics
 - Summary table showing each audit section with:
@@ -44,87 +59,99 @@ Sheet 1 - "Audit Summary":
   * % Complete
   * Procedures with exceptions
 
-"""
+""")
 
-    # Add details for each section
-    for i, section in enumerate(engagement["sections"], start=2):
-        prompt += f"""
-Sheet {i} - "{section['name']}":
-Section ID: {section['section_id']}
-Risk Level: {section['risk_level'].upper()}
-Description: {section.get('description', 'N/A')}
+SECTION_SHEET = PromptTemplate("""
+Sheet {sheet_number} - "{name}":
+Section ID: {section_id}
+Risk Level: {risk_level}
+Description: {description}
 
 Procedure details table with these columns:
 | Proc ID | Description | Assigned To | Due Date | Status | WP Ref | Evidence | XBRL Links | Sign-Off | Notes |
 
 Data rows:
-"""
-        for proc in section["procedures"]:
-            status_display = proc['status'].replace('_', ' ').title()
-            assigned = proc.get('assigned_to', 'Unassigned')
-            due = proc.get('due_date', 'TBD')
-            wp_ref = proc.get('workpaper_ref', 'N/A')
-            evidence = ', '.join(proc.get('evidence_refs', []))[:30]
-            xbrl = ', '.join(proc.get('xbrl_refs', []))[:40]
-
-            sign_off_info = ""
-            notes = ""
-            if 'sign_off' in proc:
-                so = proc['sign_off']
-                sign_off_info = f"{so.get('auditor', 'N/A')} on {so.get('date', 'N/A')}"
-                notes = so.get('notes', '')[:50]
-
-            prompt += f"""
-- {proc['procedure_id']}: {proc['description']} | {assigned} | {due} | {status_display} | {wp_ref} | {evidence} | {xbrl} | {sign_off_info} | {notes}
-"""
+""")
+
+PROCEDURE_ROW = PromptTemplate("""
+- {procedure_id}: {description} | {assigned} | {due} | {status} | {wp_ref} | {evidence} | {xbrl} | {sign_off} | {notes}
+""")
 
-    # Add XBRL cross-reference sheet
-    prompt += f"""
+XBRL_SHEET = PromptTemplate("""
 
-Sheet {len(engagement['sections']) + 2} - "XBRL Cross-Reference":
+Sheet {sheet_number} - "XBRL Cross-Reference":
 Create a table mapping XBRL elements to audit procedures:
 | XBRL Element | Procedure IDs | Audit Sections | Status |
 
-"""
-
-    # Collect XBRL mappings
-    xbrl_map = {}
-    for section in engagement["sections"]:
-        for proc in section["procedures"]:
-            if 'xbrl_refs' in proc:
-                for xbrl_ref in proc['xbrl_refs']:
-                    if xbrl_ref not in xbrl_map:
-                        xbrl_map[xbrl_ref] = {"procs": [], "sections": set(), "statuses": []}
-                    xbrl_map[xbrl_ref]["procs"].append(proc['procedure_id'])
-                    xbrl_map[xbrl_ref]["sections"].add(section['section_id'])
-                    xbrl_map[xbrl_ref]["statuses"].append(proc['status'])
-
-    for xbrl_element, data in sorted(xbrl_map.items()):
-        procs = ', '.join(data['procs'])
-        sections = ', '.join(sorted(data['sections']))
-        all_completed = all(s == 'completed' for s in data['statuses'])
-        status = "Complete" if all_completed else "In Progress"
-        prompt += f"- {xbrl_element} | {procs} | {sections} | {status}\n"
-
-    prompt += """
-
-Formatting requirements:
-- Professional header on each sheet with client name and period
-- Use filters on all data tables
-- Conditional formatting for status (green=completed, yellow=in progress, gray=not started)
-- Color coding for risk levels (red=high, yellow=medium, green=low)
-- Freeze top row headers
-- Auto-fit column widths
-- Add borders to all tables
-- Include preparer/reviewer signature blocks at bottom of each sheet
-- Include current date and workpaper reference numbers
+""")
 
-Make it look professional and audit-ready."""
+XBRL_ROW = PromptTemplate("- {element} | {procs} | {sections} | {status}\n")
 
-    # Call Claude with XLSX skill
-    client = anthropic.Anthropic()
+WORKPAPER_PROMPT = PromptTemplate("""Create a comprehensive audit workpaper in Excel based on this audit checklist data:
 
-    response = client.beta.messages.create(
+{header}
+Create the following sheets:
+{sheets}{formatting}""")
+
+def engagement_header(engagement: dict) -> str:
+    """Client, period, partner and materiality lines that open every workpaper prompt"""
+    return ENGAGEMENT_HEADER.render(engagement)
+
+def summary_sheet_spec(sheet_number: int = 1) -> str:
+    """The Audit Summary sheet description"""
+    return SUMMARY_SHEET.render(sheet_number=sheet_number)
+
+def procedure_row_values(proc: dict) -> dict:
+    """PROCEDURE_ROW fields for one procedure (long text cut to fit the table)"""
+    sign_off = proc.get('sign_off')
+    return {
+        "procedure_id": proc['procedure_id'],
+        "description": proc['description'],
+        "assigned": proc.get('assigned_to', 'Unassigned'),
+        "due": proc.get('due_date', 'TBD'),
+        "status": proc['status'].replace('_', ' ').title(),
+        "wp_ref": proc.get('workpaper_ref', 'N/A'),
+        "evidence": ', '.join(proc.get('evidence_refs', []))[:30],
+        "xbrl": ', '.join(proc.get('xbrl_refs', []))[:40],
+        "sign_off": f"{sign_off.get('auditor', 'N/A')} on {sign_off.get('date', 'N/A')}" if sign_off is not None else "",
+        "notes": sign_off.get('notes', '')[:50] if sign_off is not None else "",
+    }
+
+def section_sheet_spec(section: dict, sheet_number: int, procedures: list = None) -> str:
+    """One section's sheet description, with a data row per procedure (all of them by default)"""
+    header = SECTION_SHEET.render(
+        sheet_number=sheet_number, name=section['name'], section_id=section['section_id'],
+        risk_level=section['risk_level'].upper(), description=section.get('description', 'N/A'),
+    )
+    if procedures is None:
+        procedures = section["procedures"]
+    return header + PROCEDURE_ROW.render_rows(map(procedure_row_values, procedures))
+
+def xbrl_sheet_spec(engagement: dict, sheet_number: int) -> str:
+    """The XBRL Cross-Reference sheet description, with a row per referenced element"""
+    rows = (
+        {
+            "element": xbrl_element,
+            "procs": ', '.join(ref.procedure_id for ref in refs),
+            "sections": ', '.join(ref_sections(refs)),
+            "status": "Complete" if refs_completed(refs) else "In Progress",
+        }
+        for xbrl_element, refs in sorted(build_ref_index(engagement).items())
+    )
+    return XBRL_SHEET.render(sheet_number=sheet_number) + XBRL_ROW.render_rows(rows)
+
+def build_workpaper_prompt(engagement: dict) -> str:
+    """Build the xlsx skill prompt for one engagement"""
+    sections = engagement["sections"]
+    sheets = [summary_sheet_spec(1)]
+    sheets.extend(section_sheet_spec(section, i) for i, section in enumerate(sections, start=2))
+    sheets.append(xbrl_sheet_spec(engagement, len(sections) + 2))
+    return WORKPAPER_PROMPT.render(header=engagement_header(engagement), sheets="".join(sheets),
+                                   formatting=FORMATTING_REQUIREMENTS)
+
+def workpaper_request(prompt: str) -> dict:
+    """Keyword arguments for the messages.create call that builds the workpaper"""
+    return dict(
         model="claude-haiku-4-5-20251001",
         max_tokens=4096,
         betas=["code-execution-2025-08-25", "skills-2025-10-02", "files-api-2025-04-14"],
@@ -146,25 +173,70 @@ Make it look professional and audit-ready."""
         messages=[{"role": "user", "content": prompt}]
     )
 
-    # Extract and download file
-    file_id = None
-    for block in response.content:
-        if hasattr(block, 'file_id') and block.file_id:
-            file_id = block.file_id
-            break
+# Path separators and other characters a file name cannot safely hold
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.-]+")
+
+def workpaper_filename(engagement: dict, checklist_file: str = None) -> str:
+    """
+    Output file name for an engagement's workpaper
+    In a batch, pass the checklist file: its stem keeps two checklists for the same
+    client (two years, interim and final) from overwriting each other.
+    """
+    name = engagement['client']
+    if checklist_file:
+        name = f"{name}_{os.path.splitext(os.path.basename(checklist_file))[0]}"
+    return f"audit_program_{_UNSAFE_FILENAME_CHARS.sub('_', name)}.xlsx"
+
+def generate_excel_from_checklist(checklist_file: str = "sample_audit_checklist.json",
+                                  token_budget: int = None, cache: ResponseCache = None):
+    """Generate Excel workpaper from audit checklist JSON"""
 
-    if file_id:
-        print(f"File ID found: {file_id}")
-        print("Downloading workpaper...\n")
+    # Load the checklist
+    try:
+        checklist = load_checklist(checklist_file, compact=True)
+    except FileNotFoundError:
+        print(f"✗ Error: Checklist file not found: {checklist_file}")
+        print("Run 04_audit_checklist_model.py first to create sample data")
+        return None
+    except ValueError as e:
+        print(f"✗ Error: Unreadable checklist {checklist_file}: {e}")
+        return None
+
+    engagement = checklist["audit_engagement"]
+
+    print(f"Generating Excel workpaper for: {engagement['client']}\n")
+
+    prompt = build_workpaper_prompt(engagement)
 
-        file_content = client.beta.files.retrieve_content(file_id)
+    # Don't pay for a request that will truncate
+    try:
+        tokens = check_token_budget(prompt, token_budget)
+    except PromptTooLarge as e:
+        print(f"✗ {e}")
+        print("  Use --fan-out to split it into per-section calls, or --local to build it without the skill")
+        return None
+    print(f"Prompt size: ~{tokens:,} tokens\n")
+
+    # Call Claude with XLSX skill
+    client = anthropic.Anthropic()
+    cache = cache or ResponseCache.from_env()
 
-        output_filename = f"audit_program_{engagement['client'].replace(' ', '_')}.xlsx"
-        with open(output_filename, 'wb') as f:
-            f.write(file_content)
+    response = cache.create(client, **workpaper_request(prompt))
 
+    # Extract and download every file
+    file_ids = find_file_ids(response)
+
+    if file_ids:
+        print(f"File IDs found: {', '.join(file_ids)}")
+        print("Downloading workpaper...\n")
+
+        downloads = download_files(client, response, primary_filename=workpaper_filename(engagement),
+                                   cache=cache)
+        print_download_report(downloads)
+
+        output_filename = downloads[0].path
         print(f"✓ Success! Audit program workpaper saved to: {output_filename}")
-        print(f"  File size: {len(file_content) / 1024:.1f} KB")
+        print(f"  File size: {downloads[0].size / 1024:.1f} KB")
         print(f"  Sections: {len(engagement['sections'])}")
         print(f"  Total procedures: {sum(len(s['procedures']) for s in engagement['sections'])}")
 
@@ -176,20 +248,113 @@ Make it look professional and audit-ready."""
                 print(f"\nClaude's response:\n{block.text[:300]}...")
         return None
 
-if __name__ == "__main__":
-    # Generate sample data if needed
+def build_commentary_prompt(engagement: dict) -> str:
+    """Prompt for a short narrative on engagement progress (section statistics only, no rows)"""
+    lines = [
+        f"Write a short status commentary (3-5 sentences, plain text) for the audit of "
+        f"{engagement['client']}, period end {engagement['period_end']}, for the front sheet of the "
+        f"audit program workpaper. Focus on progress in high-risk areas and open items.",
+        "",
+        "Section | Risk | Completed / Total | Procedures with exceptions",
+    ]
+    for section in engagement["sections"]:
+        procedures = section["procedures"]
+        completed = sum(1 for proc in procedures if proc["status"] == "completed")
+        exceptions = sum(1 for proc in procedures if proc.get("sign_off", {}).get("exceptions"))
+        lines.append(f"{section['name']} | {section.get('risk_level', 'n/a')} | "
+                     f"{completed} / {len(procedures)} | {exceptions}")
+    return "\n".join(lines)
+
+def generate_commentary(engagement: dict, cache: ResponseCache = None) -> str:
+    """Ask Claude for narrative commentary on the engagement (a small text-only call)"""
+    client = anthropic.Anthropic()
+    cache = cache or ResponseCache.from_env()
+    response = cache.create(
+        client,
+        model="claude-haiku-4-5-20251001",
+        max_tokens=512,
+        messages=[{"role": "user", "content": build_commentary_prompt(engagement)}],
+    )
+    return "".join(block.text for block in response.content if block.type == "text")
+
+def generate_excel_locally(checklist_file: str = "sample_audit_checklist.json", with_commentary: bool = False,
+                           cache: ResponseCache = None):
+    """
+    Generate the workpaper locally with openpyxl instead of the xlsx skill
+    Deterministic, and fast enough for checklists with tens of thousands of procedures.
+    The model is only called (once, without procedure rows) if with_commentary is set.
+    """
+    # openpyxl is only needed for local generation
+    from workpaper_writer import write_workpaper
+
     try:
-        with open("sample_audit_checklist.json", 'r') as f:
-            pass
+        checklist = load_checklist(checklist_file, compact=True)
     except FileNotFoundError:
-        print("Sample checklist not found. Creating it first...\n")
-        import sys
-        import os
-        # Adjust path to find the module
-        sys.path.insert(0, os.path.dirname(__file__))
-        import audit_checklist_model as model
-        model.save_sample_checklist()
-        print()
+        print(f"✗ Error: Checklist file not found: {checklist_file}")
+        print("Run 04_audit_checklist_model.py first to create sample data")
+        return None
+    except ValueError as e:
+        print(f"✗ Error: Unreadable checklist {checklist_file}: {e}")
+        return None
+
+    engagement = checklist["audit_engagement"]
+    print(f"Generating Excel workpaper locally for: {engagement['client']}\n")
+
+    commentary = None
+    if with_commentary:
+        print("Requesting narrative commentary...\n")
+        commentary = generate_commentary(engagement, cache)
+
+    start = time.perf_counter()
+    output_filename = workpaper_filename(engagement)
+    counts = write_workpaper(engagement, output_filename, commentary=commentary)
+    elapsed = time.perf_counter() - start
+
+    print(f"✓ Success! Audit program workpaper saved to: {output_filename}")
+    print(f"  File size: {os.path.getsize(output_filename) / 1024:.1f} KB")
+    print(f"  Sheets: {counts['sheets']}")
+    print(f"  Total procedures: {counts['procedures']}")
+    print(f"  XBRL elements cross-referenced: {counts['xbrl_elements']}")
+    print(f"  Written in {elapsed:.2f}s")
+    return output_filename
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate an Excel audit program workpaper from a checklist")
+    parser.add_argument("checklist_file", nargs="?", default="sample_audit_checklist.json")
+    parser.add_argument("--local", action="store_true",
+                        help="Build the workbook locally with openpyxl instead of the xlsx skill")
+    parser.add_argument("--commentary", action="store_true",
+                        help="With --local, add model-written narrative commentary to the summary sheet")
+    parser.add_argument("--fan-out", action="store_true",
+                        help="One xlsx skill call per section, run concurrently and merged locally")
+    parser.add_argument("--max-in-flight", type=int, default=8,
+                        help="With --fan-out, maximum part requests in flight at once")
+    parser.add_argument("--token-budget", type=positive_token_budget, default=None,
+                        help="Input-token budget per prompt (default: AUDIT_PROMPT_TOKEN_BUDGET or 100000)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Call the API even when a cached response exists")
+    args = parser.parse_args()
+
+    # Generate sample data if needed
+    if args.checklist_file == "sample_audit_checklist.json":
+        try:
+            with open("sample_audit_checklist.json", 'r') as f:
+                pass
+        except FileNotFoundError:
+            print("Sample checklist not found. Creating it first...\n")
+            # Adjust path to find the module
+            sys.path.insert(0, os.path.dirname(__file__))
+            import audit_checklist_model as model
+            model.save_sample_checklist()
+            print()
 
     # Generate Excel workpaper
-    generate_excel_from_checklist()
+    cache = ResponseCache.from_env(bypass=args.no_cache)
+    if args.local:
+        generate_excel_locally(args.checklist_file, with_commentary=args.commentary, cache=cache)
+    elif args.fan_out:
+        from workpaper_fanout import generate_workpaper_fanout
+        generate_workpaper_fanout(args.checklist_file, max_in_flight=args.max_in_flight, cache=cache,
+                                  token_budget=args.token_budget)
+    else:
+        generate_excel_from_checklist(args.checklist_file, token_budget=args.token_budget, cache=cache)
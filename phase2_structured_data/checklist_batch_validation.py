@@ -0,0 +1,158 @@
+"""
+Process-pool batch validation of audit checklists
+Purpose: Validate thousands of engagement checklists in one run, on every core
+Scenario: Nightly QA gate over every engagement checklist in the firm
+
+Validation is CPU-bound, so files are spread across a process pool (one worker
+per core by default). Each worker streams its files through the compiled
+schema validator (checklist_streaming.py), so even very large checklists do
+not blow up worker memory. The results are aggregated into one report.
+
+Usage:
+    python 05_json_validation.py --batch checklists/ --report validation_report.json
+    python 05_json_validation.py --batch "engagements/**/checklist*.json" --workers 16
+"""
+
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, NamedTuple, Optional
+
+from checklist_incremental import SIDECAR_SUFFIX
+from checklist_streaming import iter_checklist_errors
+
+# Errors kept per file in the report; error_count is always the full count
+DEFAULT_MAX_REPORTED_ERRORS = 50
+# Files the validation and workpaper tools write next to checklists, never checklists themselves
+TOOL_OUTPUT_FILES = frozenset(("validation_report.json", "batch_summary.json"))
+# Incremental-validation sidecars: the current name, and the *.json name older runs left behind
+SIDECAR_SUFFIXES = (SIDECAR_SUFFIX, ".validation-cache.json")
+
+
+class FileValidation(NamedTuple):
+    """Outcome of validating one checklist file"""
+    checklist_file: str
+    client: Optional[str]
+    status: str  # "valid", "invalid" or "error" (file could not be read)
+    error_count: int
+    errors: list
+    procedures: int
+    seconds: float
+
+
+def is_tool_output(path: str, skip: Iterable[str] = ()) -> bool:
+    """True for a report, batch summary or validation sidecar (or a path in skip), not a checklist"""
+    name = os.path.basename(path)
+    if name in TOOL_OUTPUT_FILES or name.endswith(SIDECAR_SUFFIXES):
+        return True
+    return any(os.path.abspath(path) == os.path.abspath(other) for other in skip)
+
+
+def find_checklist_files(target: str, skip: Iterable[str] = ()) -> List[str]:
+    """
+    Checklist files from a directory (all *.json below it), a glob pattern or a single file
+    Reports, batch summaries and validation sidecars are left out, as is any path in skip.
+    """
+    if os.path.isdir(target):
+        pattern = os.path.join(target, "**", "*.json")
+    elif os.path.isfile(target):
+        return [target]
+    else:
+        pattern = target
+    return sorted(path for path in glob.glob(pattern, recursive=True)
+                  if os.path.isfile(path) and not is_tool_output(path, skip))
+
+
+def validate_checklist_file(checklist_file: str,
+                            max_reported_errors: int = DEFAULT_MAX_REPORTED_ERRORS) -> FileValidation:
+    """Validate one checklist file (runs in a worker process)"""
+    start = time.perf_counter()
+    stats = {}
+    errors = []
+    error_count = 0
+    try:
+        for error in iter_checklist_errors(checklist_file, stats=stats):
+            if error_count < max_reported_errors:
+                errors.append(error)
+            error_count += 1
+    except (OSError, UnicodeDecodeError) as e:
+        return FileValidation(checklist_file, None, "error", 1, [f"{type(e).__name__}: {e}"],
+                              0, time.perf_counter() - start)
+
+    status = "invalid" if error_count else "valid"
+    client = stats.get("client") if isinstance(stats.get("client"), str) else None
+    return FileValidation(checklist_file, client, status, error_count, errors,
+                          stats.get("procedures", 0), time.perf_counter() - start)
+
+
+def _validate_file_worker(args: tuple) -> FileValidation:
+    return validate_checklist_file(*args)
+
+
+def run_batch_validation(checklist_files: List[str], workers: Optional[int] = None,
+                         max_reported_errors: int = DEFAULT_MAX_REPORTED_ERRORS) -> List[FileValidation]:
+    """Validate files across a process pool; results are in input order"""
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(checklist_files)) or 1
+    # Several files per task keeps inter-process overhead low for small checklists,
+    # while still leaving enough tasks to balance the load across workers
+    chunksize = max(1, len(checklist_files) // (workers * 4))
+    tasks = [(checklist_file, max_reported_errors) for checklist_file in checklist_files]
+    if workers == 1:
+        return [_validate_file_worker(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_validate_file_worker, tasks, chunksize=chunksize))
+
+
+def summarize_validation(results: List[FileValidation], wall_clock_seconds: float, workers: int) -> dict:
+    """Aggregated report for a finished batch"""
+    status_counts = {}
+    for outcome in results:
+        status_counts[outcome.status] = status_counts.get(outcome.status, 0) + 1
+    busy_seconds = sum(outcome.seconds for outcome in results)
+    return {
+        "files": len(results),
+        "status_counts": status_counts,
+        "total_errors": sum(outcome.error_count for outcome in results),
+        "total_procedures": sum(outcome.procedures for outcome in results),
+        "workers": workers,
+        "wall_clock_seconds": round(wall_clock_seconds, 2),
+        "sum_of_file_seconds": round(busy_seconds, 2),
+        "files_per_second": round(len(results) / wall_clock_seconds, 1) if wall_clock_seconds else 0.0,
+        "results": [outcome._asdict() for outcome in results],
+    }
+
+
+def print_validation_report(summary: dict, max_files_listed: int = 20):
+    """Print the batch report: totals, then the failing files"""
+    print("\n" + "="*60)
+    print("BATCH CHECKLIST VALIDATION REPORT")
+    print("="*60)
+    print(f"Files: {summary['files']} ({summary['workers']} worker process(es))")
+    for status, count in sorted(summary["status_counts"].items()):
+        print(f"  {status}: {count}")
+    print(f"Procedures checked: {summary['total_procedures']}")
+    print(f"Errors: {summary['total_errors']}")
+    print(f"Wall-clock time: {summary['wall_clock_seconds']:.1f}s "
+          f"(sum of file times {summary['sum_of_file_seconds']:.1f}s, "
+          f"{summary['files_per_second']:.1f} files/s)")
+
+    failing = [outcome for outcome in summary["results"] if outcome["status"] != "valid"]
+    if failing:
+        print("\nFailing files:")
+        for outcome in failing[:max_files_listed]:
+            print(f"  ✗ {outcome['checklist_file']}: {outcome['error_count']} error(s) "
+                  f"({outcome['seconds']:.2f}s)")
+            for error in outcome["errors"][:3]:
+                print(f"      • {error}")
+        if len(failing) > max_files_listed:
+            print(f"  ... and {len(failing) - max_files_listed} more (see the JSON report)")
+    print("="*60 + "\n")
+
+
+def save_validation_report(summary: dict, report_file: str):
+    """Write the aggregated report as JSON"""
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
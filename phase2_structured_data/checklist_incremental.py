@@ -0,0 +1,171 @@
+"""
+Incremental checklist re-validation
+Purpose: Re-validate only the sections that changed since the last save
+Scenario: An auditor signs off one procedure in a large engagement; the save-and-validate
+          loop should not re-check the other few thousand procedures
+
+A hidden sidecar cache next to the checklist (.<stem>.valcache, deliberately
+not *.json so checklist discovery never mistakes it for a checklist) records
+the file's size and mtime, the
+full result of the last run, and each section's errors keyed by the SHA-256 of
+the section's JSON text. Errors are stored relative to the section, so they stay
+valid when sections are reordered.
+
+If the file's size and mtime are unchanged, the cached result is returned
+without reading the file. Otherwise the file is streamed once
+(checklist_streaming.ChecklistSections), and each section is hashed from its raw
+text as it streams past. Only sections whose hash is not in the cache are
+validated. The engagement header (everything except the sections) is small and
+is always re-validated. The result is the same full error list
+validate_checklist() returns, grouped by section.
+"""
+
+import json
+import os
+from typing import Optional
+
+from checklist_streaming import ChecklistSections
+from checklist_validation import get_checklist_validator, sign_off_errors, validate_checklist
+
+SECTION_POINTER = "#/properties/audit_engagement/properties/sections/items"
+# Bump when sign_off_errors(), the error format or the section hashing changes, so old sidecars are ignored
+RULES_VERSION = 2
+SIDECAR_SUFFIX = ".valcache"
+
+
+def sidecar_path(checklist_file: str) -> str:
+    """Where the section-hash cache for a checklist file lives"""
+    directory, name = os.path.split(checklist_file)
+    stem, _ = os.path.splitext(name)
+    return os.path.join(directory, f".{stem}{SIDECAR_SUFFIX}")
+
+
+def section_errors(section) -> list:
+    """A section's schema and sign-off errors, with paths relative to the section
+    (".procedures[3].status: ..." or ": Missing required field")"""
+    errors = []
+    get_checklist_validator().validator_for(SECTION_POINTER)(section, "", errors)
+    procedures = section.get("procedures") if type(section) is dict else None
+    if type(procedures) is list:
+        for j, procedure in enumerate(procedures):
+            errors.extend(sign_off_errors(procedure, f".procedures[{j}]"))
+    return errors
+
+
+def _count_procedures(section, stats: dict):
+    procedures = section.get("procedures") if type(section) is dict else None
+    if type(procedures) is not list:
+        return
+    stats["procedures"] += len(procedures)
+    stats["xbrl_refs"] += sum(len(procedure["xbrl_refs"]) for procedure in procedures
+                              if type(procedure) is dict and type(procedure.get("xbrl_refs")) is list)
+
+
+class IncrementalValidator:
+    """validate_checklist() for a file, re-validating only sections whose text changed"""
+
+    def __init__(self, cache_file: Optional[str] = None):
+        self.cache_file = cache_file
+        self.fingerprint = f"{get_checklist_validator().schema_hash}:{RULES_VERSION}"
+        cached = self._load()
+        self.file_state = cached.get("file")
+        self.last_result = cached.get("result")
+        self.section_cache = cached.get("sections", {})
+        self.sections_validated = 0
+        self.sections_reused = 0
+        self.file_unchanged = False
+        # client, period_end, sections, procedures and xbrl_refs of the last validated file
+        self.stats = {}
+
+    @classmethod
+    def for_file(cls, checklist_file: str) -> "IncrementalValidator":
+        """Validator whose cache is the checklist file's sidecar"""
+        return cls(sidecar_path(checklist_file))
+
+    def _load(self) -> dict:
+        if not self.cache_file:
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if type(cached) is not dict or cached.get("fingerprint") != self.fingerprint:
+            return {}
+        return cached
+
+    def save(self):
+        """Write the section cache and last result to the sidecar file"""
+        if not self.cache_file:
+            return
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({"fingerprint": self.fingerprint, "file": self.file_state,
+                           "result": self.last_result, "sections": self.section_cache}, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def validate_file(self, checklist_file: str, save: bool = True) -> tuple:
+        """
+        Validate a checklist JSON file, reusing cached results for unchanged sections
+        Returns: (is_valid, errors)
+        Raises OSError if the file cannot be read and ChecklistSyntaxError if it is not valid JSON.
+        """
+        stat = os.stat(checklist_file)
+        file_state = [stat.st_size, stat.st_mtime_ns]
+        if file_state == self.file_state and self.last_result is not None:
+            self.file_unchanged = True
+            self.stats = self.last_result["stats"]
+            self.sections_validated, self.sections_reused = 0, self.stats["sections"]
+            errors = list(self.last_result["errors"])
+            return len(errors) == 0, errors
+
+        self.file_unchanged = False
+        stats = {"client": None, "period_end": None, "sections": 0, "procedures": 0, "xbrl_refs": 0}
+        previous = self.section_cache
+        current = {}
+        section_results = []
+        self.sections_validated, self.sections_reused = 0, 0
+        sections = ChecklistSections(checklist_file)
+        for digest, section in sections:
+            relative_errors = current.get(digest)
+            if relative_errors is None:
+                relative_errors = previous.get(digest)
+                if relative_errors is None:
+                    relative_errors = section_errors(section)
+                    self.sections_validated += 1
+                else:
+                    self.sections_reused += 1
+                current[digest] = relative_errors
+            else:
+                self.sections_reused += 1
+            section_results.append(relative_errors)
+            stats["sections"] += 1
+            _count_procedures(section, stats)
+
+        checklist = sections.header
+        engagement = checklist.get("audit_engagement") if type(checklist) is dict else None
+        if type(engagement) is dict:
+            stats["client"] = engagement.get("client")
+            stats["period_end"] = engagement.get("period_end")
+        if sections.walked:
+            # The header with an empty sections array stands in for everything outside the sections
+            errors = get_checklist_validator()(checklist)
+            for i, relative_errors in enumerate(section_results):
+                prefix = f"audit_engagement.sections[{i}]"
+                errors.extend(prefix + error for error in relative_errors)
+        else:
+            # Nothing section-shaped to reuse; the header is the whole checklist
+            _, errors = validate_checklist(checklist)
+
+        # Only the current sections are kept, so the sidecar never outgrows the checklist
+        self.section_cache = current
+        self.file_state = file_state
+        self.last_result = {"errors": errors, "stats": stats}
+        self.stats = stats
+        if save:
+            self.save()
+        return len(errors) == 0, list(errors)
@@ -0,0 +1,46 @@
+"""
+XBRL reference index over an audit checklist
+Purpose: One element -> procedures map for every tool that cross-references XBRL
+Scenario: The workpaper's XBRL sheet, the validator's coverage report and the
+          cross-reference engine all ask which procedures test each element
+
+build_ref_index() walks the procedures once and groups their xbrl_refs by
+element. Each reference keeps its procedure, section and status, so every
+report is a summary of the same index rather than a walk of its own.
+"""
+
+from typing import Dict, List, NamedTuple
+
+
+class ChecklistRef(NamedTuple):
+    """One procedure's reference to an XBRL element"""
+    element: str
+    procedure_id: str
+    section_id: str
+    status: str
+
+
+def build_ref_index(engagement: dict) -> Dict[str, list]:
+    """Index every xbrl_ref in an engagement: element -> [ChecklistRef, ...] in procedure order"""
+    index = {}
+    for section in engagement["sections"]:
+        section_id = section["section_id"]
+        for proc in section["procedures"]:
+            for element in proc.get("xbrl_refs", ()):
+                ref = ChecklistRef(element, proc["procedure_id"], section_id, proc["status"])
+                refs = index.get(element)
+                if refs is None:
+                    index[element] = [ref]
+                else:
+                    refs.append(ref)
+    return index
+
+
+def ref_sections(refs: list) -> List[str]:
+    """The sorted, distinct section IDs of an element's refs"""
+    return sorted({ref.section_id for ref in refs})
+
+
+def refs_completed(refs: list) -> bool:
+    """True if every procedure referencing the element is completed"""
+    return all(ref.status == "completed" for ref in refs)
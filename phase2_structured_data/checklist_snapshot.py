@@ -0,0 +1,458 @@
+"""
+Binary memory-mapped checklist snapshots
+Purpose: Open large checklists instantly instead of re-parsing JSON on every command
+Scenario: Summary, validation and export tools over firm-wide audit programs
+
+A snapshot (.acks) holds a checklist as fixed-width section and procedure
+records, a de-duplicated string table and a table of shared reference lists,
+plus offset indexes. Opening one memory-maps the file and reads only the
+header; a single section or procedure is decoded on demand, and procedures
+can be looked up by ID through a sorted index without touching the rest.
+
+Layout (little-endian):
+    header            magic, version, counts, offsets of every table below
+    string offsets    u64 per string (+1), into the string data
+    string data       UTF-8 strings, each stored once
+    list offsets      u32 per reference list (+1), into the list items
+    list items        u32 string ids
+    sections          SECTION_RECORD per section
+    procedures        PROCEDURE_RECORD per procedure, in section order
+    id index          u32 procedure numbers sorted by procedure_id
+
+Everything outside the sections (version, client, materiality, ...) is one
+JSON string, as is any key the records have no field for, so converting a
+checklist to a snapshot and back gives JSON equal to the original.
+
+load_checklist() opens either format (snapshots are recognised by their magic
+bytes), and the validation, workpaper and cross-reference tools load through
+it, so a .acks file can be passed anywhere checklist JSON is accepted. The
+read-only tools pass compact=True to decode JSON into the compact model.
+
+Usage:
+    python checklist_snapshot.py to-snapshot sample_audit_checklist.json checklist.acks
+    python checklist_snapshot.py to-json checklist.acks checklist.json
+    python checklist_snapshot.py info checklist.acks
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from typing import Iterator, Optional
+
+from compact_checklist import load_compact_checklist
+
+MAGIC = b"ACKS"
+FORMAT_VERSION = 1
+NONE = 0xFFFFFFFF  # absent string or list
+
+STATUSES = ("not_started", "in_progress", "completed", "not_applicable")
+RISK_LEVELS = ("low", "medium", "high")
+_STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+_RISK_CODES = {risk: code for code, risk in enumerate(RISK_LEVELS)}
+_EXCEPTIONS_CODES = {False: 0, True: 1, None: 2}
+_EXCEPTIONS_VALUES = (False, True, None)
+
+# magic, version, reserved, strings, lists, sections, procedures, document string id,
+# then offsets of: string offsets, string data, list offsets, list items, sections,
+# procedures, id index, end of file
+HEADER = struct.Struct("<4sHHIIIII8Q")
+# section_id, name, description, extra, first procedure, procedure count, risk code (-1 if absent)
+SECTION_RECORD = struct.Struct("<6Ib3x")
+# procedure_id, description, assigned_to, due_date, workpaper_ref, evidence_refs list,
+# xbrl_refs list, sign_off auditor, sign_off date, sign_off notes, sign_off extra, extra,
+# status code, has sign_off, sign_off exceptions code
+PROCEDURE_RECORD = struct.Struct("<12I3Bx")
+
+_PROCEDURE_FIELDS = frozenset(("procedure_id", "description", "status", "assigned_to", "due_date",
+                               "evidence_refs", "xbrl_refs", "workpaper_ref", "sign_off"))
+_SECTION_FIELDS = frozenset(("section_id", "name", "description", "risk_level", "procedures"))
+_SIGN_OFF_FIELDS = frozenset(("auditor", "date", "notes", "exceptions"))
+
+
+def _reject_nulls(data: dict, fields: frozenset, what: str):
+    """Record fields store null as "absent", so an explicit null would not survive the round trip"""
+    if None in data.values():
+        for key in fields:
+            if key in data and data[key] is None:
+                raise ValueError(f"{what}: {key} is null, which a snapshot cannot represent")
+
+
+class _SnapshotWriter:
+    """Collects de-duplicated strings and reference lists while records are packed"""
+
+    def __init__(self):
+        self.string_ids = {}
+        self.strings = []
+        self.list_ids = {}
+        self.lists = []
+
+    def string(self, value: Optional[str]) -> int:
+        if value is None:
+            return NONE
+        if type(value) is not str:
+            raise ValueError(f"Expected a string, got {type(value).__name__}: {value!r}")
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            string_id = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def json_string(self, data: dict, fields: frozenset) -> int:
+        """Keys without a record field, as one JSON string (NONE if there are none)"""
+        if data.keys() <= fields:
+            return NONE
+        return self.string(json.dumps({key: value for key, value in data.items() if key not in fields}))
+
+    def ref_list(self, values) -> int:
+        if values is None:
+            return NONE
+        if type(values) is not list:
+            raise ValueError(f"Expected a list of strings, got {type(values).__name__}")
+        refs = tuple(self.string(value) for value in values)
+        list_id = self.list_ids.get(refs)
+        if list_id is None:
+            list_id = self.list_ids[refs] = len(self.lists)
+            self.lists.append(refs)
+        return list_id
+
+    def procedure_record(self, proc: dict) -> bytes:
+        status_code = _STATUS_CODES.get(proc.get("status"))
+        if status_code is None:
+            raise ValueError(f"Procedure {proc.get('procedure_id')}: unknown status {proc.get('status')!r}")
+        _reject_nulls(proc, _PROCEDURE_FIELDS, f"Procedure {proc.get('procedure_id')}")
+        sign_off = proc.get("sign_off")
+        if sign_off is not None and type(sign_off) is not dict:
+            raise ValueError(f"Procedure {proc.get('procedure_id')}: sign_off must be an object")
+        if sign_off is None:
+            sign_off = {}
+        else:
+            _reject_nulls(sign_off, _SIGN_OFF_FIELDS, f"Procedure {proc.get('procedure_id')} sign_off")
+        exceptions = sign_off.get("exceptions")
+        if exceptions is not None and type(exceptions) is not bool:
+            raise ValueError(f"Procedure {proc.get('procedure_id')}: sign_off.exceptions must be a boolean")
+        return PROCEDURE_RECORD.pack(
+            self.string(proc["procedure_id"]), self.string(proc.get("description")),
+            self.string(proc.get("assigned_to")), self.string(proc.get("due_date")),
+            self.string(proc.get("workpaper_ref")),
+            self.ref_list(proc.get("evidence_refs")), self.ref_list(proc.get("xbrl_refs")),
+            self.string(sign_off.get("auditor")), self.string(sign_off.get("date")),
+            self.string(sign_off.get("notes")), self.json_string(sign_off, _SIGN_OFF_FIELDS),
+            self.json_string(proc, _PROCEDURE_FIELDS),
+            status_code, "sign_off" in proc, _EXCEPTIONS_CODES[exceptions],
+        )
+
+
+def write_snapshot(checklist: dict, path: str) -> dict:
+    """
+    Write a checklist (decoded JSON matching AUDIT_CHECKLIST_SCHEMA) as a snapshot
+    Raises ValueError for values the records cannot hold, such as a null sign_off.
+    Returns the record counts
+    """
+    writer = _SnapshotWriter()
+    engagement = checklist["audit_engagement"]
+    document = dict(checklist, audit_engagement={key: value for key, value in engagement.items() if key != "sections"})
+    document_id = writer.string(json.dumps(document))
+
+    section_records = []
+    procedure_records = []
+    procedure_ids = []
+    for section in engagement["sections"]:
+        _reject_nulls(section, _SECTION_FIELDS, f"Section {section.get('section_id')}")
+        risk_level = section.get("risk_level")
+        risk_code = -1 if risk_level is None else _RISK_CODES.get(risk_level)
+        if risk_code is None:
+            raise ValueError(f"Section {section.get('section_id')}: unknown risk_level {risk_level!r}")
+        section_records.append(SECTION_RECORD.pack(
+            writer.string(section["section_id"]), writer.string(section.get("name")),
+            writer.string(section.get("description")), writer.json_string(section, _SECTION_FIELDS),
+            len(procedure_records), len(section["procedures"]), risk_code,
+        ))
+        for proc in section["procedures"]:
+            procedure_records.append(writer.procedure_record(proc))
+            procedure_ids.append(proc["procedure_id"])
+
+    id_index = sorted(range(len(procedure_ids)), key=procedure_ids.__getitem__)
+
+    encoded = [value.encode("utf-8") for value in writer.strings]
+    string_offsets = [0]
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+    list_offsets = [0]
+    for refs in writer.lists:
+        list_offsets.append(list_offsets[-1] + len(refs))
+
+    blocks = [
+        struct.pack(f"<{len(string_offsets)}Q", *string_offsets),
+        b"".join(encoded),
+        struct.pack(f"<{len(list_offsets)}I", *list_offsets),
+        struct.pack(f"<{list_offsets[-1]}I", *(string_id for refs in writer.lists for string_id in refs)),
+        b"".join(section_records),
+        b"".join(procedure_records),
+        struct.pack(f"<{len(id_index)}I", *id_index),
+    ]
+    offsets = [HEADER.size]
+    for block in blocks:
+        offsets.append(offsets[-1] + len(block))
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(encoded), len(writer.lists), len(section_records),
+                         len(procedure_records), document_id, *offsets)
+    # Write beside the target and rename over it, so a reader never maps a half-written
+    # snapshot and a failed write leaves the old one intact
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            for block in blocks:
+                f.write(block)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {"strings": len(encoded), "lists": len(writer.lists),
+            "sections": len(section_records), "procedures": len(procedure_records)}
+
+
+class ChecklistSnapshot:
+    """A memory-mapped snapshot; sections and procedures are decoded only when asked for"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.string_count, self.list_count, self.section_count,
+         self.procedure_count, self._document_id, *offsets) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a checklist snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported snapshot version {version}")
+        (self._string_offsets, self._string_data, self._list_offsets, self._list_items,
+         self._sections, self._procedures, self._id_index, _) = offsets
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id == NONE:
+            return None
+        start, end = struct.unpack_from("<2Q", self._map, self._string_offsets + 8 * string_id)
+        return self._map[self._string_data + start:self._string_data + end].decode("utf-8")
+
+    def ref_list(self, list_id: int) -> Optional[list]:
+        if list_id == NONE:
+            return None
+        start, end = struct.unpack_from("<2I", self._map, self._list_offsets + 4 * list_id)
+        ids = struct.unpack_from(f"<{end - start}I", self._map, self._list_items + 4 * start)
+        return [self.string(string_id) for string_id in ids]
+
+    def engagement_header(self) -> dict:
+        """The checklist without its sections (version, client, period_end, ...)"""
+        return json.loads(self.string(self._document_id))
+
+    def section(self, index: int, with_procedures: bool = True) -> dict:
+        """Decode one section (index 0..section_count-1)"""
+        if not 0 <= index < self.section_count:
+            raise IndexError(f"section {index} out of range")
+        record = SECTION_RECORD.unpack_from(self._map, self._sections + SECTION_RECORD.size * index)
+        _, _, _, _, first, count, _ = record
+        procedures = [self.procedure(i) for i in range(first, first + count)] if with_procedures else []
+        return _section_from_record(record, self.string, procedures)
+
+    def section_procedure_range(self, index: int) -> range:
+        """Procedure numbers belonging to a section"""
+        _, _, _, _, first, count, _ = SECTION_RECORD.unpack_from(self._map, self._sections + SECTION_RECORD.size * index)
+        return range(first, first + count)
+
+    def procedure(self, number: int) -> dict:
+        """Decode one procedure (number 0..procedure_count-1, in checklist order)"""
+        if not 0 <= number < self.procedure_count:
+            raise IndexError(f"procedure {number} out of range")
+        record = PROCEDURE_RECORD.unpack_from(self._map, self._procedures + PROCEDURE_RECORD.size * number)
+        return _procedure_from_record(record, self.string, self.ref_list)
+
+    def _procedure_id(self, number: int) -> str:
+        string_id, = struct.unpack_from("<I", self._map, self._procedures + PROCEDURE_RECORD.size * number)
+        return self.string(string_id)
+
+    def find_procedure(self, procedure_id: str) -> Optional[dict]:
+        """Binary-search the id index for a procedure"""
+        low, high = 0, self.procedure_count
+        while low < high:
+            middle = (low + high) // 2
+            number, = struct.unpack_from("<I", self._map, self._id_index + 4 * middle)
+            if self._procedure_id(number) < procedure_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.procedure_count:
+            number, = struct.unpack_from("<I", self._map, self._id_index + 4 * low)
+            if self._procedure_id(number) == procedure_id:
+                return self.procedure(number)
+        return None
+
+    def iter_sections(self) -> Iterator[dict]:
+        for index in range(self.section_count):
+            yield self.section(index)
+
+    def to_checklist(self) -> dict:
+        """
+        Decode the whole snapshot back to checklist JSON
+        Every string and reference list is decoded once up front and the records are
+        unpacked in bulk, rather than one struct read per field as procedure() does.
+        """
+        string_offsets = struct.unpack_from(f"<{self.string_count + 1}Q", self._map, self._string_offsets)
+        data = self._map[self._string_data:self._list_offsets]
+        strings = [data[start:end].decode("utf-8") for start, end in zip(string_offsets, string_offsets[1:])]
+
+        list_offsets = struct.unpack_from(f"<{self.list_count + 1}I", self._map, self._list_offsets)
+        items = struct.unpack_from(f"<{list_offsets[-1]}I", self._map, self._list_items)
+        lists = [tuple(strings[string_id] for string_id in items[start:end])
+                 for start, end in zip(list_offsets, list_offsets[1:])]
+
+        def ref_list(list_id: int) -> list:
+            return list(lists[list_id])
+
+        string = strings.__getitem__
+        procedures = [_procedure_from_record(record, string, ref_list)
+                      for record in PROCEDURE_RECORD.iter_unpack(self._map[self._procedures:self._id_index])]
+        sections = []
+        for record in SECTION_RECORD.iter_unpack(self._map[self._sections:self._procedures]):
+            _, _, _, _, first, count, _ = record
+            sections.append(_section_from_record(record, string, procedures[first:first + count]))
+
+        document = json.loads(strings[self._document_id])
+        document["audit_engagement"]["sections"] = sections
+        return document
+
+
+def _extra(string, string_id: int, data: dict) -> dict:
+    if string_id != NONE:
+        data.update(json.loads(string(string_id)))
+    return data
+
+
+def _section_from_record(record: tuple, string, procedures: list) -> dict:
+    section_id, name, description, extra, _, _, risk_code = record
+    data = {"section_id": string(section_id)}
+    if name != NONE:
+        data["name"] = string(name)
+    if description != NONE:
+        data["description"] = string(description)
+    if risk_code >= 0:
+        data["risk_level"] = RISK_LEVELS[risk_code]
+    data["procedures"] = procedures
+    return _extra(string, extra, data)
+
+
+def _procedure_from_record(record: tuple, string, ref_list) -> dict:
+    (procedure_id, description, assigned_to, due_date, workpaper_ref, evidence_refs, xbrl_refs,
+     auditor, date, notes, sign_off_extra, extra, status_code, has_sign_off, exceptions) = record
+    data = {"procedure_id": string(procedure_id)}
+    if description != NONE:
+        data["description"] = string(description)
+    data["status"] = STATUSES[status_code]
+    if assigned_to != NONE:
+        data["assigned_to"] = string(assigned_to)
+    if due_date != NONE:
+        data["due_date"] = string(due_date)
+    if evidence_refs != NONE:
+        data["evidence_refs"] = ref_list(evidence_refs)
+    if xbrl_refs != NONE:
+        data["xbrl_refs"] = ref_list(xbrl_refs)
+    if workpaper_ref != NONE:
+        data["workpaper_ref"] = string(workpaper_ref)
+    if has_sign_off:
+        sign_off = {}
+        if auditor != NONE:
+            sign_off["auditor"] = string(auditor)
+        if date != NONE:
+            sign_off["date"] = string(date)
+        if notes != NONE:
+            sign_off["notes"] = string(notes)
+        if _EXCEPTIONS_VALUES[exceptions] is not None:
+            sign_off["exceptions"] = _EXCEPTIONS_VALUES[exceptions]
+        data["sign_off"] = _extra(string, sign_off_extra, sign_off)
+    return _extra(string, extra, data)
+
+
+def is_snapshot(path: str) -> bool:
+    """Whether a file is a checklist snapshot (by its magic bytes, whatever its extension)"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load_checklist(path: str, compact: bool = False) -> dict:
+    """
+    Load a checklist from a snapshot or from checklist JSON
+    With compact=True, JSON is decoded straight into the compact __slots__ model
+    (compact_checklist.py), which reads like the dicts with about a third of the memory.
+    Raises OSError if the file cannot be read and ValueError (json.JSONDecodeError for
+    JSON) if it is not a valid checklist file.
+    """
+    if is_snapshot(path):
+        with ChecklistSnapshot(path) as snapshot:
+            return snapshot.to_checklist()
+    if compact:
+        return load_compact_checklist(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def snapshot_from_json(json_file: str, snapshot_file: str) -> dict:
+    """Convert a checklist JSON file to a snapshot"""
+    with open(json_file, 'r', encoding='utf-8') as f:
+        return write_snapshot(json.load(f), snapshot_file)
+
+
+def snapshot_to_json(snapshot_file: str, json_file: str):
+    """Convert a snapshot back to checklist JSON"""
+    with ChecklistSnapshot(snapshot_file) as snapshot:
+        checklist = snapshot.to_checklist()
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(checklist, f, indent=2)
+
+
+def print_snapshot_info(snapshot_file: str):
+    """Open a snapshot and print its header counts"""
+    start = time.perf_counter()
+    with ChecklistSnapshot(snapshot_file) as snapshot:
+        header = snapshot.engagement_header()["audit_engagement"]
+        elapsed = time.perf_counter() - start
+        print(f"✓ Opened {snapshot_file} in {elapsed * 1000:.2f} ms")
+        print(f"  Client: {header.get('client')}")
+        print(f"  Period: {header.get('period_end')}")
+        print(f"  Sections: {snapshot.section_count}")
+        print(f"  Procedures: {snapshot.procedure_count}")
+        print(f"  Unique strings: {snapshot.string_count}, shared reference lists: {snapshot.list_count}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("to-snapshot", "to-json", "info"):
+        print(__doc__.split("Usage:")[1])
+        sys.exit(1)
+
+    command = sys.argv[1]
+    if command == "info":
+        print_snapshot_info(sys.argv[2])
+    elif len(sys.argv) < 4:
+        print(f"✗ {command} needs an input and an output file")
+        sys.exit(1)
+    elif command == "to-snapshot":
+        start = time.perf_counter()
+        counts = snapshot_from_json(sys.argv[2], sys.argv[3])
+        print(f"✓ Wrote {sys.argv[3]}: {counts['sections']} sections, {counts['procedures']} procedures "
+              f"in {time.perf_counter() - start:.2f}s")
+    else:
+        snapshot_to_json(sys.argv[2], sys.argv[3])
+        print(f"✓ Wrote {sys.argv[3]}")
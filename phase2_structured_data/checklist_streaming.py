@@ -0,0 +1,360 @@
+"""
+Streaming validation of very large checklist files
+Purpose: Find checklist errors without loading the whole file
+Scenario: A multi-GB firm-wide audit program should not have to be materialized to find its first error
+
+The file is read in chunks. The "spine" of the checklist (the root object, the
+engagement object, the sections array and each section's procedures array) is
+walked incrementally; every other value, including each procedure, is decoded
+on its own with the C JSON decoder and validated at once with the compiled
+schema validator. Only one procedure (plus a couple of read chunks) is in memory
+at a time, so memory stays flat however large the file is. Errors are yielded
+as soon as they are found, with their JSON paths.
+
+ChecklistSections walks the same spine for incremental validation. It yields
+each section with the SHA-256 of its JSON text exactly as written in the file.
+The text is hashed as the reader consumes it, so only one section is ever in
+memory. A section is decoded in one C decoder call, unless it is longer than
+SECTION_DECODE_CHARS; then its procedures are decoded one at a time.
+"""
+
+import hashlib
+import json
+from typing import Iterator, Optional, Tuple
+
+from checklist_validation import PROCEDURE_POINTER, get_checklist_validator, sign_off_errors
+
+DEFAULT_CHUNK_SIZE = 1 << 20  # 1 MB
+# A single procedure (or other leaf value) larger than this is treated as a syntax error
+MAX_VALUE_CHARS = 64 << 20
+# Sections up to this long are decoded whole by ChecklistSections; longer ones are walked
+SECTION_DECODE_CHARS = 16 << 20
+
+# Which containers are streamed rather than decoded whole: dicts stream an object's
+# keys, one-element lists stream an array's items
+CHECKLIST_PLAN = {
+    "audit_engagement": {
+        "sections": [
+            {"procedures": [None]},
+        ],
+    },
+}
+
+
+class _Hashed:
+    """Plan marker: an array whose items are yielded with the SHA-256 of their JSON text"""
+
+    def __init__(self, item_plan):
+        self.item_plan = item_plan
+
+
+# Sections are hashed as they stream past; each section's procedures are decoded one at a time
+SECTION_DIGEST_PLAN = {
+    "audit_engagement": {
+        "sections": _Hashed({"procedures": [None]}),
+    },
+}
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+_TOO_LONG = object()
+
+
+class ChecklistSyntaxError(ValueError):
+    """The checklist file is not valid JSON"""
+
+
+class _StreamReader:
+    """Chunked reader with just enough JSON tokenizing to walk the spine"""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.offset = 0  # characters dropped from the front of the buffer so far
+        self.eof = False
+        self.hasher = None  # while set, consumed text from hashed_to on is fed to it
+        self.hashed_to = 0
+
+    def _fill(self, size: Optional[int] = None) -> bool:
+        # Drop what has been consumed so the buffer stays about one chunk long
+        if self.pos > self.chunk_size:
+            if self.hasher is not None:
+                self.hasher.update(self.buffer[self.hashed_to:self.pos].encode("utf-8"))
+                self.hashed_to = 0
+            self.buffer = self.buffer[self.pos:]
+            self.offset += self.pos
+            self.pos = 0
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def error(self, message: str) -> ChecklistSyntaxError:
+        return ChecklistSyntaxError(f"JSON syntax error at character {self.offset + self.pos}: {message}")
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at end of file), without consuming it"""
+        while True:
+            buffer = self.buffer
+            pos = self.pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return ""
+
+    def advance(self):
+        self.pos += 1
+
+    def start_hash(self):
+        """Hash everything consumed from the next value on (as UTF-8), until end_hash()"""
+        self.peek()
+        self.hasher = hashlib.sha256()
+        self.hashed_to = self.pos
+
+    def end_hash(self) -> str:
+        self.hasher.update(self.buffer[self.hashed_to:self.pos].encode("utf-8"))
+        digest = self.hasher.hexdigest()
+        self.hasher = None
+        return digest
+
+    def read_value(self):
+        """Decode one complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof or len(self.buffer) - self.pos > MAX_VALUE_CHARS:
+                    raise self.error(e.msg) from None
+                self._fill()
+                continue
+            # A number that ends the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def read_value_within(self, limit: int):
+        """
+        Decode the next value if it ends within `limit` characters, else return _TOO_LONG
+        Nothing is consumed if it does not (invalid JSON counts as too long). The read size
+        doubles while looking for the end, so a failed attempt costs about twice the limit.
+        """
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or len(self.buffer) - self.pos >= limit:
+                    return _TOO_LONG
+                size *= 2
+                self._fill(size)
+                continue
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def read_key(self) -> str:
+        if self.peek() != '"':
+            raise self.error("expected a property name")
+        key = self.read_value()
+        if self.peek() != ":":
+            raise self.error("expected ':'")
+        self.advance()
+        return key
+
+    def after_member(self, closer: str) -> bool:
+        """Consume ',' (returns True, more members follow) or the closer (returns False)"""
+        char = self.peek()
+        self.advance()
+        if char == ",":
+            return True
+        if char == closer:
+            return False
+        raise self.error(f"expected ',' or '{closer}'")
+
+
+class _ChecklistStream:
+    """Walks a checklist file and yields its validation errors"""
+
+    def __init__(self, reader: _StreamReader, stats: dict):
+        self.reader = reader
+        self.validator = get_checklist_validator()
+        self.stats = stats
+
+    def stream_object(self, plan: dict, path: str, pointer: str):
+        """Walk an object whose '{' has been consumed; returns its non-streamed members"""
+        reader = self.reader
+        collected = {}
+        if reader.peek() == "}":
+            reader.advance()
+            return collected
+        while True:
+            key = reader.read_key()
+            sub_plan = plan.get(key)
+            child_path = f"{path}.{key}" if path else key
+            child_pointer = f"{pointer}/properties/{key}"
+            next_char = reader.peek()
+            if isinstance(sub_plan, dict) and next_char == "{":
+                reader.advance()
+                collected[key] = yield from self.stream_object(sub_plan, child_path, child_pointer)
+            elif isinstance(sub_plan, list) and next_char == "[":
+                reader.advance()
+                yield from self.stream_array(sub_plan[0], child_path, f"{child_pointer}/items")
+                # Items were validated as they streamed past; the parent sees an empty array
+                collected[key] = []
+            else:
+                collected[key] = reader.read_value()
+            if not reader.after_member("}"):
+                return collected
+
+    def stream_array(self, item_plan, path: str, item_pointer: str):
+        """Walk an array whose '[' has been consumed, validating each item"""
+        reader = self.reader
+        item_validator = self.validator.validator_for(item_pointer)
+        is_procedure = item_pointer == PROCEDURE_POINTER
+        if reader.peek() == "]":
+            reader.advance()
+            return
+        index = 0
+        while True:
+            item_path = f"{path}[{index}]"
+            if isinstance(item_plan, dict) and reader.peek() == "{":
+                reader.advance()
+                item = yield from self.stream_object(item_plan, item_path, item_pointer)
+                self.stats["sections"] += 1
+            else:
+                item = reader.read_value()
+
+            errors = []
+            item_validator(item, item_path, errors)
+            if is_procedure:
+                errors.extend(sign_off_errors(item, item_path))
+                self.stats["procedures"] += 1
+                if type(item) is dict and type(item.get("xbrl_refs")) is list:
+                    self.stats["xbrl_refs"] += len(item["xbrl_refs"])
+            yield from errors
+
+            index += 1
+            if not reader.after_member("]"):
+                return
+
+    def run(self):
+        reader = self.reader
+        if reader.peek() != "{":
+            # Not an object at the top level: decode it and let the schema say why
+            root = reader.read_value()
+        else:
+            reader.advance()
+            root = yield from self.stream_object(CHECKLIST_PLAN, "", "#")
+        if reader.peek() != "":
+            raise reader.error("extra data after the checklist")
+
+        engagement = root.get("audit_engagement") if type(root) is dict else None
+        if type(engagement) is dict:
+            self.stats["client"] = engagement.get("client")
+            self.stats["period_end"] = engagement.get("period_end")
+        # Root and engagement fields; their streamed arrays were validated item by item
+        yield from self.validator(root)
+
+
+class ChecklistSections:
+    """
+    A checklist file's sections as (SHA-256 of the section's JSON text, decoded section)
+
+    Iterating reads the file once, in chunks. Afterwards `header` holds the rest of
+    the checklist with an empty sections array (or the whole value, if the file has
+    no sections array to walk) and `walked` says whether a sections array was found.
+    Raises ChecklistSyntaxError if the file is not valid JSON.
+    """
+
+    def __init__(self, filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.header = None
+        self.walked = False
+
+    def __iter__(self) -> Iterator[Tuple[str, object]]:
+        with open(self.filename, 'r', encoding='utf-8') as f:
+            reader = _StreamReader(f, self.chunk_size)
+            self.header = yield from self._walk(reader, SECTION_DIGEST_PLAN)
+            if reader.peek() != "":
+                raise reader.error("extra data after the checklist")
+
+    def _walk(self, reader: _StreamReader, plan):
+        """Decode the next value; containers in the plan are read piece by piece"""
+        char = reader.peek()
+        if isinstance(plan, _Hashed) and char == "[":
+            reader.advance()
+            self.walked = True
+            if reader.peek() == "]":
+                reader.advance()
+                return []
+            while True:
+                reader.start_hash()
+                item = reader.read_value_within(SECTION_DECODE_CHARS)
+                if item is _TOO_LONG:
+                    item = yield from self._walk(reader, plan.item_plan)
+                yield reader.end_hash(), item
+                if not reader.after_member("]"):
+                    return []
+        if isinstance(plan, dict) and char == "{":
+            reader.advance()
+            value = {}
+            if reader.peek() == "}":
+                reader.advance()
+                return value
+            while True:
+                key = reader.read_key()
+                value[key] = yield from self._walk(reader, plan.get(key))
+                if not reader.after_member("}"):
+                    return value
+        if isinstance(plan, list) and char == "[":
+            reader.advance()
+            value = []
+            if reader.peek() == "]":
+                reader.advance()
+                return value
+            while True:
+                value.append((yield from self._walk(reader, plan[0])))
+                if not reader.after_member("]"):
+                    return value
+        return reader.read_value()
+
+
+def iter_checklist_errors(filename: str, max_errors: Optional[int] = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE,
+                          stats: Optional[dict] = None) -> Iterator[str]:
+    """
+    Yield validation errors from a checklist file as they are found.
+
+    Stops after max_errors errors if given. A JSON syntax error is yielded as the
+    last error. If a `stats` dict is passed it is filled with the client,
+    period_end and section/procedure/xbrl_ref counts seen so far.
+    """
+    if stats is None:
+        stats = {}
+    stats.update(client=None, period_end=None, sections=0, procedures=0, xbrl_refs=0)
+    if max_errors is not None and max_errors <= 0:
+        return
+
+    count = 0
+    with open(filename, 'r', encoding='utf-8') as f:
+        stream = _ChecklistStream(_StreamReader(f, chunk_size), stats)
+        try:
+            for error in stream.run():
+                yield error
+                count += 1
+                if max_errors is not None and count >= max_errors:
+                    return
+        except ChecklistSyntaxError as e:
+            yield str(e)
@@ -0,0 +1,73 @@
+"""
+Checklist validation against the full AUDIT_CHECKLIST_SCHEMA
+Purpose: One place for the compiled schema validator and the audit rules on top of it
+Scenario: Every validation entry point (single file, streaming, batch) checks the same things
+
+The schema comes from 04_audit_checklist_model.py and is compiled once per
+process (and cached on disk between runs) by schema_compiler.py. The schema
+cannot express "a completed procedure's sign-off needs an auditor and a date",
+so that rule is checked here as well.
+"""
+
+import functools
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils import load_example_module
+from schema_compiler import CompiledValidator, compile_schema
+
+PROCEDURE_POINTER = "#/properties/audit_engagement/properties/sections/items/properties/procedures/items"
+
+
+def load_checklist_schema() -> dict:
+    """AUDIT_CHECKLIST_SCHEMA from 04_audit_checklist_model.py"""
+    return load_example_module("phase2_structured_data/04_audit_checklist_model.py").AUDIT_CHECKLIST_SCHEMA
+
+
+@functools.lru_cache(maxsize=None)
+def get_checklist_validator() -> CompiledValidator:
+    """The compiled AUDIT_CHECKLIST_SCHEMA validator (compiled once per process)"""
+    return compile_schema(load_checklist_schema())
+
+
+def sign_off_errors(procedure: dict, path: str) -> list:
+    """Completed procedures that carry a sign-off must name the auditor and date"""
+    if type(procedure) is not dict or procedure.get("status") != "completed":
+        return []
+    sign_off = procedure.get("sign_off")
+    if type(sign_off) is not dict:
+        return []
+    errors = []
+    if "auditor" not in sign_off:
+        errors.append(f"{path}: Completed procedure missing sign_off.auditor")
+    if "date" not in sign_off:
+        errors.append(f"{path}: Completed procedure missing sign_off.date")
+    return errors
+
+
+def audit_rule_errors(checklist: dict) -> list:
+    """Errors from the rules the schema cannot express"""
+    errors = []
+    engagement = checklist.get("audit_engagement") if type(checklist) is dict else None
+    sections = engagement.get("sections") if type(engagement) is dict else None
+    if type(sections) is not list:
+        return errors
+    for i, section in enumerate(sections):
+        procedures = section.get("procedures") if type(section) is dict else None
+        if type(procedures) is not list:
+            continue
+        for j, procedure in enumerate(procedures):
+            if type(procedure) is dict and procedure.get("status") == "completed" and "sign_off" in procedure:
+                errors.extend(sign_off_errors(procedure, f"audit_engagement.sections[{i}].procedures[{j}]"))
+    return errors
+
+
+def validate_checklist(checklist: dict) -> tuple:
+    """
+    Validate a decoded checklist against the full schema plus the sign-off rule
+    Returns: (is_valid, errors)
+    """
+    errors = get_checklist_validator()(checklist)
+    errors.extend(audit_rule_errors(checklist))
+    return len(errors) == 0, errors
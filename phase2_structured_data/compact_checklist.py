@@ -0,0 +1,351 @@
+"""
+Compact typed in-memory checklist model
+Purpose: Hold firm-wide audit programs (a million procedures) without a dict per procedure
+Scenario: Summaries, exports and cross-referencing over very large checklists
+
+Procedures, sections and sign-offs are __slots__ classes instead of dicts.
+Statuses and risk levels are stored as small integer codes, IDs, names, dates
+and XBRL/evidence references are interned, and identical reference lists share
+one tuple. json.load decodes straight into these classes through
+object_pairs_hook, so no intermediate dict tree is ever built.
+
+Keys the model does not know about are kept in each object's `extra` dict, so
+Checklist.to_dict() returns JSON equal to what was loaded.
+
+Every object also reads like the dict json.load would have built
+(checklist["audit_engagement"], proc["status"], proc.get("xbrl_refs", [])),
+so the summary, validation and workpaper code runs on it unchanged;
+load_checklist(path, compact=True) in checklist_snapshot.py loads JSON this way.
+
+Usage:
+    python compact_checklist.py sample_audit_checklist.json
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from typing import Optional
+
+STATUSES = ("not_started", "in_progress", "completed", "not_applicable")
+RISK_LEVELS = ("low", "medium", "high")
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+RISK_CODES = {risk: code for code, risk in enumerate(RISK_LEVELS)}
+COMPLETED = STATUS_CODES["completed"]
+NO_RISK = -1
+
+_intern = sys.intern
+
+
+def _intern_or_none(value):
+    return _intern(value) if type(value) is str else value
+
+
+def _extra_fields(data: dict, fields: frozenset) -> Optional[dict]:
+    """Keys the model has no slot for (almost always none)"""
+    if data.keys() <= fields:
+        return None
+    return {key: value for key, value in data.items() if key not in fields}
+
+
+class _Record:
+    """Read-only dict-style access by JSON key; absent (None) fields are missing keys"""
+    __slots__ = ()
+    KEYS = ()
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def keys(self) -> list:
+        keys = [key for key in self.KEYS if getattr(self, key) is not None]
+        if self.extra:
+            keys.extend(self.extra)
+        return keys
+
+
+class SignOff(_Record):
+    """A procedure's sign-off"""
+    __slots__ = ("auditor", "date", "notes", "exceptions", "extra")
+    KEYS = ("auditor", "date", "notes", "exceptions")
+    FIELDS = frozenset(KEYS)
+
+    def __init__(self, auditor=None, date=None, notes=None, exceptions=None, extra=None):
+        self.auditor = auditor
+        self.date = date
+        self.notes = notes
+        self.exceptions = exceptions
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SignOff":
+        return cls(_intern_or_none(data.get("auditor")), _intern_or_none(data.get("date")),
+                   data.get("notes"), data.get("exceptions"), _extra_fields(data, cls.FIELDS))
+
+    def to_dict(self) -> dict:
+        data = {}
+        for field in ("auditor", "date", "notes", "exceptions"):
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Procedure(_Record):
+    """One audit procedure; status is stored as an index into STATUSES"""
+    __slots__ = ("procedure_id", "description", "status_code", "assigned_to", "due_date",
+                 "evidence_refs", "xbrl_refs", "workpaper_ref", "sign_off", "extra")
+    KEYS = ("procedure_id", "description", "status", "assigned_to", "due_date",
+            "evidence_refs", "xbrl_refs", "workpaper_ref", "sign_off")
+    FIELDS = frozenset(KEYS)
+
+    def __init__(self, procedure_id, description, status_code, assigned_to=None, due_date=None,
+                 evidence_refs=None, xbrl_refs=None, workpaper_ref=None, sign_off=None, extra=None):
+        self.procedure_id = procedure_id
+        self.description = description
+        self.status_code = status_code
+        self.assigned_to = assigned_to
+        self.due_date = due_date
+        self.evidence_refs = evidence_refs
+        self.xbrl_refs = xbrl_refs
+        self.workpaper_ref = workpaper_ref
+        self.sign_off = sign_off
+        self.extra = extra
+
+    @property
+    def status(self) -> str:
+        return STATUSES[self.status_code]
+
+    @property
+    def is_completed(self) -> bool:
+        return self.status_code == COMPLETED
+
+    def to_dict(self) -> dict:
+        data = {"procedure_id": self.procedure_id, "description": self.description, "status": self.status}
+        for field in ("assigned_to", "due_date"):
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        if self.evidence_refs is not None:
+            data["evidence_refs"] = list(self.evidence_refs)
+        if self.xbrl_refs is not None:
+            data["xbrl_refs"] = list(self.xbrl_refs)
+        if self.workpaper_ref is not None:
+            data["workpaper_ref"] = self.workpaper_ref
+        if self.sign_off is not None:
+            data["sign_off"] = self.sign_off.to_dict() if isinstance(self.sign_off, SignOff) else self.sign_off
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Section(_Record):
+    """One audit section; risk level is stored as an index into RISK_LEVELS (NO_RISK if absent)"""
+    __slots__ = ("section_id", "name", "description", "risk_code", "procedures", "extra")
+    KEYS = ("section_id", "name", "description", "risk_level", "procedures")
+    FIELDS = frozenset(KEYS)
+
+    def __init__(self, section_id, name, description=None, risk_code=NO_RISK, procedures=None, extra=None):
+        self.section_id = section_id
+        self.name = name
+        self.description = description
+        self.risk_code = risk_code
+        self.procedures = procedures if procedures is not None else []
+        self.extra = extra
+
+    @property
+    def risk_level(self) -> Optional[str]:
+        return RISK_LEVELS[self.risk_code] if self.risk_code != NO_RISK else None
+
+    def to_dict(self) -> dict:
+        data = {"section_id": self.section_id, "name": self.name}
+        if self.description is not None:
+            data["description"] = self.description
+        if self.risk_code != NO_RISK:
+            data["risk_level"] = self.risk_level
+        data["procedures"] = [procedure.to_dict() for procedure in self.procedures]
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Engagement(_Record):
+    """The audit engagement header and its sections"""
+    __slots__ = ("client", "client_id", "period_end", "fiscal_year", "engagement_partner",
+                 "materiality", "sections", "extra")
+    KEYS = ("client", "client_id", "period_end", "fiscal_year", "engagement_partner",
+            "materiality", "sections")
+    FIELDS = frozenset(KEYS)
+
+    def __init__(self, client, period_end, engagement_partner, sections, client_id=None,
+                 fiscal_year=None, materiality=None, extra=None):
+        self.client = client
+        self.client_id = client_id
+        self.period_end = period_end
+        self.fiscal_year = fiscal_year
+        self.engagement_partner = engagement_partner
+        self.materiality = materiality
+        self.sections = sections
+        self.extra = extra
+
+    def to_dict(self) -> dict:
+        data = {}
+        for field in ("client", "client_id", "period_end", "fiscal_year", "engagement_partner", "materiality"):
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        data["sections"] = [section.to_dict() for section in self.sections]
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Checklist(_Record):
+    """A whole audit checklist document"""
+    __slots__ = ("version", "engagement", "extra")
+    KEYS = ("version", "audit_engagement")
+    FIELDS = frozenset(KEYS)
+
+    def __init__(self, version, engagement, extra=None):
+        self.version = version
+        self.engagement = engagement
+        self.extra = extra
+
+    @property
+    def audit_engagement(self) -> Engagement:
+        return self.engagement
+
+    def iter_procedures(self):
+        """Yield (section, procedure) for every procedure"""
+        for section in self.engagement.sections:
+            for procedure in section.procedures:
+                yield section, procedure
+
+    def to_dict(self) -> dict:
+        data = {"version": self.version, "audit_engagement": self.engagement.to_dict()}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class _CompactDecoder:
+    """object_pairs_hook that builds model objects as json.load finishes each object"""
+
+    def __init__(self):
+        # Identical reference lists share one tuple
+        self._ref_tuples = {}
+
+    def _refs(self, values):
+        if type(values) is not list:
+            return values
+        refs = tuple(_intern(value) if type(value) is str else value for value in values)
+        return self._ref_tuples.setdefault(refs, refs)
+
+    def __call__(self, pairs):
+        # Objects arrive innermost first; the keys tell us which kind each one is
+        data = dict(pairs)
+        if "procedure_id" in data:
+            return self._procedure(data)
+        if "section_id" in data and "procedures" in data:
+            return self._section(data)
+        if "sections" in data and "client" in data:
+            return self._engagement(data)
+        if "audit_engagement" in data:
+            return Checklist(data.get("version"), data["audit_engagement"],
+                             _extra_fields(data, Checklist.FIELDS))
+        return data
+
+    def _procedure(self, data: dict) -> Procedure:
+        status = data.get("status")
+        status_code = STATUS_CODES.get(status)
+        if status_code is None:
+            raise ValueError(f"Procedure {data['procedure_id']}: unknown status {status!r}")
+        sign_off = data.get("sign_off")
+        if type(sign_off) is dict:
+            sign_off = SignOff.from_dict(sign_off)
+        return Procedure(
+            _intern(data["procedure_id"]), data.get("description"), status_code,
+            _intern_or_none(data.get("assigned_to")), _intern_or_none(data.get("due_date")),
+            self._refs(data.get("evidence_refs")), self._refs(data.get("xbrl_refs")),
+            _intern_or_none(data.get("workpaper_ref")), sign_off, _extra_fields(data, Procedure.FIELDS),
+        )
+
+    def _section(self, data: dict) -> Section:
+        risk_level = data.get("risk_level")
+        risk_code = NO_RISK if risk_level is None else RISK_CODES.get(risk_level)
+        if risk_code is None:
+            raise ValueError(f"Section {data['section_id']}: unknown risk_level {risk_level!r}")
+        return Section(_intern(data["section_id"]), _intern_or_none(data.get("name")), data.get("description"),
+                       risk_code, data["procedures"], _extra_fields(data, Section.FIELDS))
+
+    def _engagement(self, data: dict) -> Engagement:
+        return Engagement(data["client"], data.get("period_end"), data.get("engagement_partner"),
+                          data["sections"], data.get("client_id"), data.get("fiscal_year"),
+                          data.get("materiality"), _extra_fields(data, Engagement.FIELDS))
+
+
+def load_compact_checklist(filename: str) -> Checklist:
+    """Decode a checklist JSON file straight into the compact model"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f, object_pairs_hook=_CompactDecoder())
+
+
+def loads_compact_checklist(text: str) -> Checklist:
+    """Decode checklist JSON text straight into the compact model"""
+    return json.loads(text, object_pairs_hook=_CompactDecoder())
+
+
+def completion_by_section(checklist: Checklist) -> list:
+    """(section_id, name, risk_level, completed, total) for every section"""
+    return [
+        (section.section_id, section.name, section.risk_level,
+         sum(1 for procedure in section.procedures if procedure.status_code == COMPLETED),
+         len(section.procedures))
+        for section in checklist.engagement.sections
+    ]
+
+
+def compare_with_dicts(filename: str):
+    """Print load time and memory of json.load dicts versus the compact model"""
+    def measure(load):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = load()
+        seconds = time.perf_counter() - start
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, seconds, current
+
+    def load_dicts():
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    checklist, compact_seconds, compact_bytes = measure(lambda: load_compact_checklist(filename))
+    as_dicts, dict_seconds, dict_bytes = measure(load_dicts)
+    procedures = sum(1 for _ in checklist.iter_procedures())
+
+    print(f"Procedures: {procedures}")
+    print(f"  dicts:   {dict_bytes / 1024 / 1024:8.1f} MB  {dict_seconds:6.2f}s")
+    print(f"  compact: {compact_bytes / 1024 / 1024:8.1f} MB  {compact_seconds:6.2f}s  "
+          f"({dict_bytes / compact_bytes if compact_bytes else 0:.1f}x less memory)")
+    print(f"  Round trip lossless: {'✓' if checklist.to_dict() == as_dicts else '✗'}")
+
+
+if __name__ == "__main__":
+    compare_with_dicts(sys.argv[1] if len(sys.argv) > 1 else "sample_audit_checklist.json")
@@ -0,0 +1,302 @@
+"""
+JSON Schema to Python compiler
+Purpose: Turn a JSON schema into a specialized validation function, once
+Scenario: Validate checklists with 100k+ procedures against AUDIT_CHECKLIST_SCHEMA quickly
+
+A generic validator walks the schema for every value it checks. This module
+walks it once, generates straight-line Python for each object/array node (type
+checks with `type(v) is str`, enum checks against tuples, precompiled patterns),
+and compiles that source. The compiled code object is cached in __pycache__ keyed
+by a hash of the schema, so later runs skip code generation entirely.
+
+Supported keywords: type, required, properties, additionalProperties (false),
+items, enum, const, pattern, format (date), minLength, maxLength, minimum,
+maximum, minItems, maxItems. Other keywords are ignored.
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import re
+import sys
+from datetime import date
+
+# Bump when the generated code changes, so stale cached validators are not reused
+GENERATOR_VERSION = 1
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__")
+
+_TYPE_CHECKS = {
+    "string": "type({v}) is str",
+    "integer": "type({v}) is int",
+    "number": "type({v}) in (int, float)",
+    "boolean": "type({v}) is bool",
+    "object": "type({v}) is dict",
+    "array": "type({v}) is list",
+    "null": "{v} is None",
+}
+
+_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def _is_date(value: str) -> bool:
+    """RFC 3339 full-date (what JSON Schema's "date" format means)"""
+    if not _DATE_RE.fullmatch(value):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _type_name(value) -> str:
+    """JSON type name of a decoded value, for error messages"""
+    if value is None:
+        return "null"
+    return {bool: "boolean", int: "integer", float: "number", str: "string",
+            list: "array", dict: "object"}.get(type(value), type(value).__name__)
+
+
+_FORMAT_CHECKS = {"date": "_is_date"}
+
+_RUNTIME = {"_is_date": _is_date, "_type_name": _type_name, "_MISSING": object()}
+
+
+class _Generator:
+    """Emits one function per object/array schema node"""
+
+    def __init__(self):
+        self.functions = []
+        self.constants = {}
+        self.pointers = {}
+
+    def constant(self, prefix: str, value) -> str:
+        """Name for a module-level constant; regexes are given as ("regex", pattern)"""
+        name = f"_{prefix}_{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def node_function(self, schema: dict, pointer: str) -> str:
+        """Generate the function validating a value against schema; returns its name"""
+        name = f"_validate_{len(self.pointers)}"
+        self.pointers[pointer] = name
+        lines = [f"def {name}(value, path, errors):"]
+        self.emit_checks(schema, pointer, "value", "path", lines, "    ", is_root=(pointer == "#"))
+        if len(lines) == 1:
+            lines.append("    pass")
+        self.functions.append("\n".join(lines))
+        return name
+
+    def emit_checks(self, schema: dict, pointer: str, v: str, path: str, lines: list, indent: str,
+                    is_root: bool = False):
+        """Emit the checks for value `v` (at runtime path expression `path`)"""
+        types = schema.get("type")
+        if isinstance(types, str):
+            types = [types]
+
+        # The remaining keyword checks only run when the type is right
+        body = []
+        self.emit_keyword_checks(schema, pointer, v, path, body, indent + "    " if types else indent,
+                                 types, is_root)
+        if types:
+            check = " or ".join(_TYPE_CHECKS[t].format(v=v) for t in types)
+            expected = " or ".join(types)
+            lines.append(f"{indent}if not ({check}):")
+            lines.append(f"{indent}    errors.append(f\"{{{path}}}: expected {expected}, got {{_type_name({v})}}\")")
+            if body:
+                lines.append(f"{indent}else:")
+        lines.extend(body)
+
+    def emit_keyword_checks(self, schema: dict, pointer: str, v: str, path: str, lines: list, indent: str,
+                            types, is_root: bool):
+        if "enum" in schema:
+            allowed = self.constant("ENUM", ("value", tuple(schema["enum"])))
+            shown = ", ".join(json.dumps(option) for option in schema["enum"])
+            lines.append(f"{indent}if {v} not in {allowed}:")
+            lines.append(f"{indent}    errors.append(f\"{{{path}}}: invalid value {{{v}!r}} (expected one of {_escape(shown)})\")")
+        if "const" in schema:
+            expected = self.constant("CONST", ("value", schema["const"]))
+            lines.append(f"{indent}if {v} != {expected}:")
+            lines.append(f"{indent}    errors.append(f\"{{{path}}}: must equal {_escape(json.dumps(schema['const']))}\")")
+
+        string_checks = []
+        if "pattern" in schema:
+            regex = self.constant("PATTERN", ("regex", schema["pattern"]))
+            string_checks.append((f"{regex}.search({v}) is None",
+                                  f"does not match pattern {_escape(schema['pattern'])}"))
+        if schema.get("format") in _FORMAT_CHECKS:
+            string_checks.append((f"not {_FORMAT_CHECKS[schema['format']]}({v})",
+                                  f"is not a valid {schema['format']}"))
+        if "minLength" in schema:
+            string_checks.append((f"len({v}) < {int(schema['minLength'])}",
+                                  f"shorter than {int(schema['minLength'])} characters"))
+        if "maxLength" in schema:
+            string_checks.append((f"len({v}) > {int(schema['maxLength'])}",
+                                  f"longer than {int(schema['maxLength'])} characters"))
+        if string_checks:
+            guard = "" if types == ["string"] else f"type({v}) is str and "
+            for condition, message in string_checks:
+                lines.append(f"{indent}if {guard}{condition}:")
+                lines.append(f"{indent}    errors.append(f\"{{{path}}}: {{{v}!r}} {message}\")")
+
+        for keyword, op in (("minimum", "<"), ("maximum", ">")):
+            if keyword in schema:
+                guard = "" if types in (["number"], ["integer"]) else f"type({v}) in (int, float) and "
+                lines.append(f"{indent}if {guard}{v} {op} {schema[keyword]!r}:")
+                lines.append(f"{indent}    errors.append(f\"{{{path}}}: {{{v}!r}} is {'below the minimum' if op == '<' else 'above the maximum'} {schema[keyword]!r}\")")
+
+        if "properties" in schema or "required" in schema or schema.get("additionalProperties") is False:
+            self.emit_object(schema, pointer, v, path, lines, indent, is_root, types == ["object"])
+        if "items" in schema or "minItems" in schema or "maxItems" in schema:
+            self.emit_array(schema, pointer, v, path, lines, indent, types == ["array"])
+
+    def emit_object(self, schema, pointer, v, path, lines, indent, is_root, type_checked):
+        if not type_checked:
+            lines.append(f"{indent}if type({v}) is dict:")
+            indent += "    "
+
+        def child_path(name):
+            return repr(name) if is_root else f"{path} + {'.' + name!r}"
+
+        properties = schema.get("properties", {})
+        for name in schema.get("required", []):
+            lines.append(f"{indent}if {name!r} not in {v}:")
+            lines.append(f"{indent}    errors.append({child_path(name)} + \": Missing required field\")")
+        if schema.get("additionalProperties") is False:
+            allowed = self.constant("KEYS", ("value", frozenset(properties)))
+            lines.append(f"{indent}for _key in {v}.keys() - {allowed}:")
+            prefix = "" if is_root else f"{{{path}}}."
+            lines.append(f"{indent}    errors.append(f\"{prefix}{{_key}}: Unexpected field\")")
+
+        for name, subschema in properties.items():
+            sub_pointer = f"{pointer}/properties/{name}"
+            if _needs_function(subschema):
+                function = self.node_function(subschema, sub_pointer)
+                lines.append(f"{indent}_v = {v}.get({name!r}, _MISSING)")
+                lines.append(f"{indent}if _v is not _MISSING:")
+                lines.append(f"{indent}    {function}(_v, {child_path(name)}, errors)")
+            elif _has_checks(subschema):
+                lines.append(f"{indent}_v = {v}.get({name!r}, _MISSING)")
+                lines.append(f"{indent}if _v is not _MISSING:")
+                inner = []
+                self.emit_checks(subschema, sub_pointer, "_v", f"({child_path(name)})", inner, indent + "    ")
+                lines.extend(inner)
+
+    def emit_array(self, schema, pointer, v, path, lines, indent, type_checked):
+        if not type_checked:
+            lines.append(f"{indent}if type({v}) is list:")
+            indent += "    "
+        for keyword, op in (("minItems", "<"), ("maxItems", ">")):
+            if keyword in schema:
+                lines.append(f"{indent}if len({v}) {op} {int(schema[keyword])}:")
+                lines.append(f"{indent}    errors.append(f\"{{{path}}}: {'fewer' if op == '<' else 'more'} than {int(schema[keyword])} items\")")
+
+        items = schema.get("items")
+        if not isinstance(items, dict) or not _has_checks(items):
+            return
+        item_pointer = f"{pointer}/items"
+        simple_type = items.get("type") if set(items) == {"type"} and isinstance(items.get("type"), str) else None
+        if simple_type:
+            # Lists of plain scalars: check them all in one pass, locate errors only on failure
+            check = _TYPE_CHECKS[simple_type].format(v="_item")
+            lines.append(f"{indent}if not all({check} for _item in {v}):")
+            lines.append(f"{indent}    for _i, _item in enumerate({v}):")
+            lines.append(f"{indent}        if not ({check}):")
+            lines.append(f"{indent}            errors.append(f\"{{{path}}}[{{_i}}]: expected {simple_type}, got {{_type_name(_item)}}\")")
+            return
+        function = self.node_function(items, item_pointer)
+        lines.append(f"{indent}for _i, _item in enumerate({v}):")
+        lines.append(f"{indent}    {function}(_item, f\"{{{path}}}[{{_i}}]\", errors)")
+
+
+def _escape(text: str) -> str:
+    """Escape text for use inside a generated f-string literal"""
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("{", "{{").replace("}", "}}")
+
+
+def _needs_function(schema: dict) -> bool:
+    return isinstance(schema, dict) and any(key in schema for key in ("properties", "required", "items"))
+
+
+def _has_checks(schema: dict) -> bool:
+    return isinstance(schema, dict) and any(
+        key in schema for key in ("type", "enum", "const", "pattern", "format", "properties", "required",
+                                  "items", "additionalProperties", "minLength", "maxLength",
+                                  "minimum", "maximum", "minItems", "maxItems")
+    )
+
+
+def generate_validator_source(schema: dict) -> tuple:
+    """Python source of the validator module for a schema, plus its constants"""
+    generator = _Generator()
+    generator.node_function(schema, "#")
+    source = "\n\n".join(reversed(generator.functions))
+    source += "\n\nVALIDATORS = {" + ", ".join(
+        f"{pointer!r}: {name}" for pointer, name in generator.pointers.items()
+    ) + "}\n"
+    return source, generator.constants
+
+
+class CompiledValidator:
+    """A schema compiled to Python; call it with a decoded document to get its errors"""
+
+    def __init__(self, namespace: dict, schema_hash: str = ""):
+        self.schema_hash = schema_hash
+        self._validators = namespace["VALIDATORS"]
+        self._root = self._validators["#"]
+
+    def __call__(self, instance, path: str = "") -> list:
+        errors = []
+        self._root(instance, path, errors)
+        return errors
+
+    def validator_for(self, pointer: str):
+        """Generated function for a schema node, e.g. "#/properties/audit_engagement";
+        call it as function(value, path, errors)"""
+        return self._validators[pointer]
+
+
+def _schema_hash(schema: dict) -> str:
+    canonical = json.dumps(schema, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{GENERATOR_VERSION}:{canonical}".encode("utf-8")).hexdigest()[:16]
+
+
+def _load_cached(cache_file: str):
+    try:
+        with open(cache_file, 'rb') as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def _save_cached(cache_file: str, compiled):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            marshal.dump(compiled, f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+
+
+def compile_schema(schema: dict, use_cache: bool = True) -> CompiledValidator:
+    """Compile a JSON schema to a validator, reusing the on-disk cache when possible"""
+    schema_hash = _schema_hash(schema)
+    cache_file = os.path.join(CACHE_DIR, f"schema_validator_{schema_hash}.{sys.implementation.cache_tag}.bin")
+
+    compiled = _load_cached(cache_file) if use_cache and os.path.exists(cache_file) else None
+    if compiled is None:
+        source, constants = generate_validator_source(schema)
+        compiled = (compile(source, f"<validator for schema {schema_hash}>", "exec"), constants)
+        if use_cache:
+            _save_cached(cache_file, compiled)
+
+    code, constants = compiled
+    namespace = dict(_RUNTIME)
+    for name, (kind, value) in constants.items():
+        namespace[name] = re.compile(value) if kind == "regex" else value
+    exec(code, namespace)
+    return CompiledValidator(namespace, schema_hash)
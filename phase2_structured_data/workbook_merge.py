@@ -0,0 +1,92 @@
+"""
+Copy sheets between xlsx workbooks
+Purpose: Reassemble a workpaper generated one section at a time
+Scenario: Per-section xlsx skill calls each return a workbook; the auditor wants one file
+
+openpyxl cannot move a worksheet between workbooks, so each sheet is copied
+cell by cell. Styles are copied as style objects (fonts, fills, borders,
+alignment, number formats), because a cell's style ids only mean something
+inside the workbook they came from. Column widths, row heights, merged cells,
+frozen panes, filters, conditional formatting, data validation and tables
+are carried over as well.
+"""
+
+import re
+from copy import copy
+from typing import Optional
+
+from openpyxl import Workbook
+from openpyxl.worksheet.table import Table
+
+_INVALID_TITLE_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+def unique_sheet_title(title: str, workbook: Workbook) -> str:
+    """A valid sheet title (at most 31 characters, no []:*?/\\) not yet used in the workbook"""
+    base = _INVALID_TITLE_CHARS.sub("-", title).strip("'") or "Sheet"
+    used = {name.lower() for name in workbook.sheetnames}
+    candidate, n = base[:31], 1
+    while candidate.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        candidate = base[:31 - len(suffix)] + suffix
+    return candidate
+
+
+def _unique_table_name(name: str, workbook: Workbook) -> str:
+    used = {table_name for ws in workbook.worksheets for table_name in ws.tables}
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{name}_{n}"
+    return candidate
+
+
+def copy_sheet(source, target_workbook: Workbook, title: Optional[str] = None):
+    """Copy a worksheet (values, styles and sheet settings) into another workbook"""
+    target = target_workbook.create_sheet(unique_sheet_title(title or source.title, target_workbook))
+
+    for row in source.iter_rows():
+        for cell in row:
+            if cell.value is None and not cell.has_style:
+                continue
+            new_cell = target.cell(row=cell.row, column=cell.column, value=cell.value)
+            if cell.has_style:
+                new_cell.font = copy(cell.font)
+                new_cell.fill = copy(cell.fill)
+                new_cell.border = copy(cell.border)
+                new_cell.alignment = copy(cell.alignment)
+                new_cell.number_format = cell.number_format
+                new_cell.protection = copy(cell.protection)
+            if cell.hyperlink:
+                new_cell.hyperlink = copy(cell.hyperlink)
+            if cell.comment:
+                new_cell.comment = copy(cell.comment)
+
+    for key, dimension in source.column_dimensions.items():
+        target_dimension = target.column_dimensions[key]
+        target_dimension.width = dimension.width
+        target_dimension.hidden = dimension.hidden
+    for key, dimension in source.row_dimensions.items():
+        if dimension.height is not None:
+            target.row_dimensions[key].height = dimension.height
+
+    for merged_range in source.merged_cells.ranges:
+        target.merge_cells(str(merged_range))
+    target.freeze_panes = source.freeze_panes
+    if source.auto_filter.ref:
+        target.auto_filter.ref = source.auto_filter.ref
+    for conditional_range in source.conditional_formatting:
+        for rule in conditional_range.rules:
+            target.conditional_formatting.add(str(conditional_range.sqref), copy(rule))
+    for validation in source.data_validations.dataValidation:
+        target.add_data_validation(copy(validation))
+    for table in source.tables.values():
+        # Tables do not support copy(); the columns are named from the copied header cells on save
+        target.add_table(Table(displayName=_unique_table_name(table.displayName, target_workbook),
+                               ref=table.ref, tableStyleInfo=copy(table.tableStyleInfo)))
+
+    target.sheet_properties.tabColor = source.sheet_properties.tabColor
+    target.page_setup.orientation = source.page_setup.orientation
+    target.print_title_rows = source.print_title_rows
+    return target
@@ -0,0 +1,188 @@
+"""
+Async multi-engagement workpaper generation
+Purpose: Generate workpapers for a whole directory of audit checklists concurrently
+Scenario: Busy season - hundreds of engagements, one xlsx skill call each
+
+Each checklist goes through the same prompt as 06_checklist_to_excel.py, but the
+generation calls and Files API downloads run concurrently on AsyncAnthropic,
+with at most --max-in-flight engagements being processed at any one time.
+A prompt over the token budget is recorded as a failed engagement without
+being sent.
+
+Usage:
+    python workpaper_batch_runner.py checklists/ --output-dir workpapers --max-in-flight 8
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+from typing import NamedTuple, Optional
+
+import anthropic
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils import (PromptTooLarge, ResponseCache, adownload_files, check_token_budget, load_example_module,
+                         positive_token_budget)
+from checklist_batch_validation import is_tool_output
+from checklist_snapshot import load_checklist
+
+checklist_to_excel = load_example_module("phase2_structured_data/06_checklist_to_excel.py")
+
+DEFAULT_MAX_IN_FLIGHT = 8
+
+
+class EngagementResult(NamedTuple):
+    """Outcome of generating one engagement's workpaper"""
+    checklist_file: str
+    client: Optional[str]
+    status: str  # "success", "no_file", "invalid_checklist" or "failed"
+    output_file: Optional[str]
+    file_bytes: int
+    seconds: float
+    error: Optional[str]
+
+
+async def generate_workpaper_async(client: anthropic.AsyncAnthropic, cache: ResponseCache,
+                                   semaphore: asyncio.Semaphore, checklist_file: str,
+                                   output_dir: str, token_budget: Optional[int] = None) -> EngagementResult:
+    """Generate and download the workpaper for one checklist file"""
+    start = time.perf_counter()
+    client_name = None
+
+    def result(status, output_file=None, file_bytes=0, error=None):
+        return EngagementResult(checklist_file, client_name, status, output_file,
+                                file_bytes, time.perf_counter() - start, error)
+
+    try:
+        engagement = load_checklist(checklist_file, compact=True)["audit_engagement"]
+        client_name = engagement["client"]
+        prompt = checklist_to_excel.build_workpaper_prompt(engagement)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return result("invalid_checklist", error=f"{type(e).__name__}: {e}")
+
+    # Preflight: a prompt over budget would truncate, so it fails without a request being sent
+    try:
+        check_token_budget(prompt, token_budget)
+    except PromptTooLarge as e:
+        return result("failed", error=f"{type(e).__name__}: {e}")
+
+    # The semaphore covers both the generation call and the download
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            response = await cache.acreate(client, **checklist_to_excel.workpaper_request(prompt))
+
+            downloads = await adownload_files(client, response, output_dir,
+                                              checklist_to_excel.workpaper_filename(engagement, checklist_file), cache)
+            if not downloads:
+                return result("no_file")
+            return result("success", downloads[0].path, sum(download.size for download in downloads))
+        except Exception as e:
+            # API errors, httpx read errors mid-download and OSErrors writing the file
+            # all fail this engagement only
+            return result("failed", error=f"{type(e).__name__}: {e}")
+
+
+async def run_batch(checklist_files: list, output_dir: str,
+                    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                    cache: Optional[ResponseCache] = None, token_budget: Optional[int] = None) -> list:
+    """Generate workpapers for every checklist file, max_in_flight at a time"""
+    os.makedirs(output_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(max_in_flight)
+    cache = cache or ResponseCache.from_env()
+
+    async with anthropic.AsyncAnthropic() as client:
+        tasks = [
+            generate_workpaper_async(client, cache, semaphore, checklist_file, output_dir, token_budget)
+            for checklist_file in checklist_files
+        ]
+        results = []
+        for completed in asyncio.as_completed(tasks):
+            outcome = await completed
+            icon = "✓" if outcome.status == "success" else "✗"
+            print(f"  {icon} {os.path.basename(outcome.checklist_file)}: {outcome.status} "
+                  f"({outcome.seconds:.1f}s){' - ' + outcome.error if outcome.error else ''}")
+            results.append(outcome)
+
+    # Report in input order, not completion order
+    order = {checklist_file: i for i, checklist_file in enumerate(checklist_files)}
+    results.sort(key=lambda outcome: order[outcome.checklist_file])
+    return results
+
+
+def summarize_batch(results: list, wall_clock_seconds: float, max_in_flight: int) -> dict:
+    """Throughput and status counts for a finished batch"""
+    status_counts = {}
+    for outcome in results:
+        status_counts[outcome.status] = status_counts.get(outcome.status, 0) + 1
+    busy_seconds = sum(outcome.seconds for outcome in results)
+    return {
+        "engagements": len(results),
+        "status_counts": status_counts,
+        "max_in_flight": max_in_flight,
+        "wall_clock_seconds": round(wall_clock_seconds, 2),
+        "sum_of_engagement_seconds": round(busy_seconds, 2),
+        "effective_concurrency": round(busy_seconds / wall_clock_seconds, 2) if wall_clock_seconds else 0.0,
+        "engagements_per_minute": round(len(results) / wall_clock_seconds * 60, 2) if wall_clock_seconds else 0.0,
+        "bytes_downloaded": sum(outcome.file_bytes for outcome in results),
+        "results": [outcome._asdict() for outcome in results],
+    }
+
+
+def print_batch_summary(summary: dict):
+    """Print the batch summary"""
+    print("\n" + "="*60)
+    print("BATCH WORKPAPER GENERATION SUMMARY")
+    print("="*60)
+    print(f"Engagements: {summary['engagements']} (max in flight: {summary['max_in_flight']})")
+    for status, count in sorted(summary["status_counts"].items()):
+        print(f"  {status}: {count}")
+    print(f"Wall-clock time: {summary['wall_clock_seconds']:.1f}s "
+          f"(sum of engagement times {summary['sum_of_engagement_seconds']:.1f}s, "
+          f"effective concurrency {summary['effective_concurrency']:.1f}x)")
+    print(f"Throughput: {summary['engagements_per_minute']:.1f} engagements/minute")
+    print(f"Downloaded: {summary['bytes_downloaded'] / 1024:.1f} KB")
+    print("="*60 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate workpapers for a directory of audit checklists")
+    parser.add_argument("checklist_dir", help="Directory containing checklist JSON or snapshot (.acks) files")
+    parser.add_argument("--output-dir", default="workpapers", help="Where to write the workpapers")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Maximum engagements processed concurrently")
+    parser.add_argument("--token-budget", type=positive_token_budget, default=None,
+                        help="Input-token budget per prompt (default: AUDIT_PROMPT_TOKEN_BUDGET or 100000)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Call the API even when a cached response exists")
+    args = parser.parse_args()
+
+    # The output directory may be the input directory, so skip batch_summary.json and other tool output
+    checklist_files = sorted(path for pattern in ("*.json", "*.acks")
+                             for path in glob.glob(os.path.join(args.checklist_dir, pattern))
+                             if not is_tool_output(path))
+    if not checklist_files:
+        print(f"✗ No checklist JSON or snapshot files found in: {args.checklist_dir}")
+        sys.exit(1)
+
+    print(f"Generating workpapers for {len(checklist_files)} engagement(s), "
+          f"{args.max_in_flight} in flight...\n")
+
+    start = time.perf_counter()
+    cache = ResponseCache.from_env(bypass=args.no_cache)
+    results = asyncio.run(run_batch(checklist_files, args.output_dir, args.max_in_flight, cache, args.token_budget))
+    summary = summarize_batch(results, time.perf_counter() - start, args.max_in_flight)
+
+    print_batch_summary(summary)
+    summary_file = os.path.join(args.output_dir, "batch_summary.json")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print(f"✓ Per-engagement results saved to: {summary_file}")
+
+
+if __name__ == "__main__":
+    main()
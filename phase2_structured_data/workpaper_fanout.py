@@ -0,0 +1,279 @@
+"""
+Per-section fan-out of workpaper generation
+Purpose: Generate a large engagement's workpaper as many small xlsx skill calls
+Scenario: One prompt with every procedure row fails or truncates on big engagements
+
+Each section's sheet is its own xlsx skill request, plus one request for the
+Audit Summary and XBRL Cross-Reference sheets (given section statistics, not
+procedure rows). The requests run concurrently on AsyncAnthropic, so wall-clock
+time follows the largest section rather than the whole engagement. The
+returned workbooks are then merged locally, in checklist order, with their
+styles. A part that fails is built locally by workpaper_writer.py instead, so
+the merged workbook is always complete. A section whose prompt is over the
+token budget is split into several parts, each becoming its own sheet.
+
+Usage:
+    python workpaper_fanout.py sample_audit_checklist.json --max-in-flight 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, NamedTuple, Optional
+
+import anthropic
+from openpyxl import Workbook, load_workbook
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils import (
+    PromptTemplate,
+    PromptTooLarge,
+    ResponseCache,
+    adownload_files,
+    check_token_budget,
+    load_example_module,
+    positive_token_budget,
+    split_to_budget,
+)
+from checklist_snapshot import load_checklist
+from workbook_merge import copy_sheet
+from workpaper_writer import write_section_workbook, write_summary_workbook
+
+checklist_to_excel = load_example_module("phase2_structured_data/06_checklist_to_excel.py")
+
+DEFAULT_MAX_IN_FLIGHT = 8
+
+
+class PartResult(NamedTuple):
+    """Outcome of generating one part (the summary sheets or one section's sheet)"""
+    name: str
+    path: str
+    status: str  # "success", or "local" when the call failed and the part was built locally
+    seconds: float
+    error: Optional[str]
+    build_locally: Callable[[str], object]  # writes this part's workbook with openpyxl
+
+
+SUMMARY_PROMPT = PromptTemplate("""Create the summary sheets of an audit workpaper in Excel. The section sheets are
+produced separately and merged in afterwards, so create only the two sheets below.
+
+{header}
+Section statistics:
+| Section ID | Section Name | Risk Level | Total Procedures | Completed Procedures | Procedures with exceptions |
+{section_rows}{summary_sheet}{xbrl_sheet}{formatting}""")
+
+SECTION_STATS_ROW = PromptTemplate(
+    "- {section_id} | {name} | {risk_level} | {total} | {completed} | {exceptions}\n")
+
+SECTION_PROMPT = PromptTemplate("""Create one sheet of an audit workpaper in Excel. The other sheets are produced
+separately and merged in afterwards, so create only this sheet.
+
+{header}{section_sheet}{formatting}""")
+
+
+def _section_stats(section: dict) -> dict:
+    procedures = section["procedures"]
+    return {
+        "section_id": section["section_id"],
+        "name": section["name"],
+        "risk_level": section["risk_level"].upper(),
+        "total": len(procedures),
+        "completed": sum(1 for proc in procedures if proc["status"] == "completed"),
+        "exceptions": sum(1 for proc in procedures if proc.get("sign_off", {}).get("exceptions")),
+    }
+
+
+def build_summary_prompt(engagement: dict) -> str:
+    """xlsx skill prompt for the Audit Summary and XBRL Cross-Reference sheets only"""
+    return SUMMARY_PROMPT.render(
+        header=checklist_to_excel.engagement_header(engagement),
+        section_rows=SECTION_STATS_ROW.render_rows(map(_section_stats, engagement["sections"])),
+        summary_sheet=checklist_to_excel.summary_sheet_spec(1),
+        xbrl_sheet=checklist_to_excel.xbrl_sheet_spec(engagement, 2),
+        formatting=checklist_to_excel.FORMATTING_REQUIREMENTS,
+    )
+
+
+def build_section_prompt(engagement: dict, section: dict, procedures: Optional[list] = None) -> str:
+    """xlsx skill prompt for one section's sheet only (optionally a slice of its procedures)"""
+    return SECTION_PROMPT.render(
+        header=checklist_to_excel.engagement_header(engagement),
+        section_sheet=checklist_to_excel.section_sheet_spec(section, 1, procedures),
+        formatting=checklist_to_excel.FORMATTING_REQUIREMENTS,
+    )
+
+
+def split_section(engagement: dict, section: dict, token_budget: Optional[int] = None) -> list:
+    """
+    The section's procedures as one or more slices whose prompts fit the token budget
+    A section too big for one call becomes several sheets ("Inventory", "Inventory (2)", ...)
+    """
+    procedures = section["procedures"]
+    rows = [checklist_to_excel.PROCEDURE_ROW.render(checklist_to_excel.procedure_row_values(proc))
+            for proc in procedures]
+    fixed_text = build_section_prompt(engagement, section, [])
+    return [procedures[chunk.start:chunk.stop] for chunk in split_to_budget(rows, token_budget, fixed_text)]
+
+
+async def generate_part(client: Optional[anthropic.AsyncAnthropic], cache: ResponseCache,
+                        semaphore: asyncio.Semaphore, name: str, prompt: str, part_path: str,
+                        build_locally) -> PartResult:
+    """Generate and download one part, falling back to building it locally (always, if client is None)"""
+    async with semaphore:
+        start = time.perf_counter()
+        error = "no API client"
+        if client is not None:
+            try:
+                response = await cache.acreate(client, **checklist_to_excel.workpaper_request(prompt))
+                downloads = await adownload_files(client, response, os.path.dirname(part_path),
+                                                  os.path.basename(part_path), cache)
+                if downloads:
+                    return PartResult(name, downloads[0].path, "success", time.perf_counter() - start, None,
+                                      build_locally)
+                error = "no file generated"
+            except Exception as e:
+                # Including httpx errors while streaming the download; the part is still built locally
+                error = f"{type(e).__name__}: {e}"
+
+    build_locally(part_path)
+    return PartResult(name, part_path, "local", time.perf_counter() - start, error, build_locally)
+
+
+def plan_parts(engagement: dict, work_dir: str, token_budget: Optional[int] = None) -> list:
+    """
+    (name, prompt, part_path, build_locally) for the summary part and each section part, in sheet order
+    Sections over the token budget are split into several parts; the summary part must fit as is
+    """
+    summary_prompt = build_summary_prompt(engagement)
+    check_token_budget(summary_prompt, token_budget, what="Audit Summary prompt")
+    jobs = [("Audit Summary", summary_prompt, os.path.join(work_dir, "part_000.xlsx"),
+             lambda path: write_summary_workbook(engagement, path))]
+    for section in engagement["sections"]:
+        for procedures in split_section(engagement, section, token_budget):
+            # The local fallback gets the same slice of procedures the prompt asked for
+            part_section = dict(section, procedures=procedures)
+            jobs.append((section["name"], build_section_prompt(engagement, section, procedures),
+                         os.path.join(work_dir, f"part_{len(jobs):03d}.xlsx"),
+                         lambda path, part_section=part_section: write_section_workbook(
+                             engagement, part_section, path)))
+    return jobs
+
+
+async def run_fanout(engagement: dict, work_dir: str, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                     cache: Optional[ResponseCache] = None, token_budget: Optional[int] = None) -> list:
+    """Generate the summary part and every section part concurrently; results are in sheet order"""
+    semaphore = asyncio.Semaphore(max_in_flight)
+    cache = cache or ResponseCache.from_env()
+    jobs = plan_parts(engagement, work_dir, token_budget)
+
+    try:
+        client = anthropic.AsyncAnthropic()
+    except Exception as e:
+        # A client that cannot even be built falls back like a failed call: every part is built locally
+        print(f"  ⚠ No API client ({type(e).__name__}: {e}); building every part locally")
+        client = None
+
+    try:
+        tasks = [asyncio.create_task(generate_part(client, cache, semaphore, *job)) for job in jobs]
+        for completed in asyncio.as_completed(tasks):
+            part = await completed
+            icon = "✓" if part.status == "success" else "⚠"
+            print(f"  {icon} {part.name}: {part.status} ({part.seconds:.1f}s)"
+                  f"{' - ' + part.error if part.error else ''}")
+        # as_completed yields in completion order; the tasks list keeps sheet order
+        return [task.result() for task in tasks]
+    finally:
+        if client is not None:
+            await client.close()
+
+
+def _load_part(part: PartResult):
+    """Open a part's workbook; a downloaded part openpyxl cannot read is rebuilt locally first"""
+    try:
+        return load_workbook(part.path)
+    except Exception as e:
+        # BadZipFile, InvalidFileException, KeyError for a missing sheet part, ...
+        if part.status != "success":
+            raise
+        print(f"  ⚠ {part.name}: downloaded part unreadable ({type(e).__name__}: {e}); rebuilt locally")
+        part.build_locally(part.path)
+        return load_workbook(part.path)
+
+
+def merge_workpaper_parts(parts: list, output_file: str) -> list:
+    """Audit Summary first, then each section part's sheet in checklist order, then the remaining
+    summary sheets (XBRL Cross-Reference); returns the sheet names"""
+    merged = Workbook()
+    merged.remove(merged.active)
+
+    summary = _load_part(parts[0])
+    copy_sheet(summary.worksheets[0], merged, "Audit Summary")
+    for part in parts[1:]:
+        source = _load_part(part)
+        copy_sheet(source.worksheets[0], merged, part.name)
+        source.close()
+    for worksheet in summary.worksheets[1:]:
+        copy_sheet(worksheet, merged)
+    summary.close()
+
+    merged.save(output_file)
+    return merged.sheetnames
+
+
+def generate_workpaper_fanout(checklist_file: str, output_file: Optional[str] = None,
+                              max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                              cache: Optional[ResponseCache] = None,
+                              token_budget: Optional[int] = None) -> Optional[str]:
+    """Generate a checklist's workpaper one section per request, then merge the parts"""
+    try:
+        engagement = load_checklist(checklist_file, compact=True)["audit_engagement"]
+    except FileNotFoundError:
+        print(f"✗ Error: Checklist file not found: {checklist_file}")
+        return None
+    except ValueError as e:
+        print(f"✗ Error: Unreadable checklist {checklist_file}: {e}")
+        return None
+
+    output_file = output_file or checklist_to_excel.workpaper_filename(engagement)
+    print(f"Generating workpaper for {engagement['client']} as parallel parts, "
+          f"{max_in_flight} in flight...\n")
+
+    start = time.perf_counter()
+    # A fresh temp directory per run keeps part_NNN.xlsx names from colliding
+    with tempfile.TemporaryDirectory(prefix="workpaper_parts_") as work_dir:
+        try:
+            parts = asyncio.run(run_fanout(engagement, work_dir, max_in_flight, cache, token_budget))
+        except PromptTooLarge as e:
+            print(f"✗ {e}; use --local to build the workbook without the xlsx skill")
+            return None
+        sheet_names = merge_workpaper_parts(parts, output_file)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n✓ Success! Merged workpaper saved to: {output_file}")
+    print(f"  Parts: {len(parts)} ({len(parts) - 1 - len(engagement['sections'])} from splitting "
+          f"sections over the token budget)")
+    print(f"  Sheets: {', '.join(sheet_names)}")
+    print(f"  Parts built locally after a failed call: {sum(1 for part in parts if part.status == 'local')}")
+    print(f"  Wall-clock time: {elapsed:.1f}s (largest part {max(part.seconds for part in parts):.1f}s, "
+          f"sum of parts {sum(part.seconds for part in parts):.1f}s)")
+    return output_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a workpaper one section per xlsx skill call")
+    parser.add_argument("checklist_file", nargs="?", default="sample_audit_checklist.json")
+    parser.add_argument("--output", default=None, help="Merged workbook path")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Maximum part requests in flight at once")
+    parser.add_argument("--token-budget", type=positive_token_budget, default=None,
+                        help="Input-token budget per part; larger sections are split (default: AUDIT_PROMPT_TOKEN_BUDGET)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Call the API even when a cached response exists")
+    args = parser.parse_args()
+
+    if not generate_workpaper_fanout(args.checklist_file, args.output, args.max_in_flight,
+                                     ResponseCache.from_env(bypass=args.no_cache), args.token_budget):
+        sys.exit(1)
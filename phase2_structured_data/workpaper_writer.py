@@ -0,0 +1,280 @@
+"""
+Local XLSX workpaper engine
+Purpose: Build the audit program workbook from a checklist without the xlsx skill
+Scenario: Engagements with thousands of procedures, where one prompt per row hits
+          output-token limits and takes minutes
+
+Builds the same workbook 06_checklist_to_excel.py asks the xlsx skill for:
+an Audit Summary sheet, one sheet per section and an XBRL Cross-Reference sheet,
+with status and risk conditional formatting, filterable tables and frozen
+headers. openpyxl's write-only mode streams rows straight to the file, so
+memory stays flat however many procedures there are. A 50k-procedure workbook
+takes seconds (openpyxl writes several times faster when lxml is installed).
+The model is only needed for optional commentary.
+"""
+
+import re
+import warnings
+from datetime import date
+from typing import Optional
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableStyleInfo
+
+from checklist_refs import build_ref_index, ref_sections, refs_completed
+
+PROCEDURE_COLUMNS = [
+    ("Proc ID", 12), ("Description", 60), ("Assigned To", 20), ("Due Date", 12), ("Status", 15),
+    ("WP Ref", 10), ("Evidence", 30), ("XBRL Links", 45), ("Sign-Off", 32), ("Notes", 50),
+]
+SUMMARY_COLUMNS = [
+    ("Section ID", 14), ("Section Name", 40), ("Risk Level", 12), ("Total Procedures", 17),
+    ("Completed", 12), ("% Complete", 12), ("Exceptions", 12),
+]
+XBRL_COLUMNS = [("XBRL Element", 60), ("Procedure IDs", 40), ("Audit Sections", 30), ("Status", 15)]
+
+STATUS_FILLS = {
+    "Completed": "C6EFCE",    # green
+    "In Progress": "FFEB9C",  # yellow
+    "Not Started": "D9D9D9",  # gray
+    "Complete": "C6EFCE",
+}
+RISK_FILLS = {"HIGH": "FFC7CE", "MEDIUM": "FFEB9C", "LOW": "C6EFCE"}
+
+TITLE_FONT = Font(bold=True, size=14)
+BOLD = Font(bold=True)
+WRAP = Alignment(wrap_text=True, vertical="top")
+TABLE_STYLE = TableStyleInfo(name="TableStyleMedium2", showRowStripes=True)
+
+_INVALID_TITLE_CHARS = re.compile(r"[\[\]:*?/\\]")
+MAX_CELL_CHARS = 32767
+
+
+def status_display(status: str) -> str:
+    return status.replace('_', ' ').title()
+
+
+def _join_for_cell(values: list) -> str:
+    """Comma-join values, truncated to what an Excel cell can hold"""
+    text = ", ".join(values)
+    if len(text) <= MAX_CELL_CHARS:
+        return text
+    cut = text.rfind(", ", 0, MAX_CELL_CHARS - 40)
+    shown = text[:cut].count(", ") + 1
+    return f"{text[:cut]} ... (+{len(values) - shown} more)"
+
+
+def _sheet_title(name: str, used: set) -> str:
+    """Excel sheet names: at most 31 characters, no []:*?/\\, unique"""
+    base = _INVALID_TITLE_CHARS.sub("-", name).strip("'") or "Sheet"
+    title, n = base[:31], 1
+    while title.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        title = base[:31 - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
+
+def _table_name(title: str, used: set) -> str:
+    """Table names must be unique identifiers"""
+    base = "T_" + re.sub(r"\W", "_", title)
+    name, n = base, 1
+    while name in used:
+        n += 1
+        name = f"{base}_{n}"
+    used.add(name)
+    return name
+
+
+def _styled(ws, value, font=None, fill=None, number_format=None, alignment=None):
+    cell = WriteOnlyCell(ws, value=value)
+    if type(value) is str and value.startswith("="):
+        # openpyxl stores strings starting with "=" as formulas; checklist text must stay text
+        cell.data_type = "s"
+    if font:
+        cell.font = font
+    if fill:
+        cell.fill = PatternFill("solid", start_color=fill)
+    if number_format:
+        cell.number_format = number_format
+    if alignment:
+        cell.alignment = alignment
+    return cell
+
+
+def _text_row(ws, values: list) -> list:
+    """Row values with every string starting with "=" pinned as text, so it is never written as a formula"""
+    return [_styled(ws, value) if type(value) is str and value.startswith("=") else value for value in values]
+
+
+class _WorkpaperBuilder:
+    """Writes one workbook; every sheet is written top to bottom in a single pass"""
+
+    def __init__(self, engagement: dict):
+        self.engagement = engagement
+        self.wb = Workbook(write_only=True)
+        self.sheet_titles = set()
+        self.table_names = set()
+        self.prepared_on = date.today().isoformat()
+
+    def new_sheet(self, name: str, columns: list, wp_ref: Optional[str] = None):
+        """Sheet with a title block, fixed column widths and the table header on row 4"""
+        ws = self.wb.create_sheet(_sheet_title(name, self.sheet_titles))
+        for i, (_, width) in enumerate(columns, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = width
+        # Sheet views are written with the first row, so freeze the header before appending
+        ws.freeze_panes = "A5"
+        engagement = self.engagement
+        ws.append([_styled(ws, f"{engagement['client']} - {name}", font=TITLE_FONT)])
+        ws.append([f"Period end: {engagement['period_end']}", None,
+                   f"Prepared: {self.prepared_on}", None, f"WP Ref: {wp_ref or 'N/A'}"])
+        ws.append([])
+        ws.append([_styled(ws, header, font=BOLD) for header, _ in columns])
+        return ws
+
+    def add_table(self, ws, columns: list, row_count: int):
+        """Filterable, banded table over the header row and row_count data rows"""
+        last_column = get_column_letter(len(columns))
+        ref = f"A4:{last_column}{4 + max(row_count, 1)}"
+        table = Table(displayName=_table_name(ws.title, self.table_names), ref=ref)
+        # Write-only sheets cannot be read back, so name the columns from the headers here
+        table._initialise_columns()
+        for table_column, (header, _) in zip(table.tableColumns, columns):
+            table_column.name = header
+        table.tableStyleInfo = TABLE_STYLE
+        with warnings.catch_warnings():
+            # openpyxl always warns in write-only mode that the columns must be added manually
+            warnings.simplefilter("ignore", UserWarning)
+            ws.add_table(table)
+        return ref
+
+    @staticmethod
+    def add_fill_rules(ws, column: str, row_count: int, fills: dict):
+        """Conditional formatting on one column: cell text -> fill colour"""
+        cell_range = f"{column}5:{column}{4 + max(row_count, 1)}"
+        for text, color in fills.items():
+            ws.conditional_formatting.add(cell_range, FormulaRule(
+                formula=[f'{column}5="{text}"'], fill=PatternFill("solid", start_color=color, end_color=color)))
+
+    @staticmethod
+    def sign_off_block(ws):
+        ws.append([])
+        ws.append(["Prepared by:", "", "Date:"])
+        ws.append(["Reviewed by:", "", "Date:"])
+
+    def write_summary(self, commentary: Optional[str]):
+        engagement = self.engagement
+        sections = engagement["sections"]
+        ws = self.new_sheet("Audit Summary", SUMMARY_COLUMNS)
+        # The title block rows are already written; the section table follows on row 5
+        self.add_table(ws, SUMMARY_COLUMNS, len(sections))
+        self.add_fill_rules(ws, "C", len(sections), RISK_FILLS)
+
+        total = completed = exceptions = 0
+        for section in sections:
+            procedures = section["procedures"]
+            done = sum(1 for proc in procedures if proc["status"] == "completed")
+            with_exceptions = sum(1 for proc in procedures if proc.get("sign_off", {}).get("exceptions"))
+            total += len(procedures)
+            completed += done
+            exceptions += with_exceptions
+            ws.append(_text_row(ws, [
+                section["section_id"], section["name"], section.get("risk_level", "").upper(),
+                len(procedures), done,
+                _styled(ws, done / len(procedures) if procedures else 0.0, number_format="0.0%"),
+                with_exceptions,
+            ]))
+        if not sections:
+            ws.append([])
+
+        ws.append([])
+        ws.append([_styled(ws, "Engagement overview", font=BOLD)])
+        ws.append(_text_row(ws, ["Engagement partner", engagement.get("engagement_partner", "")]))
+        if "materiality" in engagement:
+            ws.append(["Materiality", _styled(ws, engagement["materiality"], number_format='"$"#,##0')])
+        ws.append(["Total procedures", total])
+        ws.append(["Completed procedures", completed])
+        ws.append(["Overall completion", _styled(ws, completed / total if total else 0.0, number_format="0.0%")])
+        ws.append(["Procedures with exceptions", exceptions])
+        if commentary:
+            ws.append([])
+            ws.append([_styled(ws, "Commentary", font=BOLD)])
+            for paragraph in commentary.strip().split("\n"):
+                if paragraph.strip():
+                    ws.append([_styled(ws, paragraph.strip(), alignment=WRAP)])
+        self.sign_off_block(ws)
+        return total, completed
+
+    def write_section(self, section: dict):
+        procedures = section["procedures"]
+        wp_ref = next((proc["workpaper_ref"] for proc in procedures if proc.get("workpaper_ref")), None)
+        ws = self.new_sheet(section["name"], PROCEDURE_COLUMNS, wp_ref)
+        self.add_table(ws, PROCEDURE_COLUMNS, len(procedures))
+        self.add_fill_rules(ws, "E", len(procedures), STATUS_FILLS)
+        for proc in procedures:
+            sign_off = proc.get("sign_off", {})
+            ws.append(_text_row(ws, [
+                proc["procedure_id"], proc["description"], proc.get("assigned_to", "Unassigned"),
+                proc.get("due_date", "TBD"), status_display(proc["status"]), proc.get("workpaper_ref", "N/A"),
+                ", ".join(proc.get("evidence_refs", [])), ", ".join(proc.get("xbrl_refs", [])),
+                f"{sign_off.get('auditor', 'N/A')} on {sign_off.get('date', 'N/A')}" if sign_off else "",
+                sign_off.get("notes", ""),
+            ]))
+        if not procedures:
+            ws.append([])
+        self.sign_off_block(ws)
+
+    def write_xbrl_cross_reference(self):
+        ref_index = build_ref_index(self.engagement)
+
+        ws = self.new_sheet("XBRL Cross-Reference", XBRL_COLUMNS)
+        self.add_table(ws, XBRL_COLUMNS, len(ref_index))
+        self.add_fill_rules(ws, "D", len(ref_index), STATUS_FILLS)
+        for element, refs in sorted(ref_index.items()):
+            ws.append(_text_row(ws, [element, _join_for_cell([ref.procedure_id for ref in refs]),
+                                     _join_for_cell(ref_sections(refs)),
+                                     "Complete" if refs_completed(refs) else "In Progress"]))
+        if not ref_index:
+            ws.append([])
+        self.sign_off_block(ws)
+        return len(ref_index)
+
+
+def write_workpaper(engagement: dict, output_file: str, commentary: Optional[str] = None) -> dict:
+    """
+    Write the audit program workbook for an engagement
+    commentary (optional) is narrative text placed on the Audit Summary sheet
+    Returns counts of what was written
+    """
+    builder = _WorkpaperBuilder(engagement)
+    total, completed = builder.write_summary(commentary)
+    for section in engagement["sections"]:
+        builder.write_section(section)
+    xbrl_elements = builder.write_xbrl_cross_reference()
+    builder.wb.save(output_file)
+    return {
+        "sheets": len(engagement["sections"]) + 2,
+        "procedures": total,
+        "completed": completed,
+        "xbrl_elements": xbrl_elements,
+    }
+
+
+def write_summary_workbook(engagement: dict, output_file: str, commentary: Optional[str] = None):
+    """Only the Audit Summary and XBRL Cross-Reference sheets"""
+    builder = _WorkpaperBuilder(engagement)
+    builder.write_summary(commentary)
+    builder.write_xbrl_cross_reference()
+    builder.wb.save(output_file)
+
+
+def write_section_workbook(engagement: dict, section: dict, output_file: str):
+    """Only one section's sheet"""
+    builder = _WorkpaperBuilder(engagement)
+    builder.write_section(section)
+    builder.wb.save(output_file)
@@ -5,21 +5,128 @@ Scenario: Read XBRL facts from a simplified financial statement
 """
 
 import anthropic
+import argparse
 import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils import (
+    PromptTemplate,
+    PromptTooLarge,
+    ResponseCache,
+    check_token_budget,
+    download_files,
+    find_file_ids,
+    print_download_report,
+)
+from ixbrl_facts import fact_to_dict, iter_ixbrl_facts, xbrl_value
+from ixbrl_prompt import compact_ixbrl_for_prompt, print_compaction_report
+
+# Compiled once; the fact table is the only part that varies
+ANALYSIS_PROMPT = PromptTemplate("""These XBRL facts were extracted from an Inline XBRL financial statement.
+Numbers already have their format, scale and sign applied and dates are ISO 8601; a fact
+listed with scale, sign or format is shown as displayed and still needs them applied.
+
+{facts}
+
+Please:
+1. Perform basic validation:
+   - Check if Assets = Liabilities + Equity
+   - Check if Gross Profit = Revenue - Cost of Revenue
+   - Calculate key ratios (current ratio, debt to equity)
+2. Comment on anything an auditor should follow up on
+
+Return the analysis as JSON with this structure, followed by a short narrative:
+{{
+  "validation": {{
+    "balance_sheet_balances": true/false,
+    "income_statement_math": true/false,
+    "errors": []
+  }},
+  "ratios": {{
+    "current_ratio": 3.14,
+    "debt_to_equity": 0.43,
+    "gross_margin_pct": 42.4,
+    "net_margin_pct": 12.0
+  }}
+}}""")
+
+WORKPAPER_PROMPT = PromptTemplate("""These XBRL facts were extracted from '{source_file}'.
+Numbers already have their format, scale and sign applied and dates are ISO 8601; a fact
+listed with scale, sign or format is shown as displayed and still needs them applied.
+
+{facts}
+
+Create an Excel audit workpaper from them with:
+
+Sheet 1 - "XBRL Facts Extract":
+- All extracted XBRL facts in a table
+- Columns: Element Name, Value, Context, Unit, Label
+- Group by statement (Balance Sheet vs Income Statement)
+
+Sheet 2 - "Mathematical Validation":
+- Balance Sheet equation check (Assets = Liabilities + Equity)
+- Income Statement calculations
+- Show expected vs actual values
+- Highlight any discrepancies
+
+Sheet 3 - "Financial Ratios":
+- Current Ratio
+- Debt to Equity
+- Gross Margin %
+- Net Margin %
+- Include benchmarks and commentary
+
+Sheet 4 - "Audit Procedures":
+- List suggested audit procedures for each major XBRL element
+- Link to specific accounts (e.g., "Cash" -> "Perform bank reconciliation")
+- Risk assessment for each element
+
+Use professional formatting with color coding for any validation errors.""")
 
 def create_sample_ixbrl():
     """Create a simplified Inline XBRL document for demonstration"""
     ixbrl_content = """<!DOCTYPE html>
 <html xmlns:ix="http://www.xbrl.org/2013/inlineXBRL"
       xmlns:xbrli="http://www.xbrl.org/2003/instance"
-      xmlns:us-gaap="http://fasb.org/us-gaap/2024">
+      xmlns:us-gaap="http://fasb.org/us-gaap/2024"
+      xmlns:iso4217="http://www.xbrl.org/2003/iso4217"
+      xmlns:ixt="http://www.xbrl.org/inlineXBRL/transformation/2020-02-12">
 <head>
     <title>Example Corporation - Financial Statements</title>
 </head>
 <body>
+    <div style="display:none">
+        <ix:header>
+            <ix:resources>
+                <xbrli:context id="AsOf_2024-12-31">
+                    <xbrli:entity>
+                        <xbrli:identifier scheme="http://www.sec.gov/CIK">0000000000</xbrli:identifier>
+                    </xbrli:entity>
+                    <xbrli:period>
+                        <xbrli:instant>2024-12-31</xbrli:instant>
+                    </xbrli:period>
+                </xbrli:context>
+                <xbrli:context id="Duration_2024">
+                    <xbrli:entity>
+                        <xbrli:identifier scheme="http://www.sec.gov/CIK">0000000000</xbrli:identifier>
+                    </xbrli:entity>
+                    <xbrli:period>
+                        <xbrli:startDate>2024-01-01</xbrli:startDate>
+                        <xbrli:endDate>2024-12-31</xbrli:endDate>
+                    </xbrli:period>
+                </xbrli:context>
+                <xbrli:unit id="USD">
+                    <xbrli:measure>iso4217:USD</xbrli:measure>
+                </xbrli:unit>
+            </ix:resources>
+        </ix:header>
+    </div>
     <h1>Example Corporation</h1>
     <h2>Balance Sheet (Unaudited)</h2>
-    <p>As of <ix:nonFraction name="us-gaap:BalanceSheetDate" contextRef="AsOf_2024-12-31" format="date">December 31, 2024</ix:nonFraction></p>
+    <p>As of <ix:nonFraction name="us-gaap:BalanceSheetDate" contextRef="AsOf_2024-12-31" format="ixt:date-monthname-day-year">December 31, 2024</ix:nonFraction></p>
 
     <table>
         <tr>
@@ -88,7 +195,7 @@ def create_sample_ixbrl():
     </table>
 
     <h2>Income Statement (Unaudited)</h2>
-    <p>For the Year Ended <ix:nonFraction name="us-gaap:IncomeStatementPeriodEndDate" contextRef="Duration_2024" format="date">December 31, 2024</ix:nonFraction></p>
+    <p>For the Year Ended <ix:nonFraction name="us-gaap:IncomeStatementPeriodEndDate" contextRef="Duration_2024" format="ixt:date-monthname-day-year">December 31, 2024</ix:nonFraction></p>
 
     <table>
         <tr>
@@ -121,85 +228,62 @@ def create_sample_ixbrl():
     print("✓ Created sample Inline XBRL file: sample_ixbrl_financials.html\n")
     return ixbrl_content
 
-def parse_ixbrl_with_claude(ixbrl_file: str = "sample_ixbrl_financials.html"):
-    """Use Claude with code execution to parse XBRL and extract facts"""
+def extract_facts_locally(ixbrl_file: str = "sample_ixbrl_financials.html") -> list:
+    """Extract XBRL facts with the local streaming parser (no API call)"""
+    if not os.path.exists(ixbrl_file):
+        print(f"Creating sample XBRL file...\n")
+        create_sample_ixbrl()
+
+    start = time.perf_counter()
+    facts = list(iter_ixbrl_facts(ixbrl_file))
+    elapsed = time.perf_counter() - start
+
+    print(f"✓ Extracted {len(facts)} facts locally in {elapsed * 1000:.1f} ms\n")
+    for fact in facts:
+        # Shown as XBRL reads them: ixt format, scale and sign applied
+        print(f"  {fact.name:<60} {xbrl_value(fact) or fact.value:>15}  [{fact.context_ref or ''}]")
+    print()
+    return [fact_to_dict(fact) for fact in facts]
+
+def parse_ixbrl_with_claude(ixbrl_file: str = "sample_ixbrl_financials.html", cache: ResponseCache = None):
+    """Extract XBRL facts locally, then use Claude for the validation narrative and ratios"""
 
-    # Read the XBRL file
+    extract_facts_locally(ixbrl_file)
+
+    # Send the model a compact fact table instead of the raw HTML
+    compact = compact_ixbrl_for_prompt(ixbrl_file)
+    print_compaction_report(compact)
+
+    prompt = ANALYSIS_PROMPT.render(facts=compact.text)
     try:
-        with open(ixbrl_file, 'r', encoding='utf-8') as f:
-            ixbrl_content = f.read()
-    except FileNotFoundError:
-        print(f"Creating sample XBRL file...\n")
-        ixbrl_content = create_sample_ixbrl()
+        check_token_budget(prompt)
+    except PromptTooLarge as e:
+        # Splitting would break the cross-statement checks, so the filing is rejected instead
+        print(f"✗ {e}; not sending it")
+        return None
 
-    print("Parsing Inline XBRL with Claude...\n")
+    print("Analyzing extracted facts with Claude...\n")
 
     client = anthropic.Anthropic()
+    cache = cache or ResponseCache.from_env()
 
-    response = client.beta.messages.create(
+    response = cache.create(
+        client,
         model="claude-haiku-4-5-20251001",
         max_tokens=4096,
-        betas=["code-execution-2025-08-25"],
-        tools=[
-            {
-                "type": "code_execution_20250825",
-                "name": "code_execution"
-            }
-        ],
         messages=[
             {
                 "role": "user",
-                "content": f"""Parse this Inline XBRL financial statement and extract all XBRL facts.
-
-XBRL Content:
-{ixbrl_content}
-
-Using code execution, please:
-1. Parse the HTML and extract all XBRL facts (ix:nonFraction elements)
-2. For each fact, extract:
-   - Element name (from 'name' attribute)
-   - Value (the text content)
-   - Context (from 'contextRef')
-   - Unit (from 'unitRef')
-   - Decimals (from 'decimals')
-3. Organize the facts into a structured JSON format
-4. Perform basic validation:
-   - Check if Assets = Liabilities + Equity
-   - Check if Gross Profit = Revenue - Cost of Revenue
-   - Calculate key ratios (current ratio, debt to equity)
-
-Return the parsed data as JSON with this structure:
-{{
-  "facts": [
-    {{
-      "element": "us-gaap:Assets",
-      "value": 13132000,
-      "context": "AsOf_2024-12-31",
-      "unit": "USD",
-      "decimals": "-3",
-      "label": "Total Assets"
-    }}
-  ],
-  "validation": {{
-    "balance_sheet_balances": true/false,
-    "income_statement_math": true/false,
-    "errors": []
-  }},
-  "ratios": {{
-    "current_ratio": 3.14,
-    "debt_to_equity": 0.43,
-    "gross_margin_pct": 42.4,
-    "net_margin_pct": 12.0
-  }}
-}}
-
-Use BeautifulSoup or similar library for parsing."""
+                "content": prompt
             }
         ]
     )
 
+    print(f"Input tokens billed: {response.usage.input_tokens:,} "
+          f"(~{compact.tokens_saved:,} saved by compaction)\n")
+
     # Extract the response
-    print("XBRL Parsing Results:\n")
+    print("XBRL Analysis Results:\n")
     print("="*60)
 
     for block in response.content:
@@ -209,14 +293,26 @@ Use BeautifulSoup or similar library for parsing."""
 
     return response
 
-def generate_xbrl_audit_report():
+def generate_xbrl_audit_report(ixbrl_file: str = "sample_ixbrl_financials.html", cache: ResponseCache = None):
     """Generate an Excel audit workpaper from parsed XBRL data"""
 
     print("\nGenerating audit workpaper from XBRL data...\n")
 
+    compact = compact_ixbrl_for_prompt(ixbrl_file)
+    print_compaction_report(compact)
+
+    prompt = WORKPAPER_PROMPT.render(facts=compact.text, source_file=os.path.basename(ixbrl_file))
+    try:
+        check_token_budget(prompt)
+    except PromptTooLarge as e:
+        print(f"✗ {e}; not sending it\n")
+        return None
+
     client = anthropic.Anthropic()
+    cache = cache or ResponseCache.from_env()
 
-    response = client.beta.messages.create(
+    response = cache.create(
+        client,
         model="claude-haiku-4-5-20251001",
         max_tokens=4096,
         betas=["code-execution-2025-08-25", "skills-2025-10-02", "files-api-2025-04-14"],
@@ -238,70 +334,42 @@ def generate_xbrl_audit_report():
         messages=[
             {
                 "role": "user",
-                "content": """First, parse the XBRL file 'sample_ixbrl_financials.html', then create an Excel audit workpaper with:
-
-Sheet 1 - "XBRL Facts Extract":
-- All extracted XBRL facts in a table
-- Columns: Element Name, Value, Context, Unit, Label
-- Group by statement (Balance Sheet vs Income Statement)
-
-Sheet 2 - "Mathematical Validation":
-- Balance Sheet equation check (Assets = Liabilities + Equity)
-- Income Statement calculations
-- Show expected vs actual values
-- Highlight any discrepancies
-
-Sheet 3 - "Financial Ratios":
-- Current Ratio
-- Debt to Equity
-- Gross Margin %
-- Net Margin %
-- Include benchmarks and commentary
-
-Sheet 4 - "Audit Procedures":
-- List suggested audit procedures for each major XBRL element
-- Link to specific accounts (e.g., "Cash" -> "Perform bank reconciliation")
-- Risk assessment for each element
-
-Use professional formatting with color coding for any validation errors."""
+                "content": prompt
             }
         ]
     )
 
-    # Extract file
-    file_id = None
-    for block in response.content:
-        if hasattr(block, 'file_id') and block.file_id:
-            file_id = block.file_id
-            break
-
-    if file_id:
-        file_content = client.beta.files.retrieve_content(file_id)
-        output_filename = "xbrl_audit_analysis.xlsx"
-
-        with open(output_filename, 'wb') as f:
-            f.write(file_content)
+    # Extract every file
+    if find_file_ids(response):
+        downloads = download_files(client, response, primary_filename="xbrl_audit_analysis.xlsx", cache=cache)
+        print_download_report(downloads)
+        output_filename = downloads[0].path
 
         print(f"✓ XBRL audit analysis saved to: {output_filename}")
-        print(f"  File size: {len(file_content) / 1024:.1f} KB\n")
+        print(f"  File size: {downloads[0].size / 1024:.1f} KB\n")
         return output_filename
     else:
         print("✗ No file generated\n")
         return None
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse the sample Inline XBRL filing and generate the audit workpaper")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Call the API even when a cached response exists")
+    args = parser.parse_args()
+    cache = ResponseCache.from_env(bypass=args.no_cache)
+
     # Create sample XBRL if needed
-    import os
     if not os.path.exists("sample_ixbrl_financials.html"):
         create_sample_ixbrl()
 
-    # Parse XBRL with Claude
+    # Extract facts locally, then analyze them with Claude
     print("STEP 1: Parse XBRL document\n")
-    parse_ixbrl_with_claude()
+    parse_ixbrl_with_claude(cache=cache)
 
     print("\n" + "="*60)
     print("\nSTEP 2: Generate Excel audit workpaper from XBRL data\n")
-    generate_xbrl_audit_report()
+    generate_xbrl_audit_report(cache=cache)
 
     print("\nNext steps:")
     print("1. Review the generated Excel workpaper")
@@ -0,0 +1,123 @@
+"""
+Phase 3, Example 8: Validate Inline XBRL Calculations
+Purpose: Check that totals in XBRL filings add up, locally and in bulk
+Scenario: Validate every filing in a reporting season before review, with no model call
+
+Rules (summations and equalities with decimals-based tolerances) are declared
+in xbrl_calculations.py or a JSON rules file. Filings are read across a process
+pool, then every rule is evaluated over all contexts of all filings at once
+with NumPy.
+
+Usage:
+    python 08_validate_ixbrl.py
+    python 08_validate_ixbrl.py filings/ --rules calc_rules.json --output calc_report.json
+    python 08_validate_ixbrl.py --write-rules calc_rules.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils import load_example_module
+from ixbrl_facts import find_filings
+from xbrl_calculations import (
+    DEFAULT_RULES,
+    CalcResults,
+    evaluate_rules,
+    extract_filing_facts,
+    load_rules,
+    results_to_dict,
+    rule_concepts,
+    rules_to_json,
+)
+
+
+def _extract_worker(args: tuple):
+    return extract_filing_facts(*args)
+
+
+def validate_filings(filings: List[str], rules=DEFAULT_RULES, workers: Optional[int] = None) -> CalcResults:
+    """Read the filings across a process pool, then evaluate all rules in one batch"""
+    concepts = rule_concepts(rules)
+    workers = min(workers or os.cpu_count() or 1, len(filings)) or 1
+    tasks = [(filing, concepts) for filing in filings]
+    if workers == 1:
+        batch = [_extract_worker(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            batch = list(pool.map(_extract_worker, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    return evaluate_rules(batch, rules, concepts)
+
+
+def print_calculation_report(results: CalcResults, max_failures: int = 20):
+    """Per-rule totals, the filings with inconsistencies and the first failures"""
+    print("\n" + "="*60)
+    print("XBRL CALCULATION VALIDATION")
+    print("="*60)
+    print(f"Filings: {len(results.filings)}   Rules: {len(results.rules)}")
+    for r, rule in enumerate(results.rules):
+        checked = int(results.checked[:, r].sum())
+        failed = int(results.failed[:, r].sum())
+        icon = "✗" if failed else ("✓" if checked else "–")
+        print(f"  {icon} {rule.name:<28} checked {checked:>6}   inconsistent {failed:>5}")
+
+    failing = [i for i in range(len(results.filings)) if results.failed[i].any()]
+    duplicates = int(results.duplicates.sum())
+    print(f"\nFilings with inconsistencies: {len(failing)} of {len(results.filings)}")
+    if duplicates:
+        print(f"⚠ {duplicates} duplicate fact(s) ignored (same concept, context and unit shown twice)")
+
+    for failure in results.failures[:max_failures]:
+        print(f"  ✗ {os.path.basename(failure.filing)} [{failure.context_ref}] {failure.rule}: "
+              f"reported {failure.total:,.0f}, computed {failure.computed:,.0f} "
+              f"(off by {failure.difference:,.0f}, tolerance {failure.tolerance:,.0f})")
+    if len(results.failures) > max_failures:
+        print(f"  ... and {len(results.failures) - max_failures} more (see the JSON report)")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate XBRL calculation rules across filings")
+    parser.add_argument("targets", nargs="*", help="iXBRL files, directories or glob patterns")
+    parser.add_argument("--rules", help="JSON rules file (default: the built-in statement rules)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for reading filings")
+    parser.add_argument("--output", help="Write the full report as JSON")
+    parser.add_argument("--write-rules", metavar="FILE", help="Write the built-in rules as JSON and exit")
+    args = parser.parse_args()
+
+    if args.write_rules:
+        with open(args.write_rules, 'w', encoding='utf-8') as f:
+            json.dump(rules_to_json(DEFAULT_RULES), f, indent=2)
+        print(f"✓ Wrote {len(DEFAULT_RULES)} rules to {args.write_rules}")
+        sys.exit(0)
+
+    targets = args.targets
+    if not targets:
+        # Validate the Example 7 sample filing
+        if not os.path.exists("sample_ixbrl_financials.html"):
+            load_example_module("phase3_xbrl/07_parse_ixbrl_simple.py").create_sample_ixbrl()
+        targets = ["sample_ixbrl_financials.html"]
+
+    filings = find_filings(targets)
+    if not filings:
+        print(f"✗ No iXBRL filings found in: {', '.join(targets)}")
+        sys.exit(1)
+    rules = load_rules(args.rules) if args.rules else DEFAULT_RULES
+
+    start = time.perf_counter()
+    results = validate_filings(filings, rules, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print_calculation_report(results)
+    print(f"Validated {len(filings)} filing(s) in {elapsed:.2f}s")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results_to_dict(results), f, indent=2)
+        print(f"✓ Report saved to: {args.output}")
+    if results.failures:
+        sys.exit(1)
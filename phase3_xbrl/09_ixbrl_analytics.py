@@ -0,0 +1,131 @@
+"""
+Phase 3, Example 9: XBRL Analytical Procedures
+Purpose: Compute the standard ratio set for a portfolio of filings and benchmark them
+Scenario: Analytical review across every client, without one model call per company
+
+Filings are loaded into a columnar fact store (xbrl_fact_store.py), then
+current ratio, debt to equity and gross and net margin are computed for every
+filing and period in one vectorized pass. Each client's latest period is ranked
+against its peers, and values outside the usual range (beyond 1.5 x IQR) are
+flagged for follow-up.
+
+Usage:
+    python 09_ixbrl_analytics.py
+    python 09_ixbrl_analytics.py filings/ --output ratios.csv
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils import load_example_module
+from ixbrl_facts import find_filings
+from xbrl_fact_store import FactStore, RatioTable, STANDARD_RATIOS, benchmark, compute_ratios, read_filing_columns
+
+
+def load_fact_store(filings: List[str], workers: Optional[int] = None) -> FactStore:
+    """Read filings across a process pool into one columnar store"""
+    workers = min(workers or os.cpu_count() or 1, len(filings)) or 1
+    store = FactStore()
+    if workers == 1:
+        store.add_filings(map(read_filing_columns, filings))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            store.add_filings(pool.map(read_filing_columns, filings,
+                                       chunksize=max(1, len(filings) // (workers * 4))))
+    return store
+
+
+def outliers(values: np.ndarray, stats: dict) -> np.ndarray:
+    """True where a value is beyond 1.5 x IQR of the peers (Tukey fences)"""
+    spread = 1.5 * (stats["q3"] - stats["q1"])
+    return (values < stats["q1"] - spread) | (values > stats["q3"] + spread)
+
+
+def print_ratio_report(store: FactStore, table: RatioTable, max_filings: int = 25):
+    """Latest-period ratios per filing, with percentile ranks among peers and outlier flags"""
+    latest = table.latest()
+    summary = benchmark(table, latest)
+    names = list(table.ratios)
+
+    print("\n" + "="*60)
+    print("XBRL RATIO ANALYTICS (latest period per filing)")
+    print("="*60)
+    print(f"Filings: {len(store.filings)}   Facts: {len(store):,}   Periods: {len(table.filing)}")
+    print("\nPeer benchmarks:")
+    for name in names:
+        stats = summary[name]
+        print(f"  {name:<18} n={stats['count']:<6} Q1 {stats['q1']:>8.2f}  median {stats['median']:>8.2f}  "
+              f"Q3 {stats['q3']:>8.2f}")
+
+    print("\n" + f"{'Filing':<28} {'Period end':<11} " + " ".join(f"{name[:14]:>14}" for name in names))
+    for i, row in enumerate(latest[:max_filings]):
+        cells = []
+        for name in names:
+            value = table.ratios[name][row]
+            if np.isnan(value):
+                cells.append(f"{'n/a':>14}")
+                continue
+            flag = "⚠" if outliers(value, summary[name]) else " "
+            cells.append(f"{value:>8.2f} p{summary[name]['percentile_rank'][i]:>3.0f}{flag}")
+        filing = os.path.basename(store.filings[table.filing[row]])
+        print(f"{filing[:28]:<28} {str(table.period_end[row]):<11} " + " ".join(cells))
+    if len(latest) > max_filings:
+        print(f"... and {len(latest) - max_filings} more filings (see --output)")
+
+    flagged = sum(int(np.count_nonzero(outliers(table.ratios[name][latest], summary[name]))) for name in names)
+    print(f"\n{'⚠' if flagged else '✓'} {flagged} ratio value(s) outside 1.5 x IQR of peers")
+    print("="*60 + "\n")
+
+
+def save_ratio_table(store: FactStore, table: RatioTable, output_file: str):
+    """Every (filing, period end) row with its ratios, as CSV"""
+    names = list(table.ratios)
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["filing", "entity", "period_end"] + names)
+        for row in np.lexsort((table.period_end, table.filing)):
+            filing = table.filing[row]
+            writer.writerow([store.filings[filing], store.entities[filing], str(table.period_end[row])] +
+                            ["" if np.isnan(table.ratios[name][row]) else round(float(table.ratios[name][row]), 4)
+                             for name in names])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ratio analytics and peer benchmarks across iXBRL filings")
+    parser.add_argument("targets", nargs="*", help="iXBRL files, directories or glob patterns")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for reading filings")
+    parser.add_argument("--output", help="Write every filing and period's ratios as CSV")
+    args = parser.parse_args()
+
+    targets = args.targets
+    if not targets:
+        # Analyze the Example 7 sample filing
+        if not os.path.exists("sample_ixbrl_financials.html"):
+            load_example_module("phase3_xbrl/07_parse_ixbrl_simple.py").create_sample_ixbrl()
+        targets = ["sample_ixbrl_financials.html"]
+
+    filings = find_filings(targets)
+    if not filings:
+        print(f"✗ No iXBRL filings found in: {', '.join(targets)}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    store = load_fact_store(filings, args.workers)
+    loaded = time.perf_counter()
+    table = compute_ratios(store, STANDARD_RATIOS)
+    computed = time.perf_counter()
+
+    print_ratio_report(store, table)
+    print(f"Loaded {len(filings)} filing(s) in {loaded - start:.2f}s; "
+          f"ratios computed in {(computed - loaded) * 1000:.1f} ms")
+    if args.output:
+        save_ratio_table(store, table, args.output)
+        print(f"✓ Ratios saved to: {args.output}")
@@ -0,0 +1,424 @@
+"""
+Parallel bulk ingestion of iXBRL filings
+Purpose: Turn folders and zip packages of client filings into one fact dataset, on every core
+Scenario: A reporting season arrives as nested folders and zip archives of iXBRL files
+
+Filings are found lazily: directories are walked, and zip archives (given
+directly or found while walking) are read member by member without extracting
+anything to disk. A bounded window of filings is in flight on a process pool at
+any time, so memory stays flat however many filings there are. Each worker
+parses one filing into columns and returns them with its timing; a filing that
+cannot be read is reported as failed and does not stop the rest.
+
+Facts are encoded in the workers and written as each filing arrives, to JSONL
+(one fact per line) or to a columnar .npz of NumPy arrays (text columns as
+UTF-8 bytes plus offsets, spooled to disk until the run ends).
+
+Usage:
+    python ixbrl_bulk_ingest.py filings/ season_2024.zip --output facts.jsonl
+    python ixbrl_bulk_ingest.py "clients/**/*.zip" --output facts.npz --workers 8 --report ingest_report.json
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ixbrl_facts import FILING_EXTENSIONS, XbrlResources, iter_stream_facts
+from ixbrl_transforms import numeric_values
+
+# Columns of the fact dataset, in output order
+FACT_COLUMNS = ("filing", "concept", "value", "number", "unit", "entity", "period_start", "period_end",
+                "dimensions", "decimals", "fact_type", "context_ref", "unit_ref")
+
+# Every column except the float64 "number" is text
+TEXT_COLUMNS = tuple(name for name in FACT_COLUMNS if name != "number")
+
+# Bytes copied at a time from the spool files into the .npz
+NPZ_COPY_CHUNK = 1 << 20
+
+# Filings in flight per worker; enough to keep every worker busy while results are written
+PENDING_PER_WORKER = 4
+
+# Errors that mean one filing (or archive) could not be read
+READ_ERRORS = (OSError, ValueError, EOFError, zipfile.BadZipFile, zipfile.LargeZipFile, zlib.error)
+
+
+class FilingSource(NamedTuple):
+    """Where a filing is: a file on disk, or a member of a zip archive"""
+    path: str
+    member: Optional[str] = None  # "" stands for an archive that could not be listed
+
+    @property
+    def name(self) -> str:
+        return f"{self.path}!{self.member}" if self.member else self.path
+
+
+class IngestedFiling(NamedTuple):
+    """Outcome of parsing one filing"""
+    filing: str
+    status: str  # "success" or "error"
+    entity: Optional[str]
+    facts: int
+    seconds: float
+    error: Optional[str] = None
+
+
+def _is_filing(name: str) -> bool:
+    return name.lower().endswith(FILING_EXTENSIONS)
+
+
+def _archive_sources(archive: str) -> Iterator[FilingSource]:
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            members = sorted(info.filename for info in zf.infolist() if not info.is_dir() and _is_filing(info.filename))
+    except READ_ERRORS:
+        # Reported as a failed filing when the worker tries to open it
+        yield FilingSource(archive, "")
+        return
+    for member in members:
+        yield FilingSource(archive, member)
+
+
+def _path_sources(path: str) -> Iterator[FilingSource]:
+    if path.lower().endswith(".zip"):
+        yield from _archive_sources(path)
+    elif _is_filing(path):
+        yield FilingSource(path)
+
+
+def find_sources(targets: Iterable[str]) -> Iterator[FilingSource]:
+    """Filings in directories (walked recursively), zip archives, glob patterns or single files, lazily"""
+    for target in targets:
+        if os.path.isdir(target):
+            for root, dirs, files in os.walk(target):
+                dirs.sort()
+                for name in sorted(files):
+                    yield from _path_sources(os.path.join(root, name))
+        elif os.path.isfile(target):
+            if target.lower().endswith(".zip"):
+                yield from _archive_sources(target)
+            else:
+                yield FilingSource(target)
+        else:
+            for path in sorted(glob.glob(target, recursive=True)):
+                if os.path.isfile(path):
+                    yield from _path_sources(path)
+
+
+# Archives a worker has open; a season zip holds thousands of filings, and re-reading
+# its central directory for every member would make each lookup cost O(members)
+_open_archives: Dict[str, zipfile.ZipFile] = {}
+MAX_OPEN_ARCHIVES = 8
+
+
+def _open_source(source: FilingSource):
+    if source.member is None:
+        return open(source.path, 'r', encoding='utf-8', errors='replace')
+    archive = _open_archives.get(source.path)
+    if archive is None:
+        if len(_open_archives) >= MAX_OPEN_ARCHIVES:
+            _open_archives.pop(next(iter(_open_archives))).close()
+        archive = _open_archives[source.path] = zipfile.ZipFile(source.path)
+    return io.TextIOWrapper(archive.open(source.member), encoding='utf-8', errors='replace')
+
+
+def parse_filing(source: FilingSource, include_non_numeric: bool = True) -> Tuple[IngestedFiling, Optional[dict]]:
+    """Parse one filing into fact columns (runs in a worker process)"""
+    start = time.perf_counter()
+    resources = XbrlResources()
+    try:
+        with _open_source(source) as stream:
+            facts = list(iter_stream_facts(stream, include_non_numeric=include_non_numeric, resources=resources))
+    except READ_ERRORS as e:
+        return IngestedFiling(source.name, "error", None, 0, time.perf_counter() - start,
+                              f"{type(e).__name__}: {e}"), None
+
+    # ix:nonNumeric facts never have a number, whatever their format
+    numbers = numeric_values([fact.value for fact in facts],
+                             [fact.format if fact.fact_type == "nonFraction" else "" for fact in facts],
+                             [fact.scale for fact in facts], [fact.sign for fact in facts])
+    # Contexts and units are shared by many facts; their columns are built once per context/unit
+    context_columns = [
+        (context.entity, context.start.isoformat() if context.start else "",
+         context.end.isoformat() if context.end else "",
+         json.dumps(dict(context.dimensions)) if context.dimensions else "")
+        for context in resources.contexts
+    ] + [("", "", "", "")]  # code -1: undefined context
+    units = [unit.measure for unit in resources.units] + [""]
+    fact_contexts = [context_columns[resources.context_code(fact.context_ref)] for fact in facts]
+    entities, period_starts, period_ends, dimensions = zip(*fact_contexts) if facts else ((), (), (), ())
+
+    columns = {
+        "filing": [source.name] * len(facts),
+        "concept": [fact.name for fact in facts],
+        "value": [fact.value for fact in facts],
+        "number": numbers,
+        "unit": [units[resources.unit_code(fact.unit_ref)] for fact in facts],
+        "entity": list(entities),
+        "period_start": list(period_starts),
+        "period_end": list(period_ends),
+        "dimensions": list(dimensions),
+        "decimals": [fact.decimals or "" for fact in facts],
+        "fact_type": [fact.fact_type for fact in facts],
+        "context_ref": [fact.context_ref or "" for fact in facts],
+        "unit_ref": [fact.unit_ref or "" for fact in facts],
+    }
+    entity = next((context.entity for context in resources.contexts if context.entity), None)
+    return IngestedFiling(source.name, "success", entity, len(facts), time.perf_counter() - start), columns
+
+
+class JsonlFactWriter:
+    """One JSON object per fact; encoding happens in the workers, writing as each filing arrives"""
+
+    def __init__(self, output_file: str):
+        self.f = open(output_file, 'w', encoding='utf-8')
+
+    @staticmethod
+    def encode(columns: dict) -> str:
+        numbers = [None if number != number else number for number in columns["number"].tolist()]  # NaN -> null
+        rows = zip(*(numbers if name == "number" else columns[name] for name in FACT_COLUMNS))
+        return "".join(json.dumps(dict(zip(FACT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows)
+
+    def write(self, payload: str):
+        self.f.write(payload)
+
+    def close(self):
+        self.f.close()
+
+
+class NpzFactWriter:
+    """
+    Columns in a .npz: float64 "number", and each text column as UTF-8 bytes
+    ("<column>") with int64 end offsets ("<column>_offsets"; see read_npz_column)
+    Text is stored without padding, so one long ix:nonNumeric text block costs its
+    own length only. Each filing's columns are appended to spool files as it
+    arrives; close() streams the spools into the archive, so memory stays flat.
+    """
+
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self.spool_dir = tempfile.mkdtemp(prefix="ixbrl_npz_", dir=os.path.dirname(os.path.abspath(output_file)))
+        self.spools = {name: open(os.path.join(self.spool_dir, name), 'wb') for name in self._array_names()}
+        self.text_bytes = {name: 0 for name in TEXT_COLUMNS}
+        self.facts = 0
+
+    @staticmethod
+    def _array_names() -> List[str]:
+        return ["number"] + [f"{name}{suffix}" for name in TEXT_COLUMNS for suffix in ("", "_offsets")]
+
+    @staticmethod
+    def encode(columns: dict) -> Dict[str, object]:
+        payload = {"number": np.asarray(columns["number"], dtype=np.float64)}
+        for name in TEXT_COLUMNS:
+            encoded = [value.encode("utf-8") for value in columns[name]]
+            payload[name] = b"".join(encoded)
+            payload[f"{name}_lengths"] = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        return payload
+
+    def write(self, payload: Dict[str, object]):
+        self.spools["number"].write(payload["number"].tobytes())
+        for name in TEXT_COLUMNS:
+            self.spools[name].write(payload[name])
+            ends = np.cumsum(payload[f"{name}_lengths"]) + self.text_bytes[name]
+            self.spools[f"{name}_offsets"].write(ends.tobytes())
+            self.text_bytes[name] += len(payload[name])
+        self.facts += len(payload["number"])
+
+    def close(self):
+        for spool in self.spools.values():
+            spool.close()
+        shapes = {"number": (np.dtype(np.float64), self.facts)}
+        for name in TEXT_COLUMNS:
+            shapes[name] = (np.dtype(np.uint8), self.text_bytes[name])
+            shapes[f"{name}_offsets"] = (np.dtype(np.int64), self.facts + 1)
+        try:
+            with zipfile.ZipFile(self.output_file, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+                for name, (dtype, length) in shapes.items():
+                    with archive.open(f"{name}.npy", 'w', force_zip64=True) as member:
+                        np.lib.format.write_array_header_1_0(
+                            member, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False,
+                                     "shape": (length,)})
+                        if name.endswith("_offsets"):
+                            member.write(np.zeros(1, dtype=np.int64).tobytes())
+                        with open(os.path.join(self.spool_dir, name), 'rb') as spool:
+                            shutil.copyfileobj(spool, member, NPZ_COPY_CHUNK)
+        finally:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+
+def read_npz_column(npz, name: str) -> List[str]:
+    """Decode one column of an NpzFactWriter archive (np.load result) into a list"""
+    if name == "number":
+        return npz["number"].tolist()
+    data, offsets = npz[name].tobytes(), npz[f"{name}_offsets"].tolist()
+    return [data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+
+def open_fact_writer(output_file: str):
+    """A writer for the output format implied by the file extension (.jsonl or .npz)"""
+    if output_file.lower().endswith(".npz"):
+        return NpzFactWriter(output_file)
+    return JsonlFactWriter(output_file)
+
+
+def _failed(source: FilingSource, error: BaseException, seconds: float = 0.0) -> IngestedFiling:
+    return IngestedFiling(source.name, "error", None, 0, seconds, f"{type(error).__name__}: {error}")
+
+
+def _parse_worker(args: tuple):
+    source, include_non_numeric, writer_type = args
+    start = time.perf_counter()
+    try:
+        result, columns = parse_filing(source, include_non_numeric)
+        if columns is None:
+            return result, None
+        return result, writer_type.encode(columns)
+    except Exception as e:
+        # Parsing and encoding are the filing's work; any failure fails the filing, not the run
+        return _failed(source, e, time.perf_counter() - start), None
+
+
+def run_ingestion(sources: Iterable[FilingSource], writer, workers: Optional[int] = None,
+                  include_non_numeric: bool = True) -> List[IngestedFiling]:
+    """
+    Parse filings across a process pool and hand each one's facts to `writer` as it finishes
+    At most workers x PENDING_PER_WORKER filings are submitted ahead of the results,
+    so sources is consumed lazily and memory stays bounded however many filings
+    there are. Facts are encoded for the writer in the workers. Results are in
+    completion order. A worker that dies (killed, out of memory) fails the filings
+    in flight at the time, and the rest continue on a fresh pool.
+    """
+    workers = workers or os.cpu_count() or 1
+    results = []
+
+    def handle(result: IngestedFiling, payload):
+        if payload is not None:
+            writer.write(payload)
+        results.append(result)
+
+    if workers == 1:
+        for source in sources:
+            handle(*_parse_worker((source, include_non_numeric, type(writer))))
+        return results
+
+    def collect(future, source: FilingSource):
+        try:
+            outcome = future.result()
+        except Exception as e:
+            # BrokenProcessPool: the filing was in flight when a worker died
+            outcome = _failed(source, e), None
+        handle(*outcome)
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = {}  # future -> source
+        for source in sources:
+            if len(pending) >= workers * PENDING_PER_WORKER:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future, pending.pop(future))
+            args = (source, include_non_numeric, type(writer))
+            try:
+                future = pool.submit(_parse_worker, args)
+            except BrokenProcessPool:
+                # The filings in flight have failed with the pool; carry on with a fresh one
+                pool.shutdown()
+                pool = ProcessPoolExecutor(max_workers=workers)
+                future = pool.submit(_parse_worker, args)
+            pending[future] = source
+        for future in wait(pending).done:
+            collect(future, pending[future])
+    finally:
+        pool.shutdown()
+    return results
+
+
+def summarize_ingestion(results: List[IngestedFiling], wall_clock_seconds: float, workers: int) -> dict:
+    """Aggregated report for a finished run"""
+    status_counts = {}
+    for result in results:
+        status_counts[result.status] = status_counts.get(result.status, 0) + 1
+    return {
+        "filings": len(results),
+        "status_counts": status_counts,
+        "total_facts": sum(result.facts for result in results),
+        "workers": workers,
+        "wall_clock_seconds": round(wall_clock_seconds, 2),
+        "sum_of_filing_seconds": round(sum(result.seconds for result in results), 2),
+        "filings_per_second": round(len(results) / wall_clock_seconds, 1) if wall_clock_seconds else 0.0,
+        "results": [result._asdict() for result in results],
+    }
+
+
+def print_ingestion_report(summary: dict, max_files_listed: int = 20):
+    """Print totals, the slowest filings and the failures"""
+    print("\n" + "="*60)
+    print("BULK iXBRL INGESTION REPORT")
+    print("="*60)
+    print(f"Filings: {summary['filings']} ({summary['workers']} worker process(es))")
+    for status, count in sorted(summary["status_counts"].items()):
+        print(f"  {status}: {count}")
+    print(f"Facts: {summary['total_facts']:,}")
+    print(f"Wall-clock time: {summary['wall_clock_seconds']:.1f}s "
+          f"(sum of filing times {summary['sum_of_filing_seconds']:.1f}s, "
+          f"{summary['filings_per_second']:.1f} filings/s)")
+
+    slowest = sorted((result for result in summary["results"] if result["status"] == "success"),
+                     key=lambda result: result["seconds"], reverse=True)[:5]
+    if slowest:
+        print("\nSlowest filings:")
+        for result in slowest:
+            print(f"  {result['seconds']:6.2f}s  {result['facts']:>7,} facts  {result['filing']}")
+
+    failed = [result for result in summary["results"] if result["status"] == "error"]
+    if failed:
+        print("\nFailed filings:")
+        for result in failed[:max_files_listed]:
+            print(f"  ✗ {result['filing']}: {result['error']}")
+        if len(failed) > max_files_listed:
+            print(f"  ... and {len(failed) - max_files_listed} more (see the JSON report)")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest directories and zip archives of iXBRL filings")
+    parser.add_argument("targets", nargs="+", help="Directories, zip archives, glob patterns or iXBRL files")
+    parser.add_argument("--output", required=True, help="Fact dataset: .jsonl (one fact per line) or .npz (columnar)")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: one per core)")
+    parser.add_argument("--report", help="Write the per-filing timing and failure report as JSON")
+    parser.add_argument("--numeric-only", action="store_true", help="Only ix:nonFraction facts")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    writer = open_fact_writer(args.output)
+    start = time.perf_counter()
+    try:
+        results = run_ingestion(find_sources(args.targets), writer, workers, not args.numeric_only)
+    finally:
+        writer.close()
+    summary = summarize_ingestion(results, time.perf_counter() - start, workers)
+
+    if not results:
+        print(f"✗ No iXBRL filings found in: {', '.join(args.targets)}")
+        sys.exit(1)
+    print_ingestion_report(summary)
+    print(f"✓ Facts saved to: {args.output}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"✓ Report saved to: {args.report}")
+    if summary["status_counts"].get("error"):
+        sys.exit(1)
@@ -0,0 +1,378 @@
+"""
+Streaming Inline XBRL fact extraction
+Purpose: Pull ix:nonFraction / ix:nonNumeric facts out of an iXBRL document locally
+Scenario: Real 10-K filings run to tens of MB; read them in chunks with bounded memory
+
+The scanner is fed the document a chunk at a time (iterparse-style) and yields
+each fact as soon as its closing tag is seen. Layout markup is skipped without
+being parsed, and only the text of facts that are still open is kept between
+chunks, so memory stays flat however large the filing is. No API call is needed
+to get the facts out.
+
+Contexts and units in ix:resources are resolved once into immutable Context and
+Unit objects (see XbrlResources); facts keep the id as written in contextRef /
+unitRef and are mapped to integer codes through it.
+"""
+
+import glob
+import html
+import os
+import re
+import sys
+from datetime import date
+from typing import Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from ixbrl_transforms import number_value, transform_value
+
+DEFAULT_CHUNK_SIZE = 1 << 20  # 1 MB
+
+FACT_TYPES = {"ix:nonfraction": "nonFraction", "ix:nonnumeric": "nonNumeric"}
+
+RESOURCE_TYPES = {"xbrli:context": "context", "xbrli:unit": "unit"}
+
+FILING_EXTENSIONS = (".htm", ".html", ".xhtml")
+
+# Only the ix facts and the xbrli resources are matched; everything else is skipped
+_TAG_RE = re.compile(
+    r"<(/?)(ix:nonfraction|ix:nonnumeric|xbrli:context|xbrli:unit)\b([^>]*)>", re.IGNORECASE
+)
+_ATTR_RE = re.compile(r"""([^\s=/>]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+# Excluded content is not part of a fact's value (Inline XBRL 1.1, section 4.2)
+_EXCLUDE_RE = re.compile(r"<ix:exclude\b.*?</ix:exclude\s*>", re.IGNORECASE | re.DOTALL)
+_MARKUP_RE = re.compile(r"<[^>]*>")
+
+_IDENTIFIER_RE = re.compile(r"<xbrli:identifier\b[^>]*>([^<]*)<", re.IGNORECASE)
+_PERIOD_RE = re.compile(r"<xbrli:(instant|startDate|endDate|forever)\b[^>]*?(?:/>|>([^<]*)<)", re.IGNORECASE)
+_MEMBER_RE = re.compile(r"<xbrldi:(?:explicit|typed)Member\b([^>]*)>(.*?)</xbrldi:", re.IGNORECASE | re.DOTALL)
+_MEASURE_RE = re.compile(r"<xbrli:measure\b[^>]*>([^<]*)<", re.IGNORECASE)
+_DENOMINATOR_RE = re.compile(r"<xbrli:unitDenominator\b", re.IGNORECASE)
+
+
+class IxbrlFact(NamedTuple):
+    """One fact as it appears in the document (values are the displayed text)"""
+    name: str
+    value: str
+    context_ref: Optional[str]
+    unit_ref: Optional[str]
+    decimals: Optional[str]
+    scale: Optional[str]
+    sign: Optional[str]
+    format: Optional[str]
+    fact_type: str  # "nonFraction" or "nonNumeric"
+    fact_id: Optional[str]
+
+
+def parse_attributes(tag_body: str) -> dict:
+    """Parse the attributes of a start tag into a dict with lower-cased names"""
+    attrs = {}
+    # Unmatched alternatives come back as "", so `double or single` is the value either way
+    for name, double, single in _ATTR_RE.findall(tag_body):
+        value = double or single
+        attrs[name.lower()] = html.unescape(value) if "&" in value else value
+    return attrs
+
+
+def displayed_value(content: str) -> str:
+    """Displayed text of a fact: markup and ix:exclude content removed, whitespace collapsed"""
+    if "<" in content:
+        content = _MARKUP_RE.sub(" ", _EXCLUDE_RE.sub(" ", content))
+    return " ".join(html.unescape(content).split())
+
+
+class Context(NamedTuple):
+    """
+    A resolved xbrli:context: entity, period and dimensions
+    Immutable and hashable, so equal contexts are interned to one shared object.
+    """
+    entity: str
+    start: Optional[date]  # None for instants (and "forever")
+    end: Optional[date]    # the instant itself for instants; None for "forever"
+    dimensions: Tuple[Tuple[str, str], ...] = ()  # (axis, member), sorted
+
+    @property
+    def is_instant(self) -> bool:
+        return self.start is None and self.end is not None
+
+    @property
+    def days(self) -> Optional[int]:
+        """Length of the period in days (0 for instants, None for forever)"""
+        if self.end is None:
+            return None
+        return 0 if self.start is None else (self.end - self.start).days
+
+    @property
+    def period_text(self) -> str:
+        if self.end is None:
+            return "forever"
+        return self.end.isoformat() if self.start is None else f"{self.start.isoformat()}..{self.end.isoformat()}"
+
+
+class Unit(NamedTuple):
+    """A resolved xbrli:unit (numerator / denominator measures for divides)"""
+    measures: Tuple[str, ...]
+    divide_by: Tuple[str, ...] = ()
+
+    @property
+    def measure(self) -> str:
+        """The measure as text, e.g. iso4217:USD or iso4217:USD/xbrli:shares"""
+        measure = "*".join(self.measures)
+        return f"{measure}/{'*'.join(self.divide_by)}" if self.divide_by else measure
+
+
+class XbrlResources:
+    """
+    The contexts and units of a filing, each resolved once from ix:resources
+
+    Equal contexts (and units) share one interned object and one integer code,
+    and every distinct period has a code too, so facts can be grouped or filtered
+    by period with integer comparisons. Facts hold the context/unit id string as
+    written; context_code() / unit_code() turn it into the integer code.
+    """
+
+    def __init__(self):
+        self.contexts: List[Context] = []          # by context code
+        self.units: List[Unit] = []                # by unit code
+        self.periods: List[Tuple[Optional[date], Optional[date]]] = []  # (start, end) by period code
+        self.context_periods: List[int] = []       # period code of each context code
+        self.context_codes: Dict[str, int] = {}    # xbrli:context id -> context code
+        self.unit_codes: Dict[str, int] = {}       # xbrli:unit id -> unit code
+        self._context_index: Dict[Context, int] = {}
+        self._unit_index: Dict[Unit, int] = {}
+        self._period_index: Dict[Tuple[Optional[date], Optional[date]], int] = {}
+
+    def add_context(self, context_id: str, context: Context) -> int:
+        code = self._context_index.get(context)
+        if code is None:
+            code = self._context_index[context] = len(self.contexts)
+            self.contexts.append(context)
+            period = (context.start, context.end)
+            period_code = self._period_index.get(period)
+            if period_code is None:
+                period_code = self._period_index[period] = len(self.periods)
+                self.periods.append(period)
+            self.context_periods.append(period_code)
+        self.context_codes[context_id] = code
+        return code
+
+    def add_unit(self, unit_id: str, unit: Unit) -> int:
+        code = self._unit_index.get(unit)
+        if code is None:
+            code = self._unit_index[unit] = len(self.units)
+            self.units.append(unit)
+        self.unit_codes[unit_id] = code
+        return code
+
+    def context_code(self, context_ref: Optional[str]) -> int:
+        """Integer code of a contextRef (-1 if it is not defined)"""
+        return self.context_codes.get(context_ref, -1)
+
+    def unit_code(self, unit_ref: Optional[str]) -> int:
+        """Integer code of a unitRef (-1 if it is not defined or not given)"""
+        return self.unit_codes.get(unit_ref, -1)
+
+    def period_code(self, context_ref: Optional[str]) -> int:
+        """Integer code of a contextRef's period (-1 if the context is not defined)"""
+        code = self.context_codes.get(context_ref)
+        return -1 if code is None else self.context_periods[code]
+
+    def context(self, context_ref: Optional[str]) -> Optional[Context]:
+        code = self.context_codes.get(context_ref)
+        return None if code is None else self.contexts[code]
+
+    def unit(self, unit_ref: Optional[str]) -> Optional[Unit]:
+        code = self.unit_codes.get(unit_ref)
+        return None if code is None else self.units[code]
+
+
+def _parse_date(text: str) -> Optional[date]:
+    try:
+        return date.fromisoformat(text.strip()[:10])
+    except ValueError:
+        return None
+
+
+def _parse_context(content: str) -> Context:
+    """Entity, period and dimensions of an xbrli:context element"""
+    identifier = _IDENTIFIER_RE.search(content)
+    period = {name.lower(): value or "" for name, value in _PERIOD_RE.findall(content)}
+    if "instant" in period:
+        start, end = None, _parse_date(period["instant"])
+    else:
+        start, end = _parse_date(period.get("startdate", "")), _parse_date(period.get("enddate", ""))
+    dimensions = tuple(sorted(
+        (sys.intern(parse_attributes(member_attrs).get("dimension", "")), sys.intern(displayed_value(member_value)))
+        for member_attrs, member_value in _MEMBER_RE.findall(content)
+    ))
+    return Context(sys.intern(identifier.group(1).strip()) if identifier else "", start, end, dimensions)
+
+
+def _parse_unit(content: str) -> Unit:
+    """Measures of an xbrli:unit element (numerator / denominator for divides)"""
+    measures = tuple(sys.intern(measure.strip()) for measure in _MEASURE_RE.findall(content))
+    denominator = _DENOMINATOR_RE.search(content)
+    if denominator:
+        split = len(_MEASURE_RE.findall(content, 0, denominator.start()))
+        return Unit(measures[:split], measures[split:])
+    return Unit(measures)
+
+
+def _interned(value: Optional[str]) -> Optional[str]:
+    return None if value is None else sys.intern(value)
+
+
+def make_fact(attrs: dict, fact_type: str, value: str) -> IxbrlFact:
+    """
+    Build a fact record from the tag attributes
+    Concept names, context/unit refs, decimals and formats repeat on every fact, so
+    they are interned: a filing's facts share one string per distinct value.
+    """
+    return IxbrlFact(
+        name=sys.intern(attrs.get("name", "")),
+        value=value,
+        context_ref=_interned(attrs.get("contextref")),
+        unit_ref=_interned(attrs.get("unitref")),
+        decimals=_interned(attrs.get("decimals")),
+        scale=attrs.get("scale"),
+        sign=attrs.get("sign"),
+        format=_interned(attrs.get("format")),
+        fact_type=fact_type,
+        fact_id=attrs.get("id"),
+    )
+
+
+class IxbrlFactScanner:
+    """
+    Incremental scanner that collects completed facts in `self.completed`.
+
+    Call feed() with successive chunks of the document and close() at the end;
+    drain `completed` between feeds to keep memory flat. Contexts and units from
+    ix:resources are resolved into `self.resources` (an XbrlResources).
+    """
+
+    def __init__(self, resources: Optional[XbrlResources] = None):
+        self.completed = []
+        self.resources = XbrlResources() if resources is None else resources
+        self._buffer = ""
+        self._scan_from = 0
+        self._open = []  # [attrs, fact_type, content_start] for facts not yet closed
+
+    def feed(self, chunk: str):
+        buffer = self._buffer + chunk
+        scan_end = self._scan_from
+        for match in _TAG_RE.finditer(buffer, self._scan_from):
+            scan_end = match.end()
+            closing, tag, tag_body = match.groups()
+            tag = tag.lower()
+            fact_type = FACT_TYPES.get(tag) or RESOURCE_TYPES[tag]
+            if closing:
+                # Pop back to the matching start tag; stray end tags are ignored
+                for index in range(len(self._open) - 1, -1, -1):
+                    if self._open[index][1] == fact_type:
+                        attrs, _, content_start = self._open.pop(index)
+                        content = buffer[content_start:match.start()]
+                        if fact_type == "context":
+                            self.resources.add_context(attrs.get("id", ""), _parse_context(content))
+                        elif fact_type == "unit":
+                            self.resources.add_unit(attrs.get("id", ""), _parse_unit(content))
+                        else:
+                            self.completed.append(make_fact(attrs, fact_type, displayed_value(content)))
+                        break
+            elif tag_body.rstrip().endswith("/") and tag in FACT_TYPES:
+                # <ix:nonFraction ... xsi:nil="true"/> is a fact with no value
+                self.completed.append(make_fact(parse_attributes(tag_body), fact_type, ""))
+            else:
+                self._open.append([parse_attributes(tag_body), fact_type, match.end()])
+
+        # Keep the content of open facts, plus any tag cut in half by the chunk boundary
+        if self._open:
+            keep_from = self._open[0][2]
+        else:
+            keep_from = len(buffer)
+            last_lt = buffer.rfind("<", scan_end)
+            if last_lt != -1 and buffer.find(">", last_lt) == -1:
+                keep_from = last_lt
+        for open_fact in self._open:
+            open_fact[2] -= keep_from
+        self._scan_from = max(scan_end, keep_from) - keep_from
+        self._buffer = buffer[keep_from:]
+
+    def close(self):
+        """Discard anything left over (facts that were never closed)"""
+        self._buffer = ""
+        self._scan_from = 0
+        self._open = []
+
+
+def iter_ixbrl_facts(ixbrl_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     include_non_numeric: bool = False,
+                     resources: Optional[XbrlResources] = None) -> Iterator[IxbrlFact]:
+    """
+    Yield facts from an Inline XBRL file, reading it chunk_size characters at a time.
+
+    Only ix:nonFraction facts are yielded unless include_non_numeric is set.
+    If an XbrlResources is passed, the filing's contexts and units are resolved
+    into it as they are read (complete once the generator is exhausted).
+    """
+    with open(ixbrl_file, 'r', encoding='utf-8', errors='replace') as f:
+        yield from iter_stream_facts(f, chunk_size, include_non_numeric, resources)
+
+
+def iter_stream_facts(stream: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      include_non_numeric: bool = False,
+                      resources: Optional[XbrlResources] = None) -> Iterator[IxbrlFact]:
+    """iter_ixbrl_facts() for an already open text stream, e.g. a member of a zip archive"""
+    scanner = IxbrlFactScanner(resources)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            scanner.close()
+            break
+        scanner.feed(chunk)
+        for fact in scanner.completed:
+            if include_non_numeric or fact.fact_type == "nonFraction":
+                yield fact
+        scanner.completed.clear()
+
+
+def numeric_value(fact: IxbrlFact) -> Optional[float]:
+    """
+    The number a nonFraction fact reports: displayed value with its format, scale and sign applied
+    Returns None for nil facts, ix:nonNumeric facts (whatever their text looks like)
+    and formats that are not numbers (dates, text)
+    """
+    if fact.fact_type != "nonFraction":
+        return None
+    return number_value(fact.format, fact.value, fact.scale, fact.sign)
+
+
+def xbrl_value(fact: IxbrlFact) -> Optional[str]:
+    """
+    A fact's value as XBRL reads it: numbers with format, scale and sign applied,
+    dates in ISO 8601. None when the format is not registered or does not match.
+    """
+    if fact.fact_type == "nonFraction":
+        number = numeric_value(fact)
+        if number is not None:
+            return str(int(number)) if number.is_integer() else repr(number)
+    elif fact.format is None:
+        return fact.value
+    return transform_value(fact.format, fact.value) if fact.format else None
+
+
+def find_filings(targets: List[str]) -> List[str]:
+    """iXBRL files from directories (searched recursively), glob patterns or file paths"""
+    filings = []
+    for target in targets:
+        if os.path.isdir(target):
+            paths = glob.glob(os.path.join(target, "**", "*"), recursive=True)
+            filings.extend(path for path in paths if path.lower().endswith(FILING_EXTENSIONS))
+        elif os.path.isfile(target):
+            filings.append(target)
+        else:
+            filings.extend(path for path in glob.glob(target, recursive=True) if os.path.isfile(path))
+    return sorted(set(filings))
+
+
+def fact_to_dict(fact: IxbrlFact) -> dict:
+    """Return a fact as a plain dict, leaving out attributes that are not set"""
+    return {key: value for key, value in fact._asdict().items() if value is not None}
@@ -0,0 +1,288 @@
+"""
+Memory-mapped iXBRL fact index
+Purpose: Jump straight to any fact's place in the source document
+Scenario: Trace a reported number back to its statement table in a 100 MB filing
+          without loading the HTML into memory
+
+The filing is memory-mapped and scanned once for ix:nonFraction / ix:nonNumeric
+elements; the byte offsets of each element and of its content are saved in a
+sidecar .ixidx.json next to the filing. Later opens load the sidecar (checked
+against the file's size and modification time) and look facts up by id, by
+concept and context, or by position in document order, each a dict or list
+access. Only the slice of the map that is asked for is ever read.
+
+Usage:
+    python ixbrl_offset_index.py filing.html --fact-id F_InventoryNet_2024
+    python ixbrl_offset_index.py filing.html --position 3
+    python ixbrl_offset_index.py filing.html --concept us-gaap:InventoryNet --context AsOf_2024-12-31
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from ixbrl_facts import FACT_TYPES, IxbrlFact, displayed_value, make_fact, parse_attributes
+
+# Bump when the sidecar layout changes, so old sidecars are rebuilt
+INDEX_VERSION = 1
+
+_FACT_TAG_RE = re.compile(rb"<(/?)(ix:nonfraction|ix:nonnumeric)\b([^>]*)>", re.IGNORECASE)
+_TABLE_TAG_RE = re.compile(rb"<(/?)table\b[^>]*>", re.IGNORECASE)
+
+# How far either side of a fact to look for its enclosing <table>
+TABLE_SEARCH_WINDOW = 256 * 1024
+
+
+class FactLocation(NamedTuple):
+    """Where one fact sits in the file (byte offsets; end offsets are exclusive)"""
+    position: int        # index in document order, as yielded by iter_ixbrl_facts(include_non_numeric=True)
+    name: str
+    fact_type: str       # "nonFraction" or "nonNumeric"
+    fact_id: Optional[str]
+    context_ref: Optional[str]
+    start: int           # the "<" of the start tag
+    content_start: int
+    content_end: int
+    end: int             # just past the end tag
+
+
+def sidecar_path(ixbrl_file: str) -> str:
+    """Where the offset index for a filing lives"""
+    stem, _ = os.path.splitext(ixbrl_file)
+    return f"{stem}.ixidx.json"
+
+
+def file_fingerprint(ixbrl_file: str) -> str:
+    stat = os.stat(ixbrl_file)
+    return f"{INDEX_VERSION}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class FactOffsets(NamedTuple):
+    """The index as columns, one entry per fact in document order (the sidecar layout)"""
+    names: List[str]                   # distinct concept names
+    name_codes: List[int]              # per fact, index into names
+    fact_types: List[str]
+    fact_ids: List[Optional[str]]
+    context_refs: List[Optional[str]]
+    offsets: List[int]                 # per fact: start, content_start, content_end, end
+
+
+def scan_fact_offsets(data) -> FactOffsets:
+    """
+    Offsets of every fact in a bytes-like object (an mmap is searched in place)
+    Facts are listed in the order their end tags appear, the order the streaming
+    scanner in ixbrl_facts yields them, so positions line up with it.
+    """
+    index = FactOffsets([], [], [], [], [], [])
+    name_codes = {}
+    open_facts = []  # (attrs, fact_type, start, content_start)
+
+    def add(attrs: dict, fact_type: str, *offsets: int):
+        index.name_codes.append(name_codes.setdefault(attrs.get("name", ""), len(name_codes)))
+        index.fact_types.append(fact_type)
+        index.fact_ids.append(attrs.get("id"))
+        index.context_refs.append(attrs.get("contextref"))
+        index.offsets.extend(offsets)
+
+    for match in _FACT_TAG_RE.finditer(data):
+        closing, tag, tag_body = match.groups()
+        fact_type = FACT_TYPES[tag.decode("ascii").lower()]
+        if closing:
+            for position in range(len(open_facts) - 1, -1, -1):
+                if open_facts[position][1] == fact_type:
+                    attrs, _, start, content_start = open_facts.pop(position)
+                    add(attrs, fact_type, start, content_start, match.start(), match.end())
+                    break
+            continue
+        attrs = parse_attributes(tag_body.decode("utf-8", errors="replace"))
+        if tag_body.rstrip().endswith(b"/"):
+            add(attrs, fact_type, match.start(), match.end(), match.end(), match.end())
+        else:
+            open_facts.append((attrs, fact_type, match.start(), match.end()))
+    index.names.extend(name_codes)
+    return index
+
+
+class OffsetIndex:
+    """
+    A memory-mapped filing with its fact offsets
+
+        with OffsetIndex.open("filing.html") as index:
+            location = index.by_id("F1")
+            print(index.table_around(location))
+    """
+
+    def __init__(self, ixbrl_file: str, offsets: FactOffsets, data, loaded_from_sidecar: bool = False):
+        self.ixbrl_file = ixbrl_file
+        self.offsets = offsets
+        self.loaded_from_sidecar = loaded_from_sidecar
+        self._data = data
+        # First fact wins when a (malformed) filing repeats an id
+        self._by_id: Dict[str, int] = {}
+        for position, fact_id in enumerate(offsets.fact_ids):
+            if fact_id and fact_id not in self._by_id:
+                self._by_id[fact_id] = position
+        self._by_concept: Optional[Dict[Tuple[str, Optional[str]], List[int]]] = None
+
+    @classmethod
+    def open(cls, ixbrl_file: str, rebuild: bool = False, save: bool = True) -> "OffsetIndex":
+        """Map a filing and load its sidecar index, building (and saving) it if missing or stale"""
+        with open(ixbrl_file, 'rb') as f:
+            # A zero-length file cannot be mapped; it simply has no facts
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        fingerprint = file_fingerprint(ixbrl_file)
+        offsets = None if rebuild else _load_sidecar(sidecar_path(ixbrl_file), fingerprint)
+        if offsets is not None:
+            return cls(ixbrl_file, offsets, data, loaded_from_sidecar=True)
+        offsets = scan_fact_offsets(data)
+        if save:
+            _save_sidecar(sidecar_path(ixbrl_file), fingerprint, offsets)
+        return cls(ixbrl_file, offsets, data)
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def __enter__(self) -> "OffsetIndex":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets.name_codes)
+
+    def __getitem__(self, position: int) -> FactLocation:
+        """The location of the fact at a document-order position"""
+        offsets = self.offsets
+        if position < 0:
+            position += len(self)
+        start, content_start, content_end, end = offsets.offsets[4 * position:4 * position + 4]
+        return FactLocation(position, offsets.names[offsets.name_codes[position]], offsets.fact_types[position],
+                            offsets.fact_ids[position], offsets.context_refs[position],
+                            start, content_start, content_end, end)
+
+    def by_id(self, fact_id: str) -> Optional[FactLocation]:
+        position = self._by_id.get(fact_id)
+        return None if position is None else self[position]
+
+    def by_concept(self, concept: str, context_ref: Optional[str] = None) -> List[FactLocation]:
+        """Every fact of a concept, optionally only in one context"""
+        if self._by_concept is None:
+            # Built on first use; most tracing is by id
+            self._by_concept = {}
+            names = self.offsets.names
+            for position, (code, context) in enumerate(zip(self.offsets.name_codes, self.offsets.context_refs)):
+                self._by_concept.setdefault((names[code], context), []).append(position)
+                self._by_concept.setdefault((names[code], None), []).append(position)
+        return [self[position] for position in self._by_concept.get((concept, context_ref), [])]
+
+    def read(self, start: int, end: int) -> str:
+        """Decode one slice of the file"""
+        return self._data[start:end].decode("utf-8", errors="replace")
+
+    def element(self, location: FactLocation) -> str:
+        """The fact's element exactly as it appears in the source"""
+        return self.read(location.start, location.end)
+
+    def fact(self, location: FactLocation) -> IxbrlFact:
+        """Re-read one fact from its slice (same record iter_ixbrl_facts yields)"""
+        attrs = parse_attributes(self.read(location.start, location.content_start))
+        return make_fact(attrs, location.fact_type,
+                         displayed_value(self.read(location.content_start, location.content_end)))
+
+    def table_around(self, location: FactLocation, window: int = TABLE_SEARCH_WINDOW) -> str:
+        """
+        The <table> holding a fact, read from the map
+        Only `window` bytes either side of the fact are searched, so the cost does not
+        grow with the file; a fact outside any table gets its own element back.
+        Tables are matched by nesting depth, so a table that closes before the fact
+        (or opens after it) is never mistaken for the one holding it.
+        """
+        low = max(0, location.start - window)
+        start = None
+        depth = 0
+        for tag in reversed(list(_TABLE_TAG_RE.finditer(self._data, low, location.start))):
+            if tag.group(1):
+                depth += 1
+            elif depth:
+                depth -= 1
+            else:
+                start = tag.start()
+                break
+        if start is None:
+            return self.element(location)
+        depth = 0
+        for tag in _TABLE_TAG_RE.finditer(self._data, location.end, min(len(self._data), location.end + window)):
+            if not tag.group(1):
+                depth += 1
+            elif depth:
+                depth -= 1
+            else:
+                return self.read(start, tag.end())
+        return self.element(location)
+
+
+def _load_sidecar(path: str, fingerprint: str) -> Optional[FactOffsets]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get("fingerprint") != fingerprint:
+            return None
+        return FactOffsets(*(cached[field] for field in FactOffsets._fields))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_sidecar(path: str, fingerprint: str, offsets: FactOffsets):
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"fingerprint": fingerprint, **offsets._asdict()}, f, separators=(",", ":"))
+    except OSError:
+        pass  # a read-only filing directory just means the index is rebuilt next time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trace iXBRL facts to their place in the source document")
+    parser.add_argument("filing", help="iXBRL file")
+    parser.add_argument("--fact-id", help="Show the fact with this id")
+    parser.add_argument("--position", type=int, help="Show the Nth fact in document order (from 0)")
+    parser.add_argument("--concept", help="Show every fact of this concept, e.g. us-gaap:InventoryNet")
+    parser.add_argument("--context", help="With --concept, only facts in this context")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore any saved index")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with OffsetIndex.open(args.filing, rebuild=args.rebuild) as index:
+        opened = time.perf_counter()
+        source = "loaded from" if index.loaded_from_sidecar else "built and saved to"
+        print(f"✓ {len(index):,} facts indexed ({source} {sidecar_path(args.filing)}) in {(opened - start) * 1000:.1f} ms")
+
+        if args.fact_id:
+            location = index.by_id(args.fact_id)
+            matches = [location] if location else []
+        elif args.position is not None:
+            matches = [index[args.position]] if -len(index) <= args.position < len(index) else []
+        elif args.concept:
+            matches = index.by_concept(args.concept, args.context)
+        else:
+            sys.exit(0)
+        if not matches:
+            print(f"✗ No matching fact in {args.filing}")
+            sys.exit(1)
+
+        for location in matches:
+            lookup = time.perf_counter()
+            fact = index.fact(location)
+            table = index.table_around(location)
+            elapsed = time.perf_counter() - lookup
+            print("\n" + "="*60)
+            print(f"{fact.name} = {fact.value}  [{fact.context_ref}]")
+            print(f"Bytes {location.start:,}-{location.end:,}; read in {elapsed * 1000:.2f} ms")
+            print("="*60)
+            print(table)
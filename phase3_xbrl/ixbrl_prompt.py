@@ -0,0 +1,113 @@
+"""
+Fact-only prompt compaction for XBRL analysis calls
+Purpose: Reduce an Inline XBRL document to a compact fact table plus contexts and units
+Scenario: Send the model the facts, not the <table>/<tr>/styling markup around them
+
+Most of an iXBRL filing is presentation markup. The analysis prompt only needs
+the facts, so this stage rewrites the document as a pipe-delimited table grouped
+by context (each context id is written once, not once per fact) and reports how
+many input tokens that saves. Values are written as XBRL reads them (ixt format,
+scale and sign applied), so the model does not have to interpret display text.
+"""
+
+import os
+import sys
+from typing import NamedTuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils.prompt_templates import CHARS_PER_TOKEN, estimate_tokens
+from ixbrl_facts import DEFAULT_CHUNK_SIZE, XbrlResources, iter_ixbrl_facts, xbrl_value
+
+
+class CompactIxbrl(NamedTuple):
+    """Compacted prompt text plus the size report for one document"""
+    text: str
+    fact_count: int
+    context_count: int
+    unit_count: int
+    raw_tokens: int
+    compact_tokens: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.raw_tokens - self.compact_tokens
+
+    @property
+    def percent_saved(self) -> float:
+        return (self.tokens_saved / self.raw_tokens * 100) if self.raw_tokens else 0.0
+
+
+def document_tokens(ixbrl_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    estimate_tokens() of the whole document's text, as the raw prompt would carry it
+    Characters are counted chunk by chunk, so the file is never loaded in one piece;
+    bytes would overcount every non-ASCII character.
+    """
+    chars = 0
+    with open(ixbrl_file, 'r', encoding='utf-8', errors='replace') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            chars += len(chunk)
+    return (chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def compact_ixbrl_for_prompt(ixbrl_file: str, include_non_numeric: bool = False) -> CompactIxbrl:
+    """Reduce an iXBRL document to a compact fact table with its contexts and units"""
+    resources = XbrlResources()
+    facts_by_context = {}
+    fact_count = 0
+    for fact in iter_ixbrl_facts(ixbrl_file, include_non_numeric=include_non_numeric, resources=resources):
+        facts_by_context.setdefault(fact.context_ref or "", []).append(fact)
+        fact_count += 1
+
+    lines = []
+
+    # Only the contexts and units the facts actually use
+    used_units = sorted({fact.unit_ref for facts in facts_by_context.values() for fact in facts if fact.unit_ref})
+    lines.append("UNITS (id | measure)")
+    for unit_id in used_units:
+        unit = resources.unit(unit_id)
+        lines.append(f"{unit_id} | {unit.measure if unit else 'undefined'}")
+
+    lines.append("")
+    lines.append("CONTEXTS (id | entity | period | dimensions)")
+    for context_id in facts_by_context:
+        context = resources.context(context_id)
+        if context:
+            dimensions = ", ".join(f"{axis}={member}" for axis, member in context.dimensions)
+            lines.append(f"{context_id} | {context.entity} | {context.period_text} | {dimensions}".rstrip(" |"))
+        else:
+            lines.append(f"{context_id} | undefined")
+
+    lines.append("")
+    # Scale, sign and format are only given for values the transformation registry could not read
+    lines.append("FACTS (name | value | unit | decimals | scale | sign | format), grouped by context")
+    for context_id, facts in facts_by_context.items():
+        lines.append(f"[{context_id}]")
+        for fact in facts:
+            value = xbrl_value(fact)
+            if value is not None:
+                # Format, scale and sign are already applied
+                row = (fact.name, value, fact.unit_ref or "", fact.decimals or "")
+            else:
+                row = (fact.name, fact.value, fact.unit_ref or "", fact.decimals or "",
+                       fact.scale or "", fact.sign or "", fact.format or "")
+            lines.append(" | ".join(row).rstrip(" |"))
+
+    text = "\n".join(lines)
+    return CompactIxbrl(
+        text=text,
+        fact_count=fact_count,
+        context_count=len(facts_by_context),
+        unit_count=len(used_units),
+        raw_tokens=document_tokens(ixbrl_file),
+        compact_tokens=estimate_tokens(text),
+    )
+
+
+def print_compaction_report(compact: CompactIxbrl):
+    """Print how much of the prompt the compaction removed"""
+    print(f"Prompt compaction: {compact.fact_count} facts, {compact.context_count} contexts, "
+          f"{compact.unit_count} units")
+    print(f"  Raw document:  ~{compact.raw_tokens:,} tokens")
+    print(f"  Compact table: ~{compact.compact_tokens:,} tokens")
+    print(f"  Saved:         ~{compact.tokens_saved:,} tokens ({compact.percent_saved:.1f}%)\n")
@@ -0,0 +1,301 @@
+"""
+Inline XBRL transformation registry
+Purpose: Turn displayed fact text into XBRL values using the fact's ixt format, scale and sign
+Scenario: "(1.234,5)" shown in millions, or "December 31, 2024", read locally instead of by the model
+
+Each transformation (Inline XBRL Transformation Registry 1-5 names, plus the
+older names still seen in filings) is a small function registered under every
+name it goes by. A format QName such as "ixt:num-dot-decimal" or
+"ixt4:numdotdecimal" is resolved to its function once and kept in a dispatch
+table, so later facts with the same format cost one dict lookup.
+
+numeric_values() is the bulk path: it converts whole columns of displayed
+strings into scaled, signed float64 values with one regex pass over the joined
+column per format and a single NumPy string-to-float conversion.
+"""
+
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# Displayed numbers: digit groups and one optional decimal part, with any currency
+# symbols or spaces around them ignored
+_NUMBER_RE = re.compile(r"\d[\d,. \u00a0']*")
+_NUMBER_TRAILING = ",. \u00a0'"
+_DASHES = ("-", "\u2013", "\u2014")
+_NON_DIGIT_RE = re.compile(r"[^\d.]")
+
+# Bulk versions of the same steps, run over a column joined with newlines
+_FIRST_NUMBER_LINE_RE = re.compile(r"^[^\d\n]*(\d[\d,. \u00a0']*)?[^\n]*$", re.MULTILINE)
+_TRAILING_LINE_RE = re.compile(r"[,. \u00a0']+$", re.MULTILINE)
+_DOT_GROUPING_RE = re.compile(r"[, \u00a0']")
+_COMMA_GROUPING_RE = re.compile(r"[. \u00a0']")
+
+_DIGITS_RE = re.compile(r"\d+")
+_DATE_NUMERIC_RE = re.compile(r"(\d{1,4})\D+(\d{1,2})\D+(\d{1,4})")
+_MONTH_DAY_YEAR_RE = re.compile(r"([A-Za-z]{3,})\.?\s*(\d{1,2})\W+(\d{2,4})")
+_DAY_MONTH_YEAR_RE = re.compile(r"(\d{1,2})\W*([A-Za-z]{3,})\.?\W*(\d{2,4})")
+_MONTH_YEAR_RE = re.compile(r"([A-Za-z]{3,})\.?\W*(\d{2,4})")
+
+MONTHS = {name: number for number, names in enumerate((
+    ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",),
+    ("jun", "june"), ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"),
+    ("oct", "october"), ("nov", "november"), ("dec", "december"),
+), start=1) for name in names}
+
+
+class Transform(NamedTuple):
+    """A registered transformation: function(displayed text) -> XBRL value text, or None if it does not apply"""
+    name: str
+    kind: str  # "number", "date" or "text"
+    function: Callable[[str], Optional[str]]
+    grouping: Optional[str] = None  # numbers only: "dot" or "comma", the decimal separator, for the bulk path
+
+
+TRANSFORMS: Dict[str, Transform] = {}
+
+# Format QName as written in the filing -> Transform (None when not registered)
+_DISPATCH: Dict[Optional[str], Optional[Transform]] = {}
+
+
+def register(*names: str, kind: str, grouping: Optional[str] = None):
+    """Register a transformation function under each of its names (local names, without prefix)"""
+    def decorator(function):
+        for name in names:
+            TRANSFORMS[name] = Transform(names[0], kind, function, grouping)
+        _DISPATCH.clear()
+        return function
+    return decorator
+
+
+def resolve_format(fmt: Optional[str]) -> Optional[Transform]:
+    """
+    The transformation for a format attribute, e.g. "ixt:num-dot-decimal"
+    The namespace prefix is ignored. Facts without a format are plain dot-decimal
+    numbers; unregistered formats resolve to None.
+    """
+    try:
+        return _DISPATCH[fmt]
+    except KeyError:
+        pass
+    if fmt is None:
+        transform = TRANSFORMS["num-dot-decimal"]
+    else:
+        transform = TRANSFORMS.get(fmt.rpartition(":")[2].strip().lower())
+    _DISPATCH[fmt] = transform
+    return transform
+
+
+def _clean_number(text: str, decimal: str) -> Optional[str]:
+    match = _NUMBER_RE.search(text)
+    if match is None:
+        return None
+    digits = match.group().rstrip(_NUMBER_TRAILING)
+    if decimal == "comma":  # e.g. 1.234.567,89
+        digits = digits.replace(".", "").replace(" ", "").replace(",", ".")
+    return _NON_DIGIT_RE.sub("", digits)
+
+
+@register("num-dot-decimal", "numdotdecimal", "numcommadot", "numspacedot", "num-dot-decimal-apos",
+          "numdotdecimalin", "num-dot-decimal-in", kind="number", grouping="dot")
+def num_dot_decimal(text: str) -> Optional[str]:
+    """1,234,567.89 (any grouping character, "." decimals)"""
+    if text.strip() in _DASHES:
+        return "0"
+    return _clean_number(text, "dot")
+
+
+@register("num-comma-decimal", "numcommadecimal", "numdotcomma", "numspacecomma", "numcomma",
+          "num-comma-decimal-apos", kind="number", grouping="comma")
+def num_comma_decimal(text: str) -> Optional[str]:
+    """1.234.567,89 (any grouping character, "," decimals)"""
+    if text.strip() in _DASHES:
+        return "0"
+    return _clean_number(text, "comma")
+
+
+@register("num-unit-decimal", "numunitdecimal", kind="number")
+def num_unit_decimal(text: str) -> Optional[str]:
+    """5 dollars 25 cents -> 5.25"""
+    groups = _DIGITS_RE.findall(text)
+    if not groups:
+        return None
+    return f"{groups[0]}.{groups[1].zfill(2)}" if len(groups) > 1 else groups[0]
+
+
+@register("fixed-zero", "zerodash", "numdash", "zero-dash", "fixed-zero-dash", kind="number")
+def fixed_zero(text: str) -> Optional[str]:
+    return "0"
+
+
+@register("fixed-empty", "nocontent", kind="text")
+def fixed_empty(text: str) -> Optional[str]:
+    return ""
+
+
+@register("fixed-true", "booleantrue", kind="text")
+def fixed_true(text: str) -> Optional[str]:
+    return "true"
+
+
+@register("fixed-false", "booleanfalse", kind="text")
+def fixed_false(text: str) -> Optional[str]:
+    return "false"
+
+
+def _iso_date(year: str, month: int, day: int) -> Optional[str]:
+    year_number = int(year)
+    if len(year) <= 2:
+        year_number += 2000
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    return f"{year_number:04d}-{month:02d}-{day:02d}"
+
+
+def _numeric_date(text: str, order: str) -> Optional[str]:
+    """Dates written as three numbers in the given order (dmy, mdy or ymd)"""
+    match = _DATE_NUMERIC_RE.search(text)
+    if match is None:
+        return None
+    parts = dict(zip(order, match.groups()))
+    return _iso_date(parts["y"], int(parts["m"]), int(parts["d"]))
+
+
+def _month_name_date(text: str, day_first: bool) -> Optional[str]:
+    """December 31, 2024 / Dec. 31, 24, or 31 December 2024 when day_first"""
+    match = (_DAY_MONTH_YEAR_RE if day_first else _MONTH_DAY_YEAR_RE).search(text)
+    if match is None:
+        return None
+    if day_first:
+        day, month_name, year = match.groups()
+    else:
+        month_name, day, year = match.groups()
+    month = MONTHS.get(month_name.lower())
+    return None if month is None else _iso_date(year, month, int(day))
+
+
+@register("date-day-month-year", "datedaymonthyear", "dateslasheu", "datedoteu", kind="date")
+def date_day_month_year(text: str) -> Optional[str]:
+    return _numeric_date(text, "dmy")
+
+
+@register("date-month-day-year", "datemonthdayyear", "dateslashus", "datedotus", kind="date")
+def date_month_day_year(text: str) -> Optional[str]:
+    return _numeric_date(text, "mdy")
+
+
+@register("date-year-month-day", "dateyearmonthday", kind="date")
+def date_year_month_day(text: str) -> Optional[str]:
+    return _numeric_date(text, "ymd")
+
+
+@register("date-monthname-day-year", "datemonthnamedayyear", "datemonthdayyearen", "datelongus",
+          "dateshortus", kind="date")
+def date_monthname_day_year(text: str) -> Optional[str]:
+    return _month_name_date(text, day_first=False)
+
+
+@register("date-day-monthname-year", "datedaymonthnameyear", "datedaymonthyearen", "datelonguk",
+          "dateshortuk", kind="date")
+def date_day_monthname_year(text: str) -> Optional[str]:
+    return _month_name_date(text, day_first=True)
+
+
+@register("date-monthname-year", "datemonthnameyear", "datemonthyearen", "dateyearmonthen", kind="date")
+def date_month_name_year(text: str) -> Optional[str]:
+    """December 2024 -> 2024-12 (xs:gYearMonth)"""
+    match = _MONTH_YEAR_RE.search(text)
+    month = MONTHS.get(match.group(1).lower()) if match else None
+    if month is None:
+        return None
+    year = match.group(2)
+    return f"{int(year) + (2000 if len(year) <= 2 else 0):04d}-{month:02d}"
+
+
+def transform_value(fmt: Optional[str], text: str) -> Optional[str]:
+    """XBRL value text of a displayed value (None when the format is unknown or does not match)"""
+    transform = resolve_format(fmt)
+    return None if transform is None else transform.function(text)
+
+
+def number_value(fmt: Optional[str], text: str, scale: Optional[str] = None,
+                 sign: Optional[str] = None) -> Optional[float]:
+    """A displayed number with its format, scale and sign applied (None if it is not a number)"""
+    transform = resolve_format(fmt)
+    if transform is None or transform.kind != "number":
+        return None
+    digits = transform.function(text)
+    try:
+        number = float(digits)
+        if scale:
+            number *= 10.0 ** int(scale)
+    except (TypeError, ValueError):
+        return None
+    return -number if sign == "-" else number
+
+
+def _bulk_numbers(texts: List[str], decimal: str) -> np.ndarray:
+    """float64 of many displayed numbers of one grouping style (NaN where there is none)"""
+    joined = "\n".join(texts)
+    if joined.count("\n") != len(texts) - 1:
+        # A value with its own line breaks; fall back to one at a time
+        return np.array([number_value(f"num-{decimal}-decimal", text) for text in texts], dtype=np.float64)
+    numbers = "\n".join(_FIRST_NUMBER_LINE_RE.findall(joined))
+    numbers = _TRAILING_LINE_RE.sub("", numbers)
+    if decimal == "comma":
+        numbers = _COMMA_GROUPING_RE.sub("", numbers).replace(",", ".")
+    else:
+        numbers = _DOT_GROUPING_RE.sub("", numbers)
+    digits = np.array(numbers.split("\n"))
+    out = np.full(len(texts), np.nan)
+    present = digits != ""
+    try:
+        out[present] = digits[present].astype(np.float64)
+    except ValueError:
+        # Something like "1.2.3"; only then convert one at a time
+        for i in np.flatnonzero(present):
+            try:
+                out[i] = float(digits[i])
+            except ValueError:
+                pass
+    dashes = np.isin(np.array(texts), _DASHES)
+    out[dashes] = 0.0
+    return out
+
+
+def numeric_values(texts: Sequence[str], formats: Sequence[Optional[str]],
+                   scales: Sequence[Optional[str]], signs: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    Bulk number_value(): float64 per fact, NaN where a fact is not a number
+    Facts are grouped by format; each dot- or comma-decimal group is converted
+    in one pass, other number formats fact by fact.
+    """
+    out = np.full(len(texts), np.nan)
+    if not len(texts):
+        return out
+    by_format: Dict[Optional[str], List[int]] = {}
+    for i, fmt in enumerate(formats):
+        by_format.setdefault(fmt, []).append(i)
+    for fmt, positions in by_format.items():
+        transform = resolve_format(fmt)
+        if transform is None or transform.kind != "number":
+            continue
+        if transform.grouping:
+            out[positions] = _bulk_numbers([texts[i] for i in positions], transform.grouping)
+        else:
+            out[positions] = np.array([number_value(fmt, texts[i]) for i in positions], dtype=np.float64)
+
+    # Scale: one exponent per distinct scale attribute; an unreadable scale makes the fact unusable
+    exponents = {}
+    for scale in set(scales):
+        try:
+            exponents[scale] = int(scale) if scale else 0
+        except ValueError:
+            exponents[scale] = np.nan
+    powers = np.array([exponents[scale] for scale in scales], dtype=np.float64)
+    scaled = powers != 0
+    out[scaled] *= 10.0 ** powers[scaled]
+    negative = np.array([sign == "-" for sign in signs], dtype=bool)
+    out[negative] = -out[negative]
+    return out
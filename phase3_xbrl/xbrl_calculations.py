@@ -0,0 +1,221 @@
+"""
+Vectorized XBRL calculation rules
+Purpose: Check summations and equalities across every context of every filing at once
+Scenario: Validate a filing season locally, without asking the model to do arithmetic
+
+Rules are data: a total concept and weighted item concepts (weight 1 adds,
+-1 subtracts; an equality is a rule with one item). Facts are bound as in
+XBRL calculations: a rule is checked for each (filing, context, unit) that
+reports the total and at least one item, and missing items count as zero.
+
+Every binding of every filing becomes one row of a float64 matrix with a column
+per concept the rules use, so each rule is evaluated as a handful of NumPy
+operations over all rows together. Tolerance comes from decimals: each fact
+is only accurate to half a unit of its last reported digit (0.5 x 10^-decimals,
+0 for INF), so a total is consistent when it is within the sum of those half
+units of the computed value.
+"""
+
+import json
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ixbrl_facts import iter_ixbrl_facts, numeric_value
+
+
+class CalcRule(NamedTuple):
+    """total = sum(weight * item) for the concepts reported in one context and unit"""
+    name: str
+    total: str
+    items: Tuple[Tuple[str, float], ...]  # (concept, weight)
+
+
+def summation(name: str, total: str, *items: str) -> CalcRule:
+    """Rule total = item1 + item2 ...; prefix an item with "-" to subtract it"""
+    return CalcRule(name, total, tuple(
+        (item[1:], -1.0) if item.startswith("-") else (item, 1.0) for item in items))
+
+
+# The line items of the primary statements in the Phase 3 examples. Real filings
+# define their own relationships in the calculation linkbase; pass those as a
+# rules file (see load_rules) instead.
+DEFAULT_RULES = [
+    summation("Current assets", "us-gaap:AssetsCurrent",
+              "us-gaap:CashAndCashEquivalentsAtCarryingValue", "us-gaap:AccountsReceivableNetCurrent",
+              "us-gaap:InventoryNet"),
+    summation("Total assets", "us-gaap:Assets", "us-gaap:AssetsCurrent", "us-gaap:PropertyPlantAndEquipmentNet"),
+    summation("Current liabilities", "us-gaap:LiabilitiesCurrent",
+              "us-gaap:AccountsPayableCurrent", "us-gaap:AccruedLiabilitiesCurrent"),
+    summation("Total liabilities", "us-gaap:Liabilities", "us-gaap:LiabilitiesCurrent", "us-gaap:LongTermDebt"),
+    summation("Liabilities and equity", "us-gaap:LiabilitiesAndStockholdersEquity",
+              "us-gaap:Liabilities", "us-gaap:StockholdersEquity"),
+    summation("Balance sheet balances", "us-gaap:Assets", "us-gaap:LiabilitiesAndStockholdersEquity"),
+    summation("Gross profit", "us-gaap:GrossProfit",
+              "us-gaap:RevenueFromContractWithCustomerExcludingAssessedTax", "-us-gaap:CostOfRevenue"),
+]
+
+
+def load_rules(rules_file: str) -> List[CalcRule]:
+    """
+    Rules from a JSON file:
+        [{"name": "...", "total": "us-gaap:Assets", "items": {"us-gaap:AssetsCurrent": 1, ...}}, ...]
+    """
+    with open(rules_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [CalcRule(rule["name"], rule["total"], tuple((concept, float(weight))
+                                                        for concept, weight in rule["items"].items()))
+            for rule in data]
+
+
+def rules_to_json(rules: Iterable[CalcRule]) -> list:
+    """Rules in the load_rules file format"""
+    return [{"name": rule.name, "total": rule.total, "items": dict(rule.items)} for rule in rules]
+
+
+def half_unit(decimals: Optional[str]) -> float:
+    """Rounding uncertainty of a value reported to `decimals` (0 when exact or not given)"""
+    if not decimals or decimals.upper() == "INF":
+        return 0.0
+    try:
+        return 0.5 * 10.0 ** -int(decimals)
+    except ValueError:
+        return 0.0
+
+
+class FilingFacts(NamedTuple):
+    """The facts of one filing that rules use, as parallel arrays"""
+    filing: str
+    bindings: List[Tuple[str, str]]  # (context_ref, unit_ref) per binding index
+    binding_index: np.ndarray        # int32, the binding of each fact
+    concept_index: np.ndarray        # int32, index into the rule concepts
+    values: np.ndarray               # float64
+    half_units: np.ndarray           # float64
+    duplicates: int                  # facts repeating a (context, unit, concept) already seen
+
+
+def rule_concepts(rules: Iterable[CalcRule]) -> List[str]:
+    """Every concept the rules mention, in first-use order"""
+    concepts = {}
+    for rule in rules:
+        concepts.setdefault(rule.total, len(concepts))
+        for concept, _ in rule.items:
+            concepts.setdefault(concept, len(concepts))
+    return list(concepts)
+
+
+def extract_filing_facts(ixbrl_file: str, concepts: List[str]) -> FilingFacts:
+    """Stream a filing and keep the numeric facts of the given concepts"""
+    concept_codes = {concept: code for code, concept in enumerate(concepts)}
+    binding_codes = {}
+    seen = set()
+    duplicates = 0
+    binding_index, concept_index, values, half_units = [], [], [], []
+    for fact in iter_ixbrl_facts(ixbrl_file):
+        code = concept_codes.get(fact.name)
+        if code is None:
+            continue
+        value = numeric_value(fact)
+        if value is None:
+            continue
+        binding = (fact.context_ref or "", fact.unit_ref or "")
+        binding_code = binding_codes.setdefault(binding, len(binding_codes))
+        # iXBRL documents often display the same fact twice; the first one is used
+        if (binding_code, code) in seen:
+            duplicates += 1
+            continue
+        seen.add((binding_code, code))
+        binding_index.append(binding_code)
+        concept_index.append(code)
+        values.append(value)
+        half_units.append(half_unit(fact.decimals))
+    return FilingFacts(
+        ixbrl_file, list(binding_codes),
+        np.array(binding_index, dtype=np.int32), np.array(concept_index, dtype=np.int32),
+        np.array(values, dtype=np.float64), np.array(half_units, dtype=np.float64), duplicates,
+    )
+
+
+class RuleFailure(NamedTuple):
+    """One inconsistent binding of a rule"""
+    filing: str
+    rule: str
+    context_ref: str
+    unit_ref: str
+    total: float
+    computed: float
+    difference: float
+    tolerance: float
+
+
+class CalcResults(NamedTuple):
+    """Outcome of evaluating rules over a batch of filings"""
+    filings: List[str]
+    rules: List[CalcRule]
+    checked: np.ndarray   # (filings, rules) bindings where the rule applied
+    failed: np.ndarray    # (filings, rules) of those, the inconsistent ones
+    failures: List[RuleFailure]
+    duplicates: np.ndarray  # per filing
+
+    def filing_summary(self, i: int) -> Dict[str, int]:
+        return {"checked": int(self.checked[i].sum()), "failed": int(self.failed[i].sum()),
+                "duplicates": int(self.duplicates[i])}
+
+
+def evaluate_rules(batch: List[FilingFacts], rules: List[CalcRule], concepts: List[str]) -> CalcResults:
+    """Evaluate every rule over every binding of every filing in the batch"""
+    # Stack all filings: row = global binding, column = concept
+    offsets = np.cumsum([0] + [len(filing.bindings) for filing in batch])
+    rows = int(offsets[-1])
+    row_filing = np.repeat(np.arange(len(batch), dtype=np.int32), np.diff(offsets))
+    fact_rows = np.concatenate(
+        [filing.binding_index + offsets[i] for i, filing in enumerate(batch)] or [[]]).astype(np.intp)
+    fact_columns = np.concatenate([filing.concept_index for filing in batch] or [[]]).astype(np.intp)
+    values = np.full((rows, len(concepts)), np.nan)
+    values[fact_rows, fact_columns] = np.concatenate([filing.values for filing in batch] or [[]])
+    half_units = np.zeros((rows, len(concepts)))
+    half_units[fact_rows, fact_columns] = np.concatenate([filing.half_units for filing in batch] or [[]])
+
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    concept_codes = {concept: code for code, concept in enumerate(concepts)}
+    checked = np.zeros((len(batch), len(rules)), dtype=np.int64)
+    failed = np.zeros((len(batch), len(rules)), dtype=np.int64)
+    failures = []
+
+    for r, rule in enumerate(rules):
+        total = concept_codes[rule.total]
+        items = np.array([concept_codes[concept] for concept, _ in rule.items])
+        weights = np.array([weight for _, weight in rule.items])
+
+        bound = present[:, total] & present[:, items].any(axis=1)
+        computed = filled[:, items] @ weights
+        difference = filled[:, total] - computed
+        tolerance = half_units[:, total] + half_units[:, items] @ np.abs(weights)
+        # A small relative slack absorbs float64 rounding of large exact (INF) values
+        inconsistent = bound & (np.abs(difference) > tolerance + 1e-9 * np.abs(filled[:, total]))
+
+        checked[:, r] = np.bincount(row_filing[bound], minlength=len(batch))
+        failed[:, r] = np.bincount(row_filing[inconsistent], minlength=len(batch))
+        for row in np.flatnonzero(inconsistent):
+            i = row_filing[row]
+            context_ref, unit_ref = batch[i].bindings[row - offsets[i]]
+            failures.append(RuleFailure(batch[i].filing, rule.name, context_ref, unit_ref,
+                                        float(filled[row, total]), float(computed[row]),
+                                        float(difference[row]), float(tolerance[row])))
+
+    return CalcResults([filing.filing for filing in batch], list(rules), checked, failed, failures,
+                       np.array([filing.duplicates for filing in batch], dtype=np.int64))
+
+
+def results_to_dict(results: CalcResults) -> dict:
+    """JSON-ready report of a batch"""
+    return {
+        "filings": [
+            {"filing": filing, **results.filing_summary(i),
+             "rules": {rule.name: {"checked": int(results.checked[i, r]), "failed": int(results.failed[i, r])}
+                       for r, rule in enumerate(results.rules) if results.checked[i, r]}}
+            for i, filing in enumerate(results.filings)
+        ],
+        "failures": [failure._asdict() for failure in results.failures],
+    }
@@ -0,0 +1,288 @@
+"""
+Persistent SQLite XBRL fact database
+Purpose: Parse each filing once and answer later questions from an indexed database
+Scenario: "InventoryNet for this client for the last five years" without re-reading any HTML
+
+Ingest streams a filing's facts, contexts and units into SQLite. Each filing is
+keyed by the SHA-256 of its content, so re-ingesting an unchanged file (under
+any name) is a no-op. Facts carry their entity, period and dimensional flag,
+so the (concept, period_end, entity) index answers concept history queries
+directly, and (context, unit) serves lookups by binding.
+
+Usage:
+    python xbrl_fact_db.py ingest filings/ --db xbrl_facts.sqlite
+    python xbrl_fact_db.py query us-gaap:InventoryNet --entity 0000000000 --periods 5
+    python xbrl_fact_db.py info
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional
+
+from ixbrl_facts import XbrlResources, find_filings, iter_ixbrl_facts
+from ixbrl_transforms import numeric_values
+
+DEFAULT_DB = "xbrl_facts.sqlite"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS filings (
+    filing_id     INTEGER PRIMARY KEY,
+    content_hash  TEXT NOT NULL UNIQUE,
+    source_path   TEXT NOT NULL,
+    entity        TEXT,
+    fact_count    INTEGER NOT NULL,
+    ingested_at   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contexts (
+    context_pk    INTEGER PRIMARY KEY,
+    filing_id     INTEGER NOT NULL REFERENCES filings(filing_id) ON DELETE CASCADE,
+    context_id    TEXT NOT NULL,
+    entity        TEXT,
+    period_start  TEXT,
+    period_end    TEXT,
+    period_days   INTEGER,
+    dimensions    TEXT,
+    UNIQUE (filing_id, context_id)
+);
+CREATE TABLE IF NOT EXISTS units (
+    unit_pk       INTEGER PRIMARY KEY,
+    filing_id     INTEGER NOT NULL REFERENCES filings(filing_id) ON DELETE CASCADE,
+    unit_id       TEXT NOT NULL,
+    measure       TEXT,
+    UNIQUE (filing_id, unit_id)
+);
+CREATE TABLE IF NOT EXISTS facts (
+    fact_pk       INTEGER PRIMARY KEY,
+    filing_id     INTEGER NOT NULL REFERENCES filings(filing_id) ON DELETE CASCADE,
+    concept       TEXT NOT NULL,
+    context_pk    INTEGER REFERENCES contexts(context_pk),
+    unit_pk       INTEGER REFERENCES units(unit_pk),
+    entity        TEXT,
+    period_end    TEXT,
+    period_days   INTEGER,
+    dimensional   INTEGER NOT NULL,
+    value         TEXT,
+    numeric_value REAL,
+    decimals      TEXT,
+    scale         TEXT,
+    sign          TEXT,
+    format        TEXT,
+    fact_type     TEXT NOT NULL,
+    fact_id       TEXT
+);
+CREATE INDEX IF NOT EXISTS facts_concept_period_entity ON facts (concept, period_end, entity);
+CREATE INDEX IF NOT EXISTS facts_context_unit ON facts (context_pk, unit_pk);
+CREATE INDEX IF NOT EXISTS facts_filing ON facts (filing_id);
+"""
+
+
+class IngestResult(NamedTuple):
+    """Outcome of ingesting one filing"""
+    source_path: str
+    status: str  # "ingested", "unchanged" (content already in the database) or "error"
+    filing_id: Optional[int]
+    facts: int
+    seconds: float
+    error: Optional[str] = None
+
+
+class FactRow(NamedTuple):
+    """One fact from a query"""
+    concept: str
+    entity: str
+    period_end: str
+    period_days: int
+    value: Optional[float]
+    displayed: str
+    decimals: Optional[str]
+    unit: Optional[str]
+    source_path: str
+
+
+def connect(db_file: str = DEFAULT_DB) -> sqlite3.Connection:
+    """Open (creating if needed) a fact database"""
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return conn
+
+
+def content_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ingest_filing(conn: sqlite3.Connection, ixbrl_file: str) -> IngestResult:
+    """Ingest one filing in a single transaction; a no-op if its content is already there"""
+    start = time.perf_counter()
+    digest = content_hash(ixbrl_file)
+    row = conn.execute("SELECT filing_id FROM filings WHERE content_hash = ?", (digest,)).fetchone()
+    if row:
+        return IngestResult(ixbrl_file, "unchanged", row[0], 0, time.perf_counter() - start)
+
+    resources = XbrlResources()
+    facts = list(iter_ixbrl_facts(ixbrl_file, include_non_numeric=True, resources=resources))
+    # ix:nonNumeric facts never have a number, whatever their format
+    numbers = numeric_values([fact.value for fact in facts],
+                             [fact.format if fact.fact_type == "nonFraction" else "" for fact in facts],
+                             [fact.scale for fact in facts], [fact.sign for fact in facts])
+    numbers = [None if number != number else number for number in numbers.tolist()]  # NaN -> NULL
+    entity = next((context.entity for context in resources.contexts if context.entity), None)
+
+    with conn:
+        filing_id = conn.execute(
+            "INSERT INTO filings (content_hash, source_path, entity, fact_count, ingested_at) VALUES (?, ?, ?, ?, ?)",
+            (digest, os.path.abspath(ixbrl_file), entity, len(facts),
+             datetime.now(timezone.utc).isoformat(timespec="seconds")),
+        ).lastrowid
+
+        context_rows = {}
+        for context_id, code in resources.context_codes.items():
+            context = resources.contexts[code]
+            period_start = context.start.isoformat() if context.start else None
+            period_end = context.end.isoformat() if context.end else None
+            pk = conn.execute(
+                "INSERT INTO contexts (filing_id, context_id, entity, period_start, period_end, period_days, "
+                "dimensions) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (filing_id, context_id, context.entity, period_start, period_end, context.days,
+                 json.dumps(dict(context.dimensions)) if context.dimensions else None),
+            ).lastrowid
+            context_rows[context_id] = (pk, context.entity, period_end, context.days, int(bool(context.dimensions)))
+        unit_pks = {
+            unit_id: conn.execute("INSERT INTO units (filing_id, unit_id, measure) VALUES (?, ?, ?)",
+                                  (filing_id, unit_id, resources.units[code].measure)).lastrowid
+            for unit_id, code in resources.unit_codes.items()
+        }
+
+        # Context columns are copied onto each fact so history queries need no join
+        no_context = (None, None, None, None, 0)
+        conn.executemany(
+            "INSERT INTO facts (filing_id, concept, unit_pk, context_pk, entity, period_end, period_days, "
+            "dimensional, value, numeric_value, decimals, scale, sign, format, fact_type, fact_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (filing_id, fact.name, unit_pks.get(fact.unit_ref), *context_rows.get(fact.context_ref, no_context),
+                 fact.value, number, fact.decimals, fact.scale, fact.sign, fact.format, fact.fact_type, fact.fact_id)
+                for fact, number in zip(facts, numbers)
+            ),
+        )
+    return IngestResult(ixbrl_file, "ingested", filing_id, len(facts), time.perf_counter() - start)
+
+
+def ingest_filings(conn: sqlite3.Connection, filings: List[str]) -> List[IngestResult]:
+    """Ingest many filings; one bad file is reported and does not stop the rest"""
+    results = []
+    for ixbrl_file in filings:
+        try:
+            results.append(ingest_filing(conn, ixbrl_file))
+        except (OSError, sqlite3.DatabaseError, KeyError) as e:
+            results.append(IngestResult(ixbrl_file, "error", None, 0, 0.0, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def concept_history(conn: sqlite3.Connection, concept: str, entity: Optional[str] = None,
+                    periods: Optional[int] = None) -> List[FactRow]:
+    """
+    One value per period end for a concept (consolidated facts only), newest first
+    When several filings report the same period (comparatives, restatements), the most
+    recently ingested one wins; of durations ending on the same date, the longest does
+    """
+    query = """
+        SELECT f.concept, f.entity, f.period_end, f.period_days, f.numeric_value, f.value, f.decimals,
+               u.measure, g.source_path
+        FROM facts f
+        JOIN filings g ON g.filing_id = f.filing_id
+        LEFT JOIN units u ON u.unit_pk = f.unit_pk
+        WHERE f.concept = ? AND f.dimensional = 0 AND f.period_end IS NOT NULL
+    """
+    params = [concept]
+    if entity is not None:
+        query += " AND f.entity = ?"
+        params.append(entity)
+    query += " ORDER BY f.period_end DESC, f.period_days DESC, f.filing_id DESC"
+
+    history, seen, per_entity = [], set(), {}
+    for row in conn.execute(query, params):
+        fact = FactRow(*row)
+        if (fact.entity, fact.period_end) in seen:
+            continue
+        if periods and per_entity.get(fact.entity, 0) >= periods:
+            if entity is not None:
+                break
+            continue
+        seen.add((fact.entity, fact.period_end))
+        per_entity[fact.entity] = per_entity.get(fact.entity, 0) + 1
+        history.append(fact)
+    return history
+
+
+def print_database_info(conn: sqlite3.Connection):
+    """Counts per table, entities and the covered period range"""
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in ("filings", "contexts", "units", "facts")}
+    entities = conn.execute("SELECT COUNT(DISTINCT entity) FROM filings").fetchone()[0]
+    first, last = conn.execute("SELECT MIN(period_end), MAX(period_end) FROM contexts").fetchone()
+    print(f"Filings: {counts['filings']}   Entities: {entities}   Facts: {counts['facts']:,}")
+    print(f"Contexts: {counts['contexts']:,}   Units: {counts['units']:,}   Periods: {first} .. {last}")
+
+
+if __name__ == "__main__":
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=DEFAULT_DB, help=f"Database file (default: {DEFAULT_DB})")
+    parser = argparse.ArgumentParser(description="Persistent SQLite database of iXBRL facts")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = commands.add_parser("ingest", parents=[common],
+                                        help="Parse filings into the database (unchanged files are skipped)")
+    ingest_parser.add_argument("targets", nargs="+", help="iXBRL files, directories or glob patterns")
+    query_parser = commands.add_parser("query", parents=[common], help="A concept's value per period, newest first")
+    query_parser.add_argument("concept", help="e.g. us-gaap:InventoryNet")
+    query_parser.add_argument("--entity", help="Entity identifier (e.g. CIK)")
+    query_parser.add_argument("--periods", type=int, default=None, help="Only the latest N periods per entity")
+    commands.add_parser("info", parents=[common], help="Database summary")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == "ingest":
+        filings = find_filings(args.targets)
+        if not filings:
+            print(f"✗ No iXBRL filings found in: {', '.join(args.targets)}")
+            sys.exit(1)
+        start = time.perf_counter()
+        results = ingest_filings(conn, filings)
+        for result in results:
+            if result.status == "error":
+                print(f"  ✗ {result.source_path}: {result.error}")
+        by_status = {}
+        for result in results:
+            by_status[result.status] = by_status.get(result.status, 0) + 1
+        print(f"✓ {by_status.get('ingested', 0)} ingested, {by_status.get('unchanged', 0)} unchanged, "
+              f"{by_status.get('error', 0)} failed ({sum(r.facts for r in results):,} facts) "
+              f"in {time.perf_counter() - start:.2f}s -> {args.db}")
+    elif args.command == "query":
+        start = time.perf_counter()
+        history = concept_history(conn, args.concept, args.entity, args.periods)
+        elapsed = time.perf_counter() - start
+        if not history:
+            print(f"✗ No consolidated facts for {args.concept}")
+        for fact in history:
+            value = f"{fact.value:,.0f}" if fact.value is not None else fact.displayed
+            print(f"  {fact.period_end}  {fact.entity:<12} {value:>18} {fact.unit or '':<14} "
+                  f"{os.path.basename(fact.source_path)}")
+        print(f"\n{len(history)} value(s) in {elapsed * 1000:.1f} ms")
+    else:
+        print_database_info(conn)
+    conn.close()
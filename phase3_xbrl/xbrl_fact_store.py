@@ -0,0 +1,244 @@
+"""
+Columnar XBRL fact store
+Purpose: Hold the numeric facts of thousands of filings as contiguous NumPy arrays
+Scenario: Ratio analytics and peer benchmarking across a client portfolio, with no model call
+
+Each fact is one position in parallel arrays: filing, concept and context codes
+(int32), period end (datetime64[D]), period length in days (0 for instants)
+and value (float64). Concept names are interned to integer codes once, so
+selecting a concept is an integer comparison over an array, not a string
+match per fact. Contexts are coded per filing, with their entity, period and
+whether they carry dimensions.
+
+compute_ratios() pivots the store once and evaluates every ratio for every
+(filing, period end) in the same vectorized pass.
+"""
+
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from ixbrl_facts import Context, XbrlResources, iter_ixbrl_facts
+from ixbrl_transforms import numeric_values
+
+NO_DATE = np.datetime64("NaT", "D")
+# Facts whose contextRef is not defined have no entity or period
+UNDEFINED_CONTEXT = Context("", None, None)
+
+
+class Ratio(NamedTuple):
+    """numerator / denominator (x scale) from facts of the same period"""
+    name: str
+    numerator: str
+    denominator: str
+    scale: float = 1.0
+
+
+# The ratios the Example 7 analysis prompt asks the model for
+STANDARD_RATIOS = [
+    Ratio("current_ratio", "us-gaap:AssetsCurrent", "us-gaap:LiabilitiesCurrent"),
+    Ratio("debt_to_equity", "us-gaap:LongTermDebt", "us-gaap:StockholdersEquity"),
+    Ratio("gross_margin_pct", "us-gaap:GrossProfit",
+          "us-gaap:RevenueFromContractWithCustomerExcludingAssessedTax", 100.0),
+    Ratio("net_margin_pct", "us-gaap:NetIncomeLoss",
+          "us-gaap:RevenueFromContractWithCustomerExcludingAssessedTax", 100.0),
+]
+
+
+class FilingColumns(NamedTuple):
+    """One filing's facts and contexts as columns (built in a worker process)"""
+    filing: str
+    concepts: List[str]
+    context_ids: List[str]
+    context_entities: List[str]
+    context_ends: List[Optional[date]]
+    context_days: List[int]
+    context_dimensional: List[bool]
+    fact_concepts: List[int]   # index into concepts
+    fact_contexts: List[int]   # index into context_ids
+    fact_values: List[float]
+
+
+def read_filing_columns(ixbrl_file: str) -> FilingColumns:
+    """Stream one filing's numeric facts into columns (displayed values converted in bulk)"""
+    resources = XbrlResources()
+    facts = list(iter_ixbrl_facts(ixbrl_file, resources=resources))
+    numbers = numeric_values([fact.value for fact in facts], [fact.format for fact in facts],
+                             [fact.scale for fact in facts], [fact.sign for fact in facts])
+    concept_codes = {}
+    context_codes = {}
+    fact_concepts, fact_contexts = [], []
+    known = ~np.isnan(numbers)
+    for i in np.flatnonzero(known).tolist():
+        fact = facts[i]
+        fact_concepts.append(concept_codes.setdefault(fact.name, len(concept_codes)))
+        fact_contexts.append(context_codes.setdefault(fact.context_ref or "", len(context_codes)))
+    fact_values = numbers[known].tolist()
+
+    ends, days, entities, dimensional = [], [], [], []
+    for context_id in context_codes:
+        context = resources.context(context_id) or UNDEFINED_CONTEXT
+        ends.append(context.end)
+        days.append(context.days or 0)
+        entities.append(context.entity)
+        dimensional.append(bool(context.dimensions))
+    return FilingColumns(ixbrl_file, list(concept_codes), list(context_codes), entities, ends, days,
+                         dimensional, fact_concepts, fact_contexts, fact_values)
+
+
+class FactStore:
+    """Numeric facts of many filings as parallel arrays, with interned concept codes"""
+
+    def __init__(self):
+        self.filings: List[str] = []
+        self.entities: List[str] = []
+        self.concepts: List[str] = []
+        self.concept_codes: Dict[str, int] = {}
+        # Per fact
+        self.filing = np.empty(0, dtype=np.int32)
+        self.concept = np.empty(0, dtype=np.int32)
+        self.context = np.empty(0, dtype=np.int32)
+        self.period_end = np.empty(0, dtype="datetime64[D]")
+        self.period_days = np.empty(0, dtype=np.int32)
+        self.dimensional = np.empty(0, dtype=bool)
+        self.value = np.empty(0, dtype=np.float64)
+        # Per context (codes are unique across the store)
+        self.context_ids: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    def concept_code(self, concept: str) -> int:
+        """Integer code of a concept name (-1 if no fact uses it)"""
+        return self.concept_codes.get(concept, -1)
+
+    def intern(self, concept: str) -> int:
+        code = self.concept_codes.get(concept)
+        if code is None:
+            code = self.concept_codes[concept] = len(self.concepts)
+            self.concepts.append(concept)
+        return code
+
+    def add_filings(self, batch: Iterable[FilingColumns]):
+        """Append filings; arrays are concatenated once for the whole batch"""
+        columns = {name: [] for name in ("filing", "concept", "context", "period_end", "period_days",
+                                         "dimensional", "value")}
+        for filing in batch:
+            filing_code = len(self.filings)
+            self.filings.append(filing.filing)
+            self.entities.append(next((entity for entity in filing.context_entities if entity), ""))
+
+            concept_map = np.array([self.intern(concept) for concept in filing.concepts] or [0], dtype=np.int32)
+            context_base = len(self.context_ids)
+            self.context_ids.extend(filing.context_ids)
+            local_contexts = np.array(filing.fact_contexts, dtype=np.int32)
+            ends = np.array([end or NO_DATE for end in filing.context_ends] or [NO_DATE], dtype="datetime64[D]")
+            days = np.array(filing.context_days or [0], dtype=np.int32)
+            dimensional = np.array(filing.context_dimensional or [False], dtype=bool)
+
+            columns["filing"].append(np.full(len(local_contexts), filing_code, dtype=np.int32))
+            columns["concept"].append(concept_map[np.array(filing.fact_concepts, dtype=np.int32)])
+            columns["context"].append(local_contexts + context_base)
+            columns["period_end"].append(ends[local_contexts])
+            columns["period_days"].append(days[local_contexts])
+            columns["dimensional"].append(dimensional[local_contexts])
+            columns["value"].append(np.array(filing.fact_values, dtype=np.float64))
+
+        for name, parts in columns.items():
+            if parts:
+                setattr(self, name, np.concatenate([getattr(self, name)] + parts))
+
+    @classmethod
+    def from_filings(cls, filings: List[str]) -> "FactStore":
+        store = cls()
+        store.add_filings(read_filing_columns(filing) for filing in filings)
+        return store
+
+    def select(self, concept: str) -> np.ndarray:
+        """Positions of every fact of a concept"""
+        return np.flatnonzero(self.concept == self.concept_code(concept))
+
+
+class RatioTable(NamedTuple):
+    """One row per (filing, period end); one float64 column per ratio (NaN where not computable)"""
+    filing: np.ndarray       # int32 filing code
+    period_end: np.ndarray   # datetime64[D]
+    ratios: Dict[str, np.ndarray]
+
+    def latest(self) -> np.ndarray:
+        """Row index of each filing's most recent period"""
+        order = np.lexsort((self.period_end, self.filing))
+        if not len(order):
+            return order
+        last = np.r_[self.filing[order][1:] != self.filing[order][:-1], True]
+        return order[last]
+
+
+def compute_ratios(store: FactStore, ratios: List[Ratio] = STANDARD_RATIOS) -> RatioTable:
+    """Every ratio for every (filing, period end) of the store in one vectorized pass"""
+    concepts = sorted({store.concept_code(concept) for ratio in ratios
+                       for concept in (ratio.numerator, ratio.denominator)} - {-1})
+    # Concept code -> pivot column; the extra last slot makes code -1 (unknown concept) map to -1
+    column_of = np.full(len(store.concepts) + 1, -1, dtype=np.int64)
+    column_of[concepts] = np.arange(len(concepts))
+    width = max(len(concepts), 1)
+
+    # Consolidated facts of the concepts the ratios use, with a known period end
+    mask = np.isin(store.concept, concepts) & ~store.dimensional & ~np.isnat(store.period_end)
+    filing = store.filing[mask]
+    period_end = store.period_end[mask]
+    days = store.period_days[mask]
+    columns = column_of[store.concept[mask]]
+    values = store.value[mask]
+
+    # Rows are (filing, period end). Durations ending on the same date (a quarter and the
+    # year to date) compete for the same cell; the longest one is kept
+    end_days = period_end.astype(np.int64)
+    row_key = filing.astype(np.int64) << 32 | (end_days - (end_days.min() if len(end_days) else 0))
+    row_keys, rows = np.unique(row_key, return_inverse=True)
+    cell = rows * width + columns
+    longest = np.zeros(len(row_keys) * width, dtype=np.int64)
+    np.maximum.at(longest, cell, days)
+    keep = days == longest[cell]
+
+    pivot = np.full((len(row_keys), len(concepts)), np.nan)
+    pivot[rows[keep], columns[keep]] = values[keep]
+
+    # Any fact of a row gives its filing and period end
+    representative = np.zeros(len(row_keys), dtype=np.int64)
+    representative[rows] = np.arange(len(rows))
+    results = {}
+    for ratio in ratios:
+        numerator_column = column_of[store.concept_code(ratio.numerator)]
+        denominator_column = column_of[store.concept_code(ratio.denominator)]
+        if numerator_column < 0 or denominator_column < 0:
+            results[ratio.name] = np.full(len(row_keys), np.nan)
+            continue
+        numerator = pivot[:, numerator_column]
+        denominator = pivot[:, denominator_column]
+        out = np.full(len(row_keys), np.nan)
+        np.divide(numerator, denominator, out=out, where=(denominator != 0) & ~np.isnan(denominator))
+        results[ratio.name] = out * ratio.scale
+    return RatioTable(filing[representative], period_end[representative], results)
+
+
+def benchmark(table: RatioTable, rows: Optional[np.ndarray] = None) -> Dict[str, dict]:
+    """Quartiles of each ratio across filings, and each filing's percentile rank"""
+    rows = table.latest() if rows is None else rows
+    summary = {}
+    for name, column in table.ratios.items():
+        values = column[rows]
+        known = ~np.isnan(values)
+        ranks = np.full(len(values), np.nan)
+        if known.any():
+            # Average ranks: tied values share one percentile
+            peers = np.sort(values[known])
+            middle = (np.searchsorted(peers, values[known], 'left') + np.searchsorted(peers, values[known], 'right')) / 2
+            ranks[known] = middle / known.sum() * 100
+            q1, median, q3 = np.percentile(values[known], [25, 50, 75])
+        else:
+            q1 = median = q3 = np.nan
+        summary[name] = {"count": int(known.sum()), "q1": float(q1), "median": float(median),
+                         "q3": float(q3), "percentile_rank": ranks}
+    return summary
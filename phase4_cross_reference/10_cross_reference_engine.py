@@ -0,0 +1,143 @@
+"""
+Phase 4, Example 10: Cross-Reference Engine
+Purpose: Link audit procedures to the XBRL facts they test
+Scenario: Which reported facts has the audit program covered, which has it missed,
+          and which procedures point at elements the filing does not contain?
+
+The checklist's xbrl_refs are indexed once (element -> procedures, with the
+same build_ref_index() the workpaper and validation tools use), then the
+facts streamed out of the iXBRL document are hash-joined against that index in
+a single pass. Time is linear in procedures + facts, so 10k-fact filings and
+100k-procedure checklists take under a second.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, NamedTuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audit_utils import load_example_module
+from audit_utils.examples import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "phase3_xbrl"))
+from ixbrl_facts import IxbrlFact, fact_to_dict, iter_ixbrl_facts
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "phase2_structured_data"))
+from checklist_refs import ChecklistRef, build_ref_index
+from checklist_snapshot import load_checklist
+
+
+class CrossReference(NamedTuple):
+    """Result of joining checklist refs against a filing's facts"""
+    tested_facts: List[IxbrlFact]        # facts whose element at least one procedure references
+    untested_facts: List[IxbrlFact]      # facts no procedure references
+    dangling_refs: Dict[str, list]       # element -> ChecklistRefs, for elements not in the filing
+    ref_index: Dict[str, list]           # element -> ChecklistRefs, for every referenced element
+
+    def procedures_for(self, fact: IxbrlFact) -> list:
+        """The ChecklistRefs testing a fact"""
+        return self.ref_index.get(fact.name, [])
+
+    @property
+    def fact_coverage(self) -> float:
+        total = len(self.tested_facts) + len(self.untested_facts)
+        return len(self.tested_facts) / total * 100 if total else 0.0
+
+
+def cross_reference(ref_index: Dict[str, list], facts: Iterable[IxbrlFact]) -> CrossReference:
+    """Hash-join facts against the ref index in one pass over the facts"""
+    tested, untested = [], []
+    seen_elements = set()
+    for fact in facts:
+        if fact.name in ref_index:
+            tested.append(fact)
+            seen_elements.add(fact.name)
+        else:
+            untested.append(fact)
+    dangling = {element: refs for element, refs in ref_index.items() if element not in seen_elements}
+    return CrossReference(tested, untested, dangling, ref_index)
+
+
+def cross_reference_filing(checklist: dict, ixbrl_file: str) -> CrossReference:
+    """Cross-reference a checklist against the facts streamed from an iXBRL file"""
+    return cross_reference(build_ref_index(checklist["audit_engagement"]), iter_ixbrl_facts(ixbrl_file, include_non_numeric=True))
+
+
+def cross_reference_to_dict(result: CrossReference) -> dict:
+    """JSON-ready form of a cross-reference result"""
+    return {
+        "summary": {
+            "tested_facts": len(result.tested_facts),
+            "untested_facts": len(result.untested_facts),
+            "dangling_refs": len(result.dangling_refs),
+            "fact_coverage_percent": round(result.fact_coverage, 1),
+        },
+        "tested_facts": [
+            dict(fact_to_dict(fact), procedures=[ref.procedure_id for ref in result.procedures_for(fact)])
+            for fact in result.tested_facts
+        ],
+        "untested_facts": [fact_to_dict(fact) for fact in result.untested_facts],
+        "dangling_refs": {
+            element: [ref._asdict() for ref in refs] for element, refs in sorted(result.dangling_refs.items())
+        },
+    }
+
+
+def print_cross_reference_report(result: CrossReference):
+    """Print tested facts, untested facts and dangling refs"""
+    print("\n" + "="*60)
+    print("XBRL CROSS-REFERENCE REPORT")
+    print("="*60)
+    print(f"Facts tested by at least one procedure: {len(result.tested_facts)}")
+    print(f"Facts not tested: {len(result.untested_facts)}")
+    print(f"Fact coverage: {result.fact_coverage:.1f}%")
+    print(f"Dangling references: {len(result.dangling_refs)}")
+
+    if result.tested_facts:
+        print("\n✓ Tested facts:")
+        for fact in result.tested_facts:
+            procs = ", ".join(f"{ref.procedure_id} ({ref.status})" for ref in result.procedures_for(fact))
+            print(f"  {fact.name:<60} {fact.value:>15}  [{fact.context_ref}]  <- {procs}")
+
+    if result.untested_facts:
+        print("\n✗ Untested facts (audit gaps):")
+        for fact in result.untested_facts:
+            print(f"  {fact.name:<60} {fact.value:>15}  [{fact.context_ref}]")
+
+    if result.dangling_refs:
+        print("\n⚠ Procedures referencing elements not in the filing:")
+        for element, refs in sorted(result.dangling_refs.items()):
+            print(f"  {element}  <- {', '.join(ref.procedure_id for ref in refs)}")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-reference an audit checklist against an iXBRL filing")
+    parser.add_argument("checklist", nargs="?", help="Checklist JSON or snapshot (default: the Phase 2 sample checklist)")
+    parser.add_argument("ixbrl_file", nargs="?", default="sample_ixbrl_financials.html",
+                        help="Inline XBRL document (default: the Phase 3 sample filing)")
+    parser.add_argument("--output", default="cross_reference.json", help="Where to save the JSON results")
+    args = parser.parse_args()
+
+    if args.checklist:
+        checklist = load_checklist(args.checklist, compact=True)
+    else:
+        checklist = load_example_module("phase2_structured_data/04_audit_checklist_model.py").SAMPLE_CHECKLIST
+
+    if args.ixbrl_file == "sample_ixbrl_financials.html" and not os.path.exists(args.ixbrl_file):
+        print("Creating sample XBRL file...\n")
+        load_example_module("phase3_xbrl/07_parse_ixbrl_simple.py").create_sample_ixbrl()
+
+    start = time.perf_counter()
+    result = cross_reference_filing(checklist, args.ixbrl_file)
+    elapsed = time.perf_counter() - start
+    print(f"✓ Cross-referenced {len(result.ref_index)} referenced element(s) against "
+          f"{len(result.tested_facts) + len(result.untested_facts)} fact(s) in {elapsed * 1000:.1f} ms")
+
+    print_cross_reference_report(result)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(cross_reference_to_dict(result), f, indent=2)
+    print(f"✓ Results saved to: {args.output}")